@@ -5,14 +5,22 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('assets/logo.png', 'assets')],
+    # Inclui a logo já reduzida (assets/logo_200x100.png), lida sem PIL
+    datas=[('assets/logo*.png', 'assets')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Módulos que o programa não usa, mas que as dependências puxam como
+    # opcionais; fora do pacote, não são extraídos a cada inicialização
+    excludes=[
+        'pandas', 'matplotlib', 'scipy', 'IPython', 'PyQt5', 'PySide2', 'PySide6',
+        'PIL.ImageQt', 'PIL.ImageShow',
+        'unittest', 'doctest', 'pydoc', 'pdb', 'test', 'lib2to3', 'xmlrpc',
+        'tkinter.test', 'idlelib', 'setuptools', 'pip',
+    ],
     noarchive=False,
-    optimize=0,
+    optimize=1,
 )
 pyz = PYZ(a.pure)
 
@@ -26,7 +34,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # Sem UPX: descompactar as bibliotecas atrasa cada inicialização
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
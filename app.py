@@ -1,32 +1,99 @@
+import sys
+import time
+
+# Início da carga do programa, para medir o tempo até a janela ficar utilizável
+INICIO_CARGA = time.perf_counter()
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Com argumentos roda em modo linha de comando, sem carregar Tk nem PIL
+    from cli import main
+    sys.exit(main())
+
 import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
-import locale
-from openpyxl import Workbook
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
-from datetime import datetime
+import threading
 from contextlib import contextmanager
+from banco import (GerenciadorConexoes, ler_alteracoes, versao_atual, ler_resumo,
+                   reconciliar_resumo, executar_transacao)
+from tabela_virtual import TabelaVirtual, buscar_pagina, buscar_por_ids
+from busca import expressao_busca, FILTRO_BUSCA
+from executor import ExecutorBanco, tarefa_atual
+from metricas import Metricas, FAIXAS_MS
+from exportacao import exportar, formatos_disponiveis
+from vendas import registrar_itens, validar_item, ItemInvalido
+from produtos import validar_produto, validar_entrada, ProdutoInvalido
+from importacao import importar_produtos
+from motor import (preparar_banco, inserir_produto, alterar_produto, remover_produto,
+                   registrar_entrada)
+from dinheiro import para_reais, formatar_moeda, formatar_moedas
+from relatorios import (agregar_vendas, resumir_produtos, totalizar_vendas, fechar_periodos,
+                        fechamento_atual, inicio_periodo_aberto, interpretar_data, fim_exclusivo)
+from arquivo import fonte_vendas, arquivar_vendas, ARQUIVAR_APOS_DIAS
+from reposicao import FilaReposicao, LIMITE_ALERTAS
+from catalogo import CatalogoProdutos
+from sincronizacao import sincronizar_pasta, descrever_relatorio
+
+# Logo exibida no topo da janela e o tamanho em que aparece
+CAMINHO_LOGO = os.path.join("assets", "logo.png")
+TAMANHO_LOGO = (200, 100)
+
+# Tempo de espera após a última tecla antes de pesquisar
+ATRASO_PESQUISA_MS = 250
+
+# Agrupamentos da aba de relatórios; None lista as vendas uma a uma
+AGRUPAMENTOS = {"Vendas": None, "Dia": "dia", "Semana": "semana", "Mês": "mes"}
+
+# Linhas exibidas nas visões agrupadas e no ranking de mais vendidos
+LIMITE_AGRUPADO = 5000
+LIMITE_MAIS_VENDIDOS = 10
+
+
+def imagem_logo(caminho, tamanho=TAMANHO_LOGO):
+    """Carrega a logo já no tamanho de exibição.
+
+    A versão reduzida fica salva ao lado da original e o Tk lê o PNG
+    direto; PIL só é importado quando ela ainda não existe ou está
+    desatualizada.
+    """
+    reduzida = "{}_{}x{}.png".format(os.path.splitext(caminho)[0], *tamanho)
+    if not os.path.exists(reduzida) or os.path.getmtime(reduzida) < os.path.getmtime(caminho):
+        from PIL import Image, ImageTk
+        with Image.open(caminho) as img:
+            img = img.resize(tamanho, Image.LANCZOS)
+        try:
+            img.save(reduzida)
+        except OSError:
+            # Pasta somente leitura: usa a imagem reduzida só nesta execução
+            return ImageTk.PhotoImage(img)
+    return tk.PhotoImage(file=reduzida)
 
-# Configuração de localidade para formato de moeda
-locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
 
 class SistemaEstoque:
     def __init__(self, root):
         self.root = root
+        self.metricas = Metricas()
+        self.banco = GerenciadorConexoes(metricas=self.metricas)
+        self.versao_abas = {}
+        # Produtos em risco de faltar; só é usada na thread do executor
+        self.fila_reposicao = FilaReposicao()
+        # Produtos já lidos do banco, consultados pela seleção e pela venda
+        self.catalogo = CatalogoProdutos()
+        self.criar_banco_dados()
+        self.executor = ExecutorBanco(self.root, ao_erro=self.mostrar_erro_banco,
+                                      metricas=self.metricas)
         self.carregar_logo()
         self.configurar_interface()
-        self.criar_banco_dados()
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
         
     def carregar_logo(self):
         """Carrega e exibe a logo na interface."""
         try:
-            logo_path = os.path.join("assets", "logo.png")
+            logo_path = CAMINHO_LOGO
             
             if os.path.exists(logo_path):
-                img = Image.open(logo_path)
-                img = img.resize((200, 100), Image.LANCZOS)
-                self.logo_img = ImageTk.PhotoImage(img)
+                self.logo_img = imagem_logo(logo_path)
                 
                 logo_frame = ttk.Frame(self.root)
                 logo_frame.pack(fill=tk.X, pady=10)
@@ -39,68 +106,165 @@ class SistemaEstoque:
             print(f"Erro ao carregar logo: {e}")
 
     @contextmanager
-    def conectar_banco(self):
-        """Gerenciador de contexto para conexão com o banco de dados."""
-        conn = None
+    def conectar_banco(self, escrita=False):
+        """Gerenciador de contexto que empresta uma conexão do pool."""
         try:
-            conn = sqlite3.connect('estoque.db')
-            yield conn
+            if escrita:
+                with self.banco.escrita() as conn:
+                    yield conn
+            else:
+                with self.banco.leitura() as conn:
+                    # Leituras feitas pelo executor podem ser interrompidas ao cancelar a tarefa
+                    tarefa = tarefa_atual()
+                    if tarefa is None:
+                        yield conn
+                    else:
+                        with tarefa.interrompivel(conn):
+                            yield conn
         except sqlite3.Error as e:
-            messagebox.showerror("Erro", f"Erro de conexão com o banco de dados: {e}")
-        finally:
-            if conn:
-                conn.close()
+            self.metricas.registrar_erro("banco", type(e).__name__)
+            # Fora da thread principal o erro segue para o callback da tarefa
+            if threading.current_thread() is not threading.main_thread():
+                raise
+            self.mostrar_erro_banco(e)
+
+    def mostrar_erro_banco(self, erro):
+        """Exibe um erro de banco de dados."""
+        messagebox.showerror("Erro", f"Erro de conexão com o banco de dados: {erro}")
+
+    def executar_escrita(self, gravar, ao_concluir, mensagem_erro, nome=None, produtos=None):
+        """Executa `gravar(conn)` numa transação imediata na thread do banco.
+
+        `nome` identifica a operação no painel de diagnóstico. `produtos`
+        recebe o resultado de `gravar` e retorna os ids dos produtos
+        gravados, relidos no catálogo logo depois do commit.
+        """
+        def tarefa_escrita(tarefa):
+            with self.conectar_banco(escrita=True) as conn:
+                resultado = executar_transacao(conn, gravar)
+                if produtos is not None:
+                    self.catalogo.carregar(conn, produtos(resultado))
+            return resultado
+        
+        return self.executor.submeter(
+            tarefa_escrita,
+            ao_concluir=ao_concluir,
+            ao_erro=lambda e: messagebox.showerror("Erro", f"{mensagem_erro}: {e}"),
+            nome=nome)
+
+    def acompanhar_tarefa(self, tarefa, texto):
+        """Mostra a barra de progresso de uma tarefa longa, com opção de cancelar."""
+        self.tarefa_longa = tarefa
+        self.lbl_status.config(text=texto)
+        self.progresso.config(mode="indeterminate", value=0)
+        self.progresso.start(15)
+        self.barra_status.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
+
+    def atualizar_progresso(self, feito, total=None):
+        """Atualiza a barra de progresso da tarefa longa."""
+        if total:
+            self.progresso.stop()
+            self.progresso.config(mode="determinate", maximum=total, value=feito)
+        else:
+            self.lbl_status.config(text=f"{self.lbl_status.cget('text').split(' (')[0]} ({feito} linhas)")
+
+    def encerrar_progresso(self):
+        """Esconde a barra de progresso."""
+        self.tarefa_longa = None
+        self.progresso.stop()
+        self.barra_status.pack_forget()
+
+    def cancelar_tarefa_longa(self):
+        """Cancela a tarefa longa em andamento."""
+        if self.tarefa_longa is not None:
+            self.tarefa_longa.cancelar()
+        self.encerrar_progresso()
+
+    def fechar(self):
+        """Fecha as conexões com o banco e encerra a aplicação."""
+        self.executor.encerrar()
+        self.banco.fechar()
+        self.root.destroy()
     
     def criar_banco_dados(self):
-        """Cria as tabelas necessárias no banco de dados."""
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS produtos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL,
-                    preco_custo REAL NOT NULL
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vendas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto_id INTEGER NOT NULL,
-                    nome_produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL,
-                    preco_venda REAL NOT NULL,
-                    preco_custo REAL NOT NULL,
-                    data_venda TEXT NOT NULL,
-                    FOREIGN KEY (produto_id) REFERENCES produtos (id)
-                )
-            ''')
-            
-            conn.commit()
+        """Cria ou atualiza as tabelas necessárias no banco de dados."""
+        with self.conectar_banco(escrita=True) as conn:
+            preparar_banco(conn)
 
     def configurar_interface(self):
         """Configura a interface gráfica principal."""
         self.root.title("Sistema de Controle de Estoque")
         self.root.geometry("1200x800")
         
+        # Barra de status das tarefas longas, exibida apenas durante a execução
+        self.tarefa_longa = None
+        self.barra_status = ttk.Frame(self.root)
+        self.lbl_status = ttk.Label(self.barra_status, text="")
+        self.lbl_status.pack(side=tk.LEFT, padx=5)
+        self.progresso = ttk.Progressbar(self.barra_status, length=300)
+        self.progresso.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(self.barra_status, text="Cancelar", command=self.cancelar_tarefa_longa,
+                   style='Danger.TButton').pack(side=tk.RIGHT, padx=5)
+        
         # Notebook (abas)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Abas
-        self.configurar_aba_operacoes()
-        self.configurar_aba_visualizacao()
-        self.configurar_aba_relatorios()
+        # Filtro da aba de relatórios, também usado na exportação
+        self.periodo_relatorio = (None, None)
+        self.agrupamento = None
         
-        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.atualizar_abas())
+        # Abas: os quadros entram todos no notebook, mas o conteúdo de cada
+        # um só é montado na primeira visita
+        self.aba_operacoes = ttk.Frame(self.notebook)
+        self.aba_visualizacao = ttk.Frame(self.notebook)
+        self.aba_relatorios = ttk.Frame(self.notebook)
+        self.aba_reposicao = ttk.Frame(self.notebook)
+        self.abas = [
+            (self.aba_operacoes, "Operações", self.configurar_aba_operacoes),
+            (self.aba_visualizacao, "Visualização", self.configurar_aba_visualizacao),
+            (self.aba_relatorios, "Relatórios", self.configurar_aba_relatorios),
+            (self.aba_reposicao, "Reposição", self.configurar_aba_reposicao),
+        ]
+        for aba, titulo, _ in self.abas:
+            self.notebook.add(aba, text=titulo)
+        self.abas_montadas = set()
+        self.montar_aba(0)
+        
+        self.notebook.bind("<<NotebookTabChanged>>", self.ao_trocar_aba)
+        
+        # Aba de diagnóstico de desempenho, escondida até o atalho
+        self.aba_diagnostico = None
+        self.root.bind_all("<Control-Shift-D>", self.mostrar_diagnostico)
+        
+        # A primeira página de produtos é buscada depois que a janela aparece
+        self.root.after_idle(self.carregar_inicial)
+
+    def montar_aba(self, indice):
+        """Monta o conteúdo de uma aba, se ainda não tiver sido montado."""
+        if indice in self.abas_montadas:
+            return
+        self.abas_montadas.add(indice)
+        self.abas[indice][2]()
+
+    def ao_trocar_aba(self, event=None):
+        """Monta a aba escolhida na primeira visita e a atualiza."""
+        self.montar_aba(self.notebook.index(self.notebook.select()))
+        self.atualizar_abas()
+
+    def carregar_inicial(self):
+        """Lista os produtos, registra o tempo até a janela ficar utilizável e conta os alertas."""
+        self.marcar_versao(0)
+        self.tabela_produtos.recarregar(ao_concluir=self.informar_tempo_interativo)
+        self.atualizar_reposicao()
+
+    def informar_tempo_interativo(self):
+        """Registra no diagnóstico quanto tempo o programa levou até exibir os produtos."""
+        self.tempo_interativo = time.perf_counter() - INICIO_CARGA
+        self.metricas.registrar("inicio", "tempo até interativo", self.tempo_interativo * 1000)
 
     def configurar_aba_operacoes(self):
         """Configura a aba de operações."""
-        self.aba_operacoes = ttk.Frame(self.notebook)
-        self.notebook.add(self.aba_operacoes, text="Operações")
-        
         # Frame de cadastro
         cadastro_frame = ttk.LabelFrame(self.aba_operacoes, text="Cadastro de Produtos", padding=15)
         cadastro_frame.pack(fill=tk.X, pady=10, padx=10)
@@ -125,6 +289,8 @@ class SistemaEstoque:
         ttk.Button(btn_frame, text="Adicionar", command=self.adicionar_produto, style='Success.TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Atualizar", command=self.atualizar_produto, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Excluir", command=self.excluir_produto, style='Danger.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Registrar Entrada", command=self.registrar_entrada, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Importar Produtos", command=self.importar_produtos, style='Accent.TButton').pack(side=tk.LEFT, padx=5)
         
         # Frame de vendas
         venda_frame = ttk.LabelFrame(self.aba_operacoes, text="Registrar Venda", padding=15)
@@ -138,7 +304,34 @@ class SistemaEstoque:
         self.entry_preco_venda = ttk.Entry(venda_frame, width=10)
         self.entry_preco_venda.grid(row=1, column=1, padx=5, pady=5, sticky="w")
         
-        ttk.Button(venda_frame, text="Registrar Venda", command=self.registrar_venda, style='Primary.TButton').grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Button(venda_frame, text="Registrar Venda", command=self.registrar_venda, style='Primary.TButton').grid(row=2, column=0, pady=10, padx=5)
+        ttk.Button(venda_frame, text="Adicionar ao Carrinho", command=self.adicionar_ao_carrinho, style='Accent.TButton').grid(row=2, column=1, pady=10, padx=5)
+        
+        # Carrinho para vendas de vários itens
+        carrinho_frame = ttk.Frame(venda_frame)
+        carrinho_frame.grid(row=0, column=2, rowspan=3, padx=(30, 5), sticky="nsew")
+        venda_frame.columnconfigure(2, weight=1)
+        
+        colunas = ("Produto", "Qtd", "Preço Venda", "Total")
+        self.tree_carrinho = ttk.Treeview(carrinho_frame, columns=colunas, show="headings", height=4)
+        
+        for col in colunas:
+            self.tree_carrinho.heading(col, text=col)
+            self.tree_carrinho.column(col, width=100, anchor=tk.CENTER)
+        
+        self.tree_carrinho.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        carrinho_botoes = ttk.Frame(carrinho_frame)
+        carrinho_botoes.pack(side=tk.LEFT, padx=5)
+        
+        self.lbl_total_carrinho = ttk.Label(carrinho_botoes, text="Total: R$ 0,00", style='Info.TLabel')
+        self.lbl_total_carrinho.pack(pady=2)
+        ttk.Button(carrinho_botoes, text="Finalizar Venda", command=self.finalizar_venda, style='Success.TButton').pack(fill=tk.X, pady=2)
+        ttk.Button(carrinho_botoes, text="Remover Item", command=self.remover_item_carrinho, style='Danger.TButton').pack(fill=tk.X, pady=2)
+        ttk.Button(carrinho_botoes, text="Limpar Carrinho", command=self.limpar_carrinho, style='TButton').pack(fill=tk.X, pady=2)
+        
+        self.carrinho = {}
+        self._proximo_item_carrinho = 0
         
         # Frame de pesquisa
         pesquisa_frame = ttk.Frame(self.aba_operacoes)
@@ -147,6 +340,8 @@ class SistemaEstoque:
         ttk.Label(pesquisa_frame, text="Pesquisar:").pack(side=tk.LEFT)
         self.entry_pesquisa = ttk.Entry(pesquisa_frame, width=30)
         self.entry_pesquisa.pack(side=tk.LEFT, padx=5)
+        self._pesquisa_agendada = None
+        self.entry_pesquisa.bind("<KeyRelease>", self.agendar_pesquisa)
         ttk.Button(pesquisa_frame, text="Buscar", command=self.buscar_produtos, style='Accent.TButton').pack(side=tk.LEFT)
         ttk.Button(pesquisa_frame, text="Limpar", command=self.limpar_pesquisa, style='TButton').pack(side=tk.LEFT, padx=5)
         
@@ -163,20 +358,18 @@ class SistemaEstoque:
         
         scroll_y = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree_produtos.yview)
         scroll_x = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree_produtos.xview)
-        self.tree_produtos.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        self.tree_produtos.configure(xscrollcommand=scroll_x.set)
+        self.termo_pesquisa = None
+        self.tabela_produtos = TabelaVirtual(self.tree_produtos, scroll_y, self.pagina_produtos,
+                                            self.linhas_produtos, executor=self.executor,
+                                            metricas=self.metricas, nome="produtos")
         
         self.tree_produtos.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        # Carregar dados iniciais
-        self.listar_produtos()
 
     def configurar_aba_visualizacao(self):
         """Configura a aba de visualização."""
-        self.aba_visualizacao = ttk.Frame(self.notebook)
-        self.notebook.add(self.aba_visualizacao, text="Visualização")
-        
         main_frame = ttk.Frame(self.aba_visualizacao)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
@@ -191,7 +384,10 @@ class SistemaEstoque:
         # Barras de rolagem
         scroll_y = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree_estoque.yview)
         scroll_x = ttk.Scrollbar(main_frame, orient=tk.HORIZONTAL, command=self.tree_estoque.xview)
-        self.tree_estoque.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        self.tree_estoque.configure(xscrollcommand=scroll_x.set)
+        self.tabela_estoque = TabelaVirtual(self.tree_estoque, scroll_y, self.pagina_estoque,
+                                           self.linhas_estoque, executor=self.executor,
+                                           metricas=self.metricas, nome="estoque")
         
         self.tree_estoque.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
@@ -209,10 +405,10 @@ class SistemaEstoque:
                                          style='Info.TLabel')
         self.lbl_total_estoque.pack(anchor=tk.W, pady=2)
         
-        self.lbl_total_vendas = ttk.Label(resumo_frame, 
+        self.lbl_total_vendas_resumo = ttk.Label(resumo_frame, 
                                         text="Total em Vendas: R$ 0,00", 
                                         style='Info.TLabel')
-        self.lbl_total_vendas.pack(anchor=tk.W, pady=2)
+        self.lbl_total_vendas_resumo.pack(anchor=tk.W, pady=2)
         
         self.lbl_lucro_total = ttk.Label(resumo_frame, 
                                        text="Lucro Total: R$ 0,00", 
@@ -224,19 +420,55 @@ class SistemaEstoque:
                  text="Exportar Relatório Completo", 
                  command=self.exportar_relatorio, 
                  style='Primary.TButton').pack(pady=10)
+        
+        ttk.Button(resumo_frame, 
+                 text="Reconciliar Totais", 
+                 command=self.reconciliar_totais, 
+                 style='TButton').pack()
+        
+        ttk.Button(resumo_frame, 
+                 text="Sincronizar Lojas", 
+                 command=self.sincronizar_lojas, 
+                 style='TButton').pack(pady=(10, 0))
 
     def configurar_aba_relatorios(self):
         """Configura a aba de relatórios."""
-        self.aba_relatorios = ttk.Frame(self.notebook)
-        self.notebook.add(self.aba_relatorios, text="Relatórios")
+        # Filtros de período e agrupamento
+        filtro_frame = ttk.LabelFrame(self.aba_relatorios, text="Filtros", padding=10)
+        filtro_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        ttk.Label(filtro_frame, text="De:").pack(side=tk.LEFT, padx=5)
+        self.entry_data_inicio = ttk.Entry(filtro_frame, width=12)
+        self.entry_data_inicio.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(filtro_frame, text="Até:").pack(side=tk.LEFT, padx=5)
+        self.entry_data_fim = ttk.Entry(filtro_frame, width=12)
+        self.entry_data_fim.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(filtro_frame, text="Agrupar por:").pack(side=tk.LEFT, padx=5)
+        self.combo_agrupamento = ttk.Combobox(filtro_frame, values=list(AGRUPAMENTOS),
+                                              state="readonly", width=10)
+        self.combo_agrupamento.set("Vendas")
+        self.combo_agrupamento.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(filtro_frame, text="Filtrar", command=self.filtrar_relatorio,
+                   style='Primary.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(filtro_frame, text="Limpar", command=self.limpar_filtro_relatorio).pack(
+            side=tk.LEFT, padx=5)
+        ttk.Label(filtro_frame, text="(DD/MM/AAAA)").pack(side=tk.LEFT, padx=5)
+        ttk.Button(filtro_frame, text="Arquivar Vendas Antigas",
+                   command=self.arquivar_vendas_antigas).pack(side=tk.RIGHT, padx=5)
         
         main_frame = ttk.Frame(self.aba_relatorios)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Tabela de vendas
+        # Tabela de vendas, uma linha por venda
+        self.frame_vendas = ttk.Frame(main_frame)
+        self.frame_vendas.pack(fill=tk.BOTH, expand=True)
+        
         colunas = ("ID", "Produto", "Qtd", "Custo", "Venda", 
                  "Total Custo", "Total Venda", "Lucro", "Data")
-        self.tree_vendas = ttk.Treeview(main_frame, columns=colunas, show="headings", height=20)
+        self.tree_vendas = ttk.Treeview(self.frame_vendas, columns=colunas, show="headings", height=20)
         
         # Configurar colunas
         for col in colunas:
@@ -244,14 +476,46 @@ class SistemaEstoque:
             self.tree_vendas.column(col, width=100, anchor=tk.CENTER)
         
         # Barras de rolagem
-        scroll_y = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree_vendas.yview)
-        scroll_x = ttk.Scrollbar(main_frame, orient=tk.HORIZONTAL, command=self.tree_vendas.xview)
-        self.tree_vendas.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        scroll_y = ttk.Scrollbar(self.frame_vendas, orient=tk.VERTICAL, command=self.tree_vendas.yview)
+        scroll_x = ttk.Scrollbar(self.frame_vendas, orient=tk.HORIZONTAL, command=self.tree_vendas.xview)
+        self.tree_vendas.configure(xscrollcommand=scroll_x.set)
+        self.tabela_vendas = TabelaVirtual(self.tree_vendas, scroll_y, self.pagina_vendas,
+                                          self.linhas_vendas, descendente=True,
+                                          executor=self.executor,
+                                          metricas=self.metricas, nome="vendas")
         
         self.tree_vendas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
         
+        # Tabela de vendas agrupadas por período e produto, exibida no lugar da anterior
+        self.frame_agrupado = ttk.Frame(main_frame)
+        colunas = ("Período", "Produto", "Qtd", "Vendas", "Total Venda",
+                   "Total Custo", "Lucro", "Margem")
+        self.tree_agrupado = ttk.Treeview(self.frame_agrupado, columns=colunas,
+                                          show="headings", height=20)
+        for col in colunas:
+            self.tree_agrupado.heading(col, text=col)
+            self.tree_agrupado.column(col, width=100, anchor=tk.CENTER)
+        
+        scroll_agrupado = ttk.Scrollbar(self.frame_agrupado, orient=tk.VERTICAL,
+                                        command=self.tree_agrupado.yview)
+        self.tree_agrupado.configure(yscrollcommand=scroll_agrupado.set)
+        self.tree_agrupado.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll_agrupado.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Produtos que mais faturaram no período
+        mais_vendidos_frame = ttk.LabelFrame(self.aba_relatorios, text="Mais Vendidos", padding=10)
+        mais_vendidos_frame.pack(fill=tk.X, padx=10)
+        
+        colunas = ("Produto", "Qtd", "Total Venda", "Lucro", "Margem")
+        self.tree_mais_vendidos = ttk.Treeview(mais_vendidos_frame, columns=colunas,
+                                               show="headings", height=5)
+        for col in colunas:
+            self.tree_mais_vendidos.heading(col, text=col)
+            self.tree_mais_vendidos.column(col, width=100, anchor=tk.CENTER)
+        self.tree_mais_vendidos.pack(fill=tk.X)
+        
         # Frame de totais
         totais_frame = ttk.LabelFrame(self.aba_relatorios, text="Totais de Vendas", padding=15)
         totais_frame.pack(fill=tk.X, pady=10, padx=10)
@@ -271,162 +535,498 @@ class SistemaEstoque:
                                        style='Success.TLabel')
         self.lbl_total_lucro.pack(side=tk.LEFT, padx=10)
 
+    def configurar_aba_reposicao(self):
+        """Configura a aba de reposição com os produtos em risco de faltar."""
+        info_frame = ttk.Frame(self.aba_reposicao)
+        info_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        self.lbl_reposicao = ttk.Label(info_frame, text="", style='Info.TLabel')
+        self.lbl_reposicao.pack(side=tk.LEFT, padx=5)
+
+        # Dos mais urgentes (menos dias de cobertura) aos menos urgentes
+        tree_frame = ttk.Frame(self.aba_reposicao)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        colunas = ("ID", "Produto", "Estoque", "Venda/dia", "Cobertura (dias)",
+                   "Ponto de Pedido", "Sugestão")
+        self.tree_reposicao = ttk.Treeview(tree_frame, columns=colunas, show="headings", height=15)
+
+        for col in colunas:
+            self.tree_reposicao.heading(col, text=col)
+            self.tree_reposicao.column(col, width=110, anchor=tk.CENTER)
+        self.tree_reposicao.column("Produto", width=300, anchor=tk.W)
+
+        scroll_y = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree_reposicao.yview)
+        self.tree_reposicao.configure(yscrollcommand=scroll_y.set)
+
+        self.tree_reposicao.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def atualizar_reposicao(self, exibir=False):
+        """Traz a fila de reposição para a versão atual e atualiza o título da aba.
+
+        Só os produtos alterados desde a última atualização são relidos. Com
+        `exibir`, também preenche a tabela da aba.
+        """
+        def consultar(tarefa):
+            with self.conectar_banco() as conn:
+                self.fila_reposicao.atualizar(conn)
+            linhas = self.fila_reposicao.em_risco(LIMITE_ALERTAS) if exibir else None
+            return self.fila_reposicao.total_em_risco(), linhas
+
+        def aplicar(resultado):
+            total, linhas = resultado
+            self.notebook.tab(self.aba_reposicao,
+                              text=f"Reposição ({total})" if total else "Reposição")
+            if linhas is not None:
+                self.exibir_reposicao(total, linhas)
+
+        self.executor.submeter(consultar, ao_concluir=aplicar,
+                               nome="reposição: alertas" if exibir else "reposição: contagem")
+
+    def exibir_reposicao(self, total, linhas):
+        """Preenche a tabela de reposição."""
+        self.tree_reposicao.delete(*self.tree_reposicao.get_children())
+        for produto_id, nome, qtd, velocidade, cobertura, ponto_pedido, sugestao in linhas:
+            self.tree_reposicao.insert("", "end", iid=str(produto_id), values=(
+                produto_id, nome, qtd, f"{velocidade:.2f}",
+                "-" if cobertura is None else f"{cobertura:.1f}", ponto_pedido, sugestao))
+
+        texto = f"Produtos no ponto de pedido: {total}"
+        if total > len(linhas):
+            texto += f" (exibindo os {len(linhas)} mais urgentes)"
+        self.lbl_reposicao.config(text=texto)
+
+    def mostrar_diagnostico(self, event=None):
+        """Exibe a aba de diagnóstico, que fica escondida até o atalho Ctrl+Shift+D."""
+        if self.aba_diagnostico is None:
+            self.aba_diagnostico = ttk.Frame(self.notebook)
+            self.abas.append((self.aba_diagnostico, "Diagnóstico", self.configurar_aba_diagnostico))
+            self.notebook.add(self.aba_diagnostico, text="Diagnóstico")
+        self.notebook.select(self.aba_diagnostico)
+
+    def configurar_aba_diagnostico(self):
+        """Configura a aba de diagnóstico com as medições de desempenho."""
+        botoes_frame = ttk.Frame(self.aba_diagnostico)
+        botoes_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        ttk.Button(botoes_frame, text="Atualizar", command=self.atualizar_diagnostico, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(botoes_frame, text="Exportar Métricas", command=self.exportar_metricas, style='Accent.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(botoes_frame, text="Zerar", command=self.zerar_metricas, style='Danger.TButton').pack(side=tk.LEFT, padx=5)
+
+        self.lbl_diagnostico = ttk.Label(botoes_frame, text="")
+        self.lbl_diagnostico.pack(side=tk.RIGHT, padx=5)
+
+        # Uma linha por operação medida, das que mais consomem tempo às que menos
+        tree_frame = ttk.Frame(self.aba_diagnostico)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        colunas = ("Tipo", "Operação", "Chamadas", "Linhas", "Erros",
+                   "Média (ms)", "p50 (ms)", "p95 (ms)", "Máx (ms)", "Total (ms)")
+        self.tree_metricas = ttk.Treeview(tree_frame, columns=colunas, show="headings", height=15)
+
+        for col in colunas:
+            self.tree_metricas.heading(col, text=col)
+            self.tree_metricas.column(col, width=80, anchor=tk.CENTER)
+        self.tree_metricas.column("Operação", width=420, anchor=tk.W)
+
+        scroll_y = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree_metricas.yview)
+        self.tree_metricas.configure(yscrollcommand=scroll_y.set)
+        self.tree_metricas.bind("<<TreeviewSelect>>", self.exibir_histograma)
+
+        self.tree_metricas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Histograma e plano de execução da operação selecionada
+        histograma_frame = ttk.LabelFrame(self.aba_diagnostico, text="Distribuição de Latência", padding=10)
+        histograma_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        self.lbl_histograma = ttk.Label(histograma_frame, text="Selecione uma operação.",
+                                        font=("Courier", 9), justify=tk.LEFT)
+        self.lbl_histograma.pack(anchor=tk.W)
+
+    def atualizar_diagnostico(self):
+        """Recarrega a tabela de métricas com as medições atuais."""
+        self.series_metricas = self.metricas.series()
+        selecionado = self.tree_metricas.selection()
+
+        self.tree_metricas.delete(*self.tree_metricas.get_children())
+        ordenadas = sorted(self.series_metricas.items(), key=lambda item: -item[1].total_ms)
+        for indice, ((tipo, nome), serie) in enumerate(ordenadas):
+            media = serie.total_ms / serie.chamadas if serie.chamadas else 0
+            self.tree_metricas.insert("", "end", iid=str(indice), values=(
+                tipo, nome, serie.chamadas, serie.linhas, serie.erros,
+                *(f"{ms:.1f}" for ms in (media, serie.percentil(50), serie.percentil(95),
+                                         serie.max_ms, serie.total_ms))))
+        self.chaves_metricas = [chave for chave, _ in ordenadas]
+
+        if selecionado and int(selecionado[0]) < len(ordenadas):
+            self.tree_metricas.selection_set(selecionado[0])
+
+        self.lbl_diagnostico.config(
+            text=f"Desde {self.metricas.inicio:%d/%m/%Y %H:%M:%S} | "
+                 f"Consultas lentas (≥ {self.metricas.limiar_lenta_ms} ms): "
+                 f"{os.path.abspath(self.metricas.arquivo_lentas)}")
+
+    def exibir_histograma(self, event=None):
+        """Desenha o histograma de latência da operação selecionada."""
+        selecionado = self.tree_metricas.selection()
+        if not selecionado:
+            return
+
+        tipo, nome = self.chaves_metricas[int(selecionado[0])]
+        serie = self.series_metricas[(tipo, nome)]
+        maior = max(serie.faixas) or 1
+        rotulos = [f"≤ {limite} ms" for limite in FAIXAS_MS] + [f"> {FAIXAS_MS[-1]} ms"]
+        linhas = [f"{rotulo:>11} {'█' * round(40 * quantidade / maior):<40} {quantidade}"
+                  for rotulo, quantidade in zip(rotulos, serie.faixas)]
+
+        plano = self.metricas.planos().get(nome)
+        if plano:
+            linhas += ["", "Plano de execução:"] + [f"  {detalhe}" for detalhe in plano]
+        self.lbl_histograma.config(text="\n".join(linhas))
+
+    def exportar_metricas(self):
+        """Salva as medições em JSON, para comparar entre versões e lojas."""
+        caminho = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+            title="Salvar métricas como"
+        )
+        if not caminho:
+            return
+        try:
+            self.metricas.exportar(caminho)
+        except OSError as e:
+            messagebox.showerror("Erro", f"Erro ao exportar métricas: {e}")
+            return
+        messagebox.showinfo("Sucesso", f"Métricas exportadas para:\n{caminho}")
+
+    def zerar_metricas(self):
+        """Descarta as medições acumuladas."""
+        self.metricas.zerar()
+        self.atualizar_diagnostico()
+
     def atualizar_abas(self):
-        """Atualiza todas as abas quando há mudança."""
+        """Atualiza a aba atual aplicando só as alterações desde sua última renderização."""
         aba_atual = self.notebook.index(self.notebook.select())
+        if self.abas[aba_atual][0] is self.aba_diagnostico:
+            self.atualizar_diagnostico()
+            return
+        # A reposição depende também da data (o giro decai), então é sempre
+        # recalculada; a fila relê só os produtos alterados
+        if self.abas[aba_atual][0] is self.aba_reposicao:
+            self.atualizar_reposicao(exibir=True)
+            return
+        versao = self.versao_abas.get(aba_atual)
         
-        if aba_atual == 1:  # Aba de Visualização
-            self.atualizar_aba_visualizacao()
-        elif aba_atual == 2:  # Aba de Relatórios
-            self.atualizar_aba_relatorios()
-
-    def atualizar_aba_visualizacao(self):
-        """Atualiza a aba de visualização com dados recentes."""
-        # Limpar dados existentes
-        for item in self.tree_estoque.get_children():
-            self.tree_estoque.delete(item)
-        
-        # Inicializar totais
-        total_estoque = 0
-        total_vendas = 0
-        lucro_total = 0
+        def consultar(tarefa):
+            with self.conectar_banco() as conn:
+                self.catalogo.atualizar(conn)
+                return ler_alteracoes(conn, versao)
         
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
+        def aplicar(resultado):
+            seq, alteradas = resultado
+            # Nada mudou desde a última visita à aba
+            if alteradas == {}:
+                return
             
-            # Carregar produtos
-            cursor.execute("SELECT id, nome, quantidade, preco_custo FROM produtos")
-            for produto in cursor.fetchall():
-                id_prod, nome, qtd, preco = produto
-                valor_total = qtd * preco
-                total_estoque += valor_total
-                
-                self.tree_estoque.insert("", "end", values=(
-                    id_prod, 
-                    nome, 
-                    qtd, 
-                    locale.currency(preco, grouping=True),
-                    locale.currency(valor_total, grouping=True)
-                ))
+            if aba_atual == 0:  # Aba de Operações
+                self.atualizar_aba_operacoes(alteradas)
+            elif aba_atual == 1:  # Aba de Visualização
+                self.atualizar_aba_visualizacao(alteradas)
+            elif aba_atual == 2:  # Aba de Relatórios
+                self.atualizar_aba_relatorios(alteradas)
             
-            # Calcular totais de vendas
-            cursor.execute('''
-                SELECT 
-                    SUM(quantidade * preco_venda),
-                    SUM(quantidade * preco_custo),
-                    SUM(quantidade * (preco_venda - preco_custo))
-                FROM vendas
-            ''')
-            dados_vendas = cursor.fetchone()
-            
-            if dados_vendas and dados_vendas[0]:
-                total_vendas = dados_vendas[0]
-                custo_total = dados_vendas[1]
-                lucro_total = dados_vendas[2]
+            self.versao_abas[aba_atual] = seq
         
-        # Atualizar rótulos
+        self.executor.submeter(consultar, ao_concluir=aplicar,
+                               nome=f"atualizar aba {self.abas[aba_atual][1]}")
+        self.atualizar_reposicao()
+
+    def marcar_versao(self, aba):
+        """Registra a versão atual do diário como já renderizada pela aba."""
+        def consultar(tarefa):
+            with self.conectar_banco() as conn:
+                return versao_atual(conn)
+        
+        self.executor.submeter(
+            consultar, ao_concluir=lambda seq: self.versao_abas.__setitem__(aba, seq))
+
+    def ler_totais(self, ao_concluir):
+        """Lê os totais materializados na thread do banco."""
+        def consultar(tarefa):
+            with self.conectar_banco() as conn:
+                return ler_resumo(conn)
+        
+        self.executor.submeter(consultar, ao_concluir=ao_concluir, nome="totais")
+
+    def atualizar_aba_operacoes(self, alteradas=None):
+        """Atualiza a tabela de produtos; sem alterações informadas, recarrega tudo."""
+        if alteradas is None:
+            self.tabela_produtos.recarregar()
+        elif "produtos" in alteradas:
+            self.tabela_produtos.aplicar_alteracoes(alteradas["produtos"])
+
+    def atualizar_aba_visualizacao(self, alteradas=None):
+        """Atualiza a aba de visualização com dados recentes."""
+        if alteradas is None:
+            self.tabela_estoque.recarregar()
+        elif "produtos" in alteradas:
+            self.tabela_estoque.aplicar_alteracoes(alteradas["produtos"])
+        
+        self.ler_totais(self.exibir_resumo_financeiro)
+
+    def exibir_resumo_financeiro(self, resumo):
+        """Atualiza os rótulos do resumo financeiro."""
         self.lbl_total_estoque.config(
-            text=f"Valor Total em Estoque: {locale.currency(total_estoque, grouping=True)}")
+            text=f"Valor Total em Estoque: {formatar_moeda(resumo['valor_estoque'])}")
         
-        self.lbl_total_vendas.config(
-            text=f"Total em Vendas: {locale.currency(total_vendas, grouping=True)}")
+        self.lbl_total_vendas_resumo.config(
+            text=f"Total em Vendas: {formatar_moeda(resumo['total_vendas'])}")
         
         self.lbl_lucro_total.config(
-            text=f"Lucro Total: {locale.currency(lucro_total, grouping=True)}")
+            text=f"Lucro Total: {formatar_moeda(resumo['lucro_total'])}")
 
-    def atualizar_aba_relatorios(self):
-        """Atualiza a aba de relatórios com dados recentes."""
-        # Limpar dados existentes
-        for item in self.tree_vendas.get_children():
-            self.tree_vendas.delete(item)
+    def pagina_estoque(self, apos, antes, limite):
+        """Busca uma página da tabela de estoque ordenada por ID."""
+        linhas = []
+        with self.conectar_banco() as conn:
+            self.catalogo.atualizar(conn)
+            linhas = buscar_pagina(
+                conn,
+                "SELECT id, nome, quantidade, preco_custo FROM produtos",
+                ("id",), apos, antes, limite)
         
+        return [self.formatar_estoque(produto) for produto in self.catalogo.guardar(linhas)]
+
+    def linhas_estoque(self, ids):
+        """Busca as linhas de estoque dos produtos informados."""
+        linhas = []
         with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            
-            # Obter totais de vendas
-            cursor.execute('''
-                SELECT 
-                    SUM(quantidade * preco_venda),
-                    SUM(quantidade * preco_custo),
-                    SUM(quantidade * (preco_venda - preco_custo))
-                FROM vendas
-            ''')
-            totais = cursor.fetchone()
-            
-            total_vendas = totais[0] or 0 if totais else 0
-            total_custo = totais[1] or 0 if totais else 0
-            lucro_total = totais[2] or 0 if totais else 0
-            
-            # Carregar dados de vendas
-            cursor.execute('''
-                SELECT 
-                    id, nome_produto, quantidade, preco_custo, preco_venda,
-                    (quantidade * preco_custo),
-                    (quantidade * preco_venda),
-                    (quantidade * (preco_venda - preco_custo)),
-                    data_venda
-                FROM vendas
-                ORDER BY data_venda DESC
-            ''')
+            linhas = buscar_por_ids(
+                conn, "SELECT id, nome, quantidade, preco_custo FROM produtos", ids)
+        
+        return [self.formatar_estoque(produto) for produto in self.catalogo.guardar(linhas)]
+
+    def formatar_estoque(self, produto):
+        """Converte um produto do catálogo no formato da tabela de estoque."""
+        return (produto.id, (produto.id,), (
+            produto.id,
+            produto.nome,
+            produto.quantidade,
+            *formatar_moedas((produto.preco_custo, produto.quantidade * produto.preco_custo))
+        ))
+
+    def atualizar_aba_relatorios(self, alteradas=None):
+        """Atualiza a aba de relatórios com dados recentes."""
+        if self.agrupamento is None:
+            if alteradas is None:
+                self.tabela_vendas.recarregar()
+            elif "vendas" in alteradas:
+                self.tabela_vendas.aplicar_alteracoes(alteradas["vendas"])
+        
+        if alteradas is None or "vendas" in alteradas:
+            self.carregar_analise()
+
+    def filtrar_relatorio(self):
+        """Aplica o intervalo de datas e o agrupamento escolhidos."""
+        try:
+            inicio = interpretar_data(self.entry_data_inicio.get())
+            fim = interpretar_data(self.entry_data_fim.get())
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida! Use o formato DD/MM/AAAA.")
+            return
+        
+        if inicio and fim and inicio > fim:
+            messagebox.showerror("Erro", "A data inicial é posterior à data final!")
+            return
+        
+        self.periodo_relatorio = (inicio, fim)
+        self.agrupamento = AGRUPAMENTOS.get(self.combo_agrupamento.get())
+        
+        # Troca a tabela exibida conforme o agrupamento
+        if self.agrupamento is None:
+            self.frame_agrupado.pack_forget()
+            self.frame_vendas.pack(fill=tk.BOTH, expand=True)
+        else:
+            self.frame_vendas.pack_forget()
+            self.frame_agrupado.pack(fill=tk.BOTH, expand=True)
+        
+        self.marcar_versao(2)
+        self.atualizar_aba_relatorios()
+
+    def limpar_filtro_relatorio(self):
+        """Volta à lista completa de vendas."""
+        self.entry_data_inicio.delete(0, tk.END)
+        self.entry_data_fim.delete(0, tk.END)
+        self.combo_agrupamento.set("Vendas")
+        self.filtrar_relatorio()
+
+    def filtro_vendas(self):
+        """Retorna a condição SQL e os parâmetros do intervalo de datas atual."""
+        inicio, fim = self.periodo_relatorio
+        condicoes, parametros = [], []
+        if inicio:
+            condicoes.append("data_venda >= ?")
+            parametros.append(inicio)
+        if fim:
+            condicoes.append("data_venda < ?")
+            parametros.append(fim_exclusivo(fim))
+        return " AND ".join(condicoes) or None, tuple(parametros)
+
+    def carregar_analise(self):
+        """Calcula na thread do banco os totais, os mais vendidos e o agrupamento atual."""
+        inicio, fim = self.periodo_relatorio
+        agrupamento = self.agrupamento
+        
+        def consultar(tarefa):
+            # Consolida os meses encerrados desde o último fechamento
+            with self.conectar_banco() as conn:
+                pendente = fechamento_atual(conn) < inicio_periodo_aberto()
+            if pendente:
+                with self.conectar_banco(escrita=True) as conn:
+                    executar_transacao(conn, fechar_periodos)
             
-            for venda in cursor.fetchall():
-                self.tree_vendas.insert("", "end", values=(
-                    venda[0],
-                    venda[1],
-                    venda[2],
-                    locale.currency(venda[3], grouping=True),
-                    locale.currency(venda[4], grouping=True),
-                    locale.currency(venda[5], grouping=True),
-                    locale.currency(venda[6], grouping=True),
-                    locale.currency(venda[7], grouping=True),
-                    venda[8]
-                ))
-        
-        # Atualizar totais
+            with self.conectar_banco() as conn:
+                conn.execute("BEGIN")  # Mesmo instantâneo para todas as consultas
+                if inicio or fim:
+                    totais = totalizar_vendas(conn, inicio, fim)
+                else:
+                    totais = ler_resumo(conn)
+                mais_vendidos = resumir_produtos(conn, inicio, fim, LIMITE_MAIS_VENDIDOS)
+                agrupado = None
+                if agrupamento is not None:
+                    agrupado = agregar_vendas(conn, agrupamento, inicio, fim, LIMITE_AGRUPADO)
+                return totais, mais_vendidos, agrupado
+        
+        self.executor.submeter(consultar, ao_concluir=self.exibir_analise, nome="relatórios: análise")
+
+    def exibir_analise(self, resultado):
+        """Exibe os totais, o ranking de mais vendidos e a tabela agrupada."""
+        totais, mais_vendidos, agrupado = resultado
+        self.exibir_totais_vendas(totais)
+        
+        self.tree_mais_vendidos.delete(*self.tree_mais_vendidos.get_children())
+        for produto_id, nome, qtd, _, total_venda, _, lucro in mais_vendidos:
+            self.tree_mais_vendidos.insert("", "end", iid=produto_id, values=(
+                nome, qtd, *formatar_moedas((total_venda, lucro)),
+                self.formatar_margem(lucro, total_venda)))
+        
+        if agrupado is not None:
+            self.tree_agrupado.delete(*self.tree_agrupado.get_children())
+            for periodo, produto_id, nome, qtd, vendas, total_venda, total_custo, lucro in agrupado:
+                self.tree_agrupado.insert("", "end", iid=f"{periodo}:{produto_id}", values=(
+                    self.formatar_periodo(periodo), nome, qtd, vendas,
+                    *formatar_moedas((total_venda, total_custo, lucro)),
+                    self.formatar_margem(lucro, total_venda)))
+
+    def formatar_periodo(self, periodo):
+        """Rótulo do período de uma linha agrupada."""
+        if self.agrupamento == "mes":
+            ano, mes = periodo.split("-")
+            return f"{mes}/{ano}"
+        ano, mes, dia = periodo.split("-")
+        if self.agrupamento == "semana":
+            return f"Semana de {dia}/{mes}/{ano}"
+        return f"{dia}/{mes}/{ano}"
+
+    def formatar_margem(self, lucro, total_venda):
+        """Margem de lucro sobre o valor vendido, em porcentagem."""
+        if not total_venda:
+            return "-"
+        return f"{lucro * 100 / total_venda:.1f}%".replace(".", ",")
+
+    def exibir_totais_vendas(self, resumo):
+        """Atualiza os rótulos de totais de vendas."""
         self.lbl_total_vendas.config(
-            text=f"Total em Vendas: {locale.currency(total_vendas, grouping=True)}")
+            text=f"Total em Vendas: {formatar_moeda(resumo['total_vendas'])}")
         
         self.lbl_total_custo.config(
-            text=f"Total em Custos: {locale.currency(total_custo, grouping=True)}")
+            text=f"Total em Custos: {formatar_moeda(resumo['total_custo'])}")
         
         self.lbl_total_lucro.config(
-            text=f"Lucro Total: {locale.currency(lucro_total, grouping=True)}")
+            text=f"Lucro Total: {formatar_moeda(resumo['lucro_total'])}")
+
+    def reconciliar_totais(self):
+        """Recalcula os totais materializados a partir das tabelas e informa divergências."""
+        self.executar_escrita(reconciliar_resumo, self.informar_reconciliacao,
+                              "Erro ao reconciliar totais", "reconciliar totais")
+
+    def informar_reconciliacao(self, divergencias):
+        """Informa o resultado da reconciliação e atualiza a aba atual."""
+        if divergencias:
+            detalhes = "\n".join(
+                f"{coluna}: {formatar_moeda(antes)} → "
+                f"{formatar_moeda(depois)}"
+                for coluna, (antes, depois) in divergencias.items())
+            messagebox.showwarning("Reconciliação", f"Totais corrigidos:\n{detalhes}")
+        else:
+            messagebox.showinfo("Reconciliação", "Totais conferem com as tabelas.")
+        
+        self.versao_abas.clear()
+        self.atualizar_abas()
+
+    def consulta_vendas(self, conn):
+        """Consulta da tabela de vendas, incluindo os arquivos que o intervalo atual alcança."""
+        return f'''SELECT 
+                    id, nome_produto, quantidade, preco_custo, preco_venda,
+                    total_custo, total_venda, lucro, data_venda
+                FROM {fonte_vendas(conn, *self.periodo_relatorio)}'''
+
+    def pagina_vendas(self, apos, antes, limite):
+        """Busca uma página de vendas, das mais recentes para as mais antigas."""
+        onde, parametros = self.filtro_vendas()
+        
+        linhas = []
+        with self.conectar_banco() as conn:
+            linhas = buscar_pagina(
+                conn, self.consulta_vendas(conn),
+                ("data_venda", "id"), apos, antes, limite, descendente=True,
+                onde=onde, parametros=parametros)
+        
+        return [self.formatar_venda(venda) for venda in linhas]
+
+    def linhas_vendas(self, ids):
+        """Busca as vendas com os ids informados que estão no intervalo atual."""
+        onde, parametros = self.filtro_vendas()
+        
+        linhas = []
+        with self.conectar_banco() as conn:
+            linhas = buscar_por_ids(conn, self.consulta_vendas(conn), ids,
+                                    onde=onde, parametros=parametros)
+        
+        return [self.formatar_venda(venda) for venda in linhas]
+
+    def formatar_venda(self, venda):
+        """Converte uma linha de venda no formato da tabela de relatórios."""
+        return (venda[0], (venda[8], venda[0]), (
+            venda[0],
+            venda[1],
+            venda[2],
+            *formatar_moedas(venda[3:8]),
+            venda[8]
+        ))
 
     def adicionar_produto(self):
         """Adiciona um novo produto ao estoque."""
-        nome = self.entry_nome.get().strip()
-        quantidade = self.entry_quantidade.get().strip()
-        preco_custo = self.entry_preco_custo.get().strip()
-
-        if not nome or not quantidade or not preco_custo:
-            messagebox.showerror("Erro", "Preencha todos os campos!")
-            return
-            
-        if not quantidade.isdigit() or int(quantidade) <= 0:
-            messagebox.showerror("Erro", "Quantidade deve ser um número positivo!")
-            return
-            
         try:
-            preco_custo = float(preco_custo)
-            if preco_custo <= 0:
-                raise ValueError
-        except ValueError:
-            messagebox.showerror("Erro", "Preço de custo inválido!")
+            nome, quantidade, preco_custo = validar_produto(
+                self.entry_nome.get(), self.entry_quantidade.get(), self.entry_preco_custo.get())
+        except ProdutoInvalido as e:
+            messagebox.showerror("Erro", str(e))
             return
 
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    "INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, ?, ?)",
-                    (nome, int(quantidade), preco_custo))
-                conn.commit()
-                messagebox.showinfo("Sucesso", "Produto adicionado com sucesso!")
-                self.limpar_campos()
-                self.listar_produtos()
-                self.atualizar_abas()
-            except sqlite3.Error as e:
-                messagebox.showerror("Erro", f"Erro ao adicionar produto: {e}")
+        def gravar(conn):
+            return inserir_produto(conn, nome, quantidade, preco_custo)
+        
+        def concluir(_):
+            messagebox.showinfo("Sucesso", "Produto adicionado com sucesso!")
+            self.limpar_campos()
+            self.atualizar_abas()
+        
+        self.executar_escrita(gravar, concluir, "Erro ao adicionar produto", "adicionar produto",
+                              produtos=lambda produto_id: [produto_id])
 
     def atualizar_produto(self):
         """Atualiza um produto existente."""
@@ -435,40 +1035,24 @@ class SistemaEstoque:
             messagebox.showerror("Erro", "Selecione um produto para atualizar!")
             return
             
-        produto_id = produto[0]
-        nome = self.entry_nome.get().strip()
-        quantidade = self.entry_quantidade.get().strip()
-        preco_custo = self.entry_preco_custo.get().strip()
-
-        if not nome or not quantidade or not preco_custo:
-            messagebox.showerror("Erro", "Preencha todos os campos!")
-            return
-            
-        if not quantidade.isdigit() or int(quantidade) <= 0:
-            messagebox.showerror("Erro", "Quantidade deve ser um número positivo!")
-            return
-            
+        produto_id = produto.id
         try:
-            preco_custo = float(preco_custo)
-            if preco_custo <= 0:
-                raise ValueError
-        except ValueError:
-            messagebox.showerror("Erro", "Preço de custo inválido!")
+            nome, quantidade, preco_custo = validar_produto(
+                self.entry_nome.get(), self.entry_quantidade.get(), self.entry_preco_custo.get())
+        except ProdutoInvalido as e:
+            messagebox.showerror("Erro", str(e))
             return
 
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    "UPDATE produtos SET nome = ?, quantidade = ?, preco_custo = ? WHERE id = ?",
-                    (nome, int(quantidade), preco_custo, produto_id))
-                conn.commit()
-                messagebox.showinfo("Sucesso", "Produto atualizado com sucesso!")
-                self.limpar_campos()
-                self.listar_produtos()
-                self.atualizar_abas()
-            except sqlite3.Error as e:
-                messagebox.showerror("Erro", f"Erro ao atualizar produto: {e}")
+        def gravar(conn):
+            alterar_produto(conn, produto_id, nome, quantidade, preco_custo)
+        
+        def concluir(_):
+            messagebox.showinfo("Sucesso", "Produto atualizado com sucesso!")
+            self.limpar_campos()
+            self.atualizar_abas()
+        
+        self.executar_escrita(gravar, concluir, "Erro ao atualizar produto", "atualizar produto",
+                              produtos=lambda _: [produto_id])
 
     def excluir_produto(self):
         """Remove um produto do estoque."""
@@ -477,123 +1061,250 @@ class SistemaEstoque:
             messagebox.showerror("Erro", "Selecione um produto para excluir!")
             return
             
-        if not messagebox.askyesno("Confirmar", f"Tem certeza que deseja excluir '{produto[1]}'?"):
+        if not messagebox.askyesno("Confirmar", f"Tem certeza que deseja excluir '{produto.nome}'?"):
             return
 
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute("DELETE FROM produtos WHERE id = ?", (produto[0],))
-                conn.commit()
-                messagebox.showinfo("Sucesso", "Produto excluído com sucesso!")
-                self.listar_produtos()
-                self.atualizar_abas()
-            except sqlite3.Error as e:
-                messagebox.showerror("Erro", f"Erro ao excluir produto: {e}")
+        def gravar(conn):
+            remover_produto(conn, produto.id)
+        
+        def concluir(_):
+            messagebox.showinfo("Sucesso", "Produto excluído com sucesso!")
+            self.atualizar_abas()
+        
+        self.executar_escrita(gravar, concluir, "Erro ao excluir produto", "excluir produto",
+                              produtos=lambda _: [produto.id])
 
-    def registrar_venda(self):
-        """Registra uma venda de produto."""
+    def registrar_entrada(self):
+        """Soma ao estoque do produto selecionado uma entrada de mercadoria."""
         produto = self.obter_produto_selecionado()
         if not produto:
-            messagebox.showerror("Erro", "Selecione um produto para vender!")
+            messagebox.showerror("Erro", "Selecione um produto para registrar a entrada!")
             return
+        
+        quantidade = simpledialog.askinteger(
+            "Registrar Entrada", f"Quantidade recebida de '{produto.nome}':",
+            minvalue=1, parent=self.root)
+        if quantidade is None:
+            return
+        preco_custo = simpledialog.askstring(
+            "Registrar Entrada",
+            f"Preço de custo da entrada (atual: {formatar_moeda(produto.preco_custo)}).\n"
+            "Deixe vazio para manter o atual.",
+            parent=self.root)
+        if preco_custo is None:
+            return
+        try:
+            quantidade, preco_custo = validar_entrada(quantidade, preco_custo)
+        except ProdutoInvalido as e:
+            messagebox.showerror("Erro", str(e))
+            return
+
+        def gravar(conn):
+            registrar_entrada(conn, produto.id, quantidade, preco_custo)
+        
+        def concluir(_):
+            messagebox.showinfo("Sucesso", "Entrada registrada com sucesso!")
+            self.atualizar_abas()
+        
+        self.executar_escrita(gravar, concluir, "Erro ao registrar entrada", "registrar entrada",
+                              produtos=lambda _: [produto.id])
+
+    def ler_item_venda(self, reservado=0):
+        """Valida o produto selecionado e os campos de venda.
+        
+        `reservado` é a quantidade do produto que já está no carrinho.
+        Retorna o produto, a quantidade e o preço de venda em centavos, ou None.
+        """
+        produto = self.obter_produto_selecionado()
+        if not produto:
+            messagebox.showerror("Erro", "Selecione um produto para vender!")
+            return None
             
-        produto_id, nome, quantidade, preco_custo = produto
-        qtde_venda = self.entry_qtde_venda.get().strip()
-        preco_venda = self.entry_preco_venda.get().strip()
+        try:
+            _, qtde_venda, preco_venda = validar_item(
+                produto.id, self.entry_qtde_venda.get(), self.entry_preco_venda.get())
+        except ItemInvalido as e:
+            messagebox.showerror("Erro", str(e))
+            return None
 
-        if not qtde_venda.isdigit() or int(qtde_venda) <= 0:
-            messagebox.showerror("Erro", "Quantidade inválida para venda!")
+        if qtde_venda + reservado > produto.quantidade:
+            messagebox.showerror("Erro", "Quantidade em estoque insuficiente!")
+            return None
+
+        return produto, qtde_venda, preco_venda
+
+    def registrar_venda(self):
+        """Registra uma venda de produto."""
+        item = self.ler_item_venda()
+        if not item:
             return
             
-        qtde_venda = int(qtde_venda)
+        produto, qtde_venda, preco_venda = item
+        produto_id, nome = produto.id, produto.nome
+
+        # O estoque é conferido e baixado no banco, não a partir da tabela da tela
+        def gravar(conn):
+            return registrar_itens(conn, [(produto_id, qtde_venda, preco_venda)])
         
-        if qtde_venda > quantidade:
-            messagebox.showerror("Erro", "Quantidade em estoque insuficiente!")
-            return
+        def concluir(_):
+            messagebox.showinfo("Sucesso", 
+                f"Venda registrada:\n"
+                f"{qtde_venda} x {nome}\n"
+                f"Total: {formatar_moeda(qtde_venda * preco_venda)}")
             
-        try:
-            preco_venda = float(preco_venda)
-            if preco_venda <= 0:
-                raise ValueError
-        except ValueError:
-            messagebox.showerror("Erro", "Preço de venda inválido!")
+            self.limpar_campos_venda()
+            self.atualizar_abas()
+        
+        self.executar_escrita(gravar, concluir, "Erro ao registrar venda", "registrar venda",
+                              produtos=lambda _: [produto_id])
+
+    def adicionar_ao_carrinho(self):
+        """Adiciona o produto selecionado ao carrinho."""
+        produto = self.obter_produto_selecionado()
+        reservado = sum(qtd for produto_id, _, qtd, _ in self.carrinho.values()
+                        if produto and produto_id == produto.id)
+        
+        item = self.ler_item_venda(reservado)
+        if not item:
             return
+        
+        produto, qtde_venda, preco_venda = item
+        iid = str(self._proximo_item_carrinho)
+        self._proximo_item_carrinho += 1
+        self.carrinho[iid] = (produto.id, produto.nome, qtde_venda, preco_venda)
+        self.tree_carrinho.insert("", "end", iid=iid, values=(
+            produto.nome,
+            qtde_venda,
+            formatar_moeda(preco_venda),
+            formatar_moeda(qtde_venda * preco_venda)
+        ))
+        
+        self.limpar_campos_venda()
+        self.atualizar_total_carrinho()
 
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            try:
-                # Atualizar estoque
-                nova_quantidade = quantidade - qtde_venda
-                cursor.execute(
-                    "UPDATE produtos SET quantidade = ? WHERE id = ?",
-                    (nova_quantidade, produto_id))
-                
-                # Registrar venda
-                data_venda = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                cursor.execute(
-                    '''INSERT INTO vendas 
-                    (produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
-                    VALUES (?, ?, ?, ?, ?, ?)''',
-                    (produto_id, nome, qtde_venda, preco_venda, preco_custo, data_venda))
-                
-                conn.commit()
-                messagebox.showinfo("Sucesso", 
-                    f"Venda registrada:\n"
-                    f"{qtde_venda} x {nome}\n"
-                    f"Total: {locale.currency(qtde_venda * preco_venda, grouping=True)}")
-                
-                self.listar_produtos()
-                self.limpar_campos_venda()
-                self.atualizar_abas()
-            except sqlite3.Error as e:
-                conn.rollback()
-                messagebox.showerror("Erro", f"Erro ao registrar venda: {e}")
+    def remover_item_carrinho(self):
+        """Remove do carrinho os itens selecionados."""
+        for iid in self.tree_carrinho.selection():
+            self.tree_carrinho.delete(iid)
+            self.carrinho.pop(iid, None)
+        self.atualizar_total_carrinho()
+
+    def limpar_carrinho(self):
+        """Esvazia o carrinho."""
+        self.tree_carrinho.delete(*self.tree_carrinho.get_children())
+        self.carrinho.clear()
+        self.atualizar_total_carrinho()
+
+    def atualizar_total_carrinho(self):
+        """Atualiza o total exibido do carrinho."""
+        total = sum(qtd * preco for _, _, qtd, preco in self.carrinho.values())
+        self.lbl_total_carrinho.config(text=f"Total: {formatar_moeda(total)}")
+
+    def finalizar_venda(self):
+        """Grava todos os itens do carrinho numa única transação."""
+        if not self.carrinho:
+            messagebox.showerror("Erro", "O carrinho está vazio!")
+            return
+        
+        itens = [(produto_id, qtd, preco) for produto_id, _, qtd, preco in self.carrinho.values()]
+        total = sum(qtd * preco for _, qtd, preco in itens)
+        
+        def concluir(linhas):
+            messagebox.showinfo("Sucesso", 
+                f"Venda registrada:\n"
+                f"{len(linhas)} itens\n"
+                f"Total: {formatar_moeda(total)}")
+            
+            self.limpar_carrinho()
+            self.atualizar_abas()
+        
+        self.executar_escrita(lambda conn: registrar_itens(conn, itens), concluir,
+                              "Erro ao finalizar venda", "finalizar venda",
+                              produtos=lambda _: [produto_id for produto_id, _, _ in itens])
+
+    def formatar_produto(self, produto):
+        """Converte um produto do catálogo no formato da tabela de produtos."""
+        return (produto.id, (produto.nome, produto.id),
+                (produto.id, produto.nome, produto.quantidade, para_reais(produto.preco_custo)))
 
     def obter_produto_selecionado(self):
-        """Retorna o produto selecionado na tabela."""
+        """Retorna o produto selecionado na tabela, do catálogo em memória.
+
+        Toda linha exibida está no catálogo, que a thread do banco relê após
+        cada gravação; sem o produto (excluído desde então), retorna None.
+        """
         selecionado = self.tree_produtos.selection()
         if not selecionado:
             return None
-            
-        item = self.tree_produtos.item(selecionado[0])
-        produto_id = item['values'][0]
-        nome = item['values'][1]
-        quantidade = item['values'][2]
-        preco_custo = item['values'][3]
-        
-        return (produto_id, nome, quantidade, preco_custo)
+        return self.catalogo.obter(int(selecionado[0]))
 
     def listar_produtos(self, termo=None):
         """Lista os produtos na tabela."""
-        self.tree_produtos.delete(*self.tree_produtos.get_children())
+        self.termo_pesquisa = termo
+        self.marcar_versao(0)
+        self.tabela_produtos.recarregar()
+
+    def filtro_pesquisa(self):
+        """Retorna a condição SQL e os parâmetros da pesquisa atual."""
+        expressao = expressao_busca(self.termo_pesquisa)
+        if expressao:
+            return FILTRO_BUSCA, (expressao,)
+        return None, ()
+
+    def pagina_produtos(self, apos, antes, limite):
+        """Busca uma página de produtos ordenada por nome, aplicando a pesquisa atual."""
+        onde, parametros = self.filtro_pesquisa()
         
+        linhas = []
         with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            
-            if termo:
-                cursor.execute(
-                    '''SELECT id, nome, quantidade, preco_custo 
-                    FROM produtos 
-                    WHERE nome LIKE ? 
-                    ORDER BY nome''',
-                    (f"%{termo}%",))
-            else:
-                cursor.execute(
-                    '''SELECT id, nome, quantidade, preco_custo 
-                    FROM produtos 
-                    ORDER BY nome''')
-            
-            for linha in cursor.fetchall():
-                self.tree_produtos.insert("", "end", values=linha)
+            self.catalogo.atualizar(conn)
+            linhas = buscar_pagina(
+                conn,
+                "SELECT id, nome, quantidade, preco_custo FROM produtos",
+                ("nome", "id"), apos, antes, limite,
+                onde=onde, parametros=parametros)
+        
+        return [self.formatar_produto(produto) for produto in self.catalogo.guardar(linhas)]
+
+    def linhas_produtos(self, ids):
+        """Busca os produtos informados que atendem à pesquisa atual."""
+        onde, parametros = self.filtro_pesquisa()
+        
+        linhas = []
+        with self.conectar_banco() as conn:
+            linhas = buscar_por_ids(
+                conn, "SELECT id, nome, quantidade, preco_custo FROM produtos", ids,
+                onde=onde, parametros=parametros)
+        
+        return [self.formatar_produto(produto) for produto in self.catalogo.guardar(linhas)]
+
+    def agendar_pesquisa(self, event=None):
+        """Agenda a pesquisa enquanto o usuário digita, descartando a que ainda estava pendente."""
+        self.cancelar_pesquisa_agendada()
+        self._pesquisa_agendada = self.root.after(ATRASO_PESQUISA_MS, self.pesquisar_digitado)
+
+    def cancelar_pesquisa_agendada(self):
+        """Cancela a pesquisa pendente, se houver."""
+        if self._pesquisa_agendada is not None:
+            self.root.after_cancel(self._pesquisa_agendada)
+            self._pesquisa_agendada = None
+
+    def pesquisar_digitado(self):
+        """Executa a pesquisa agendada, ignorando teclas que não mudaram o termo."""
+        self._pesquisa_agendada = None
+        termo = self.entry_pesquisa.get().strip()
+        if termo != (self.termo_pesquisa or ""):
+            self.listar_produtos(termo)
 
     def buscar_produtos(self):
         """Busca produtos pelo nome."""
+        self.cancelar_pesquisa_agendada()
         termo = self.entry_pesquisa.get().strip()
         self.listar_produtos(termo)
 
     def limpar_pesquisa(self):
         """Limpa a pesquisa e lista todos os produtos."""
+        self.cancelar_pesquisa_agendada()
         self.entry_pesquisa.delete(0, tk.END)
         self.listar_produtos()
 
@@ -609,55 +1320,137 @@ class SistemaEstoque:
         self.entry_preco_venda.delete(0, tk.END)
 
     def exportar_relatorio(self):
-        """Exporta os dados para um arquivo Excel."""
-        with self.conectar_banco() as conn:
-            cursor = conn.cursor()
-            
-            # Criar arquivo Excel
-            wb = Workbook()
-            ws_produtos = wb.active
-            ws_produtos.title = "Produtos"
-            
-            # Cabeçalhos produtos
-            ws_produtos.append(["ID", "Nome", "Quantidade", "Preço Custo", "Valor Total"])
-            
-            # Dados produtos
-            cursor.execute("SELECT id, nome, quantidade, preco_custo FROM produtos ORDER BY nome")
-            for produto in cursor.fetchall():
-                ws_produtos.append([
-                    produto[0],
-                    produto[1],
-                    produto[2],
-                    produto[3],
-                    produto[2] * produto[3]  # Valor total
-                ])
-            
-            # Planilha de vendas
-            ws_vendas = wb.create_sheet("Vendas")
-            ws_vendas.append(["ID", "Produto", "Quantidade", "Preço Custo", "Preço Venda",
-                             "Total Custo", "Total Venda", "Lucro", "Data"])
-            
-            # Dados vendas
-            cursor.execute('''
-                SELECT id, nome_produto, quantidade, preco_custo, preco_venda,
-                       (quantidade * preco_custo), (quantidade * preco_venda),
-                       (quantidade * (preco_venda - preco_custo)), data_venda
-                FROM vendas
-                ORDER BY data_venda DESC
-            ''')
-            for venda in cursor.fetchall():
-                ws_vendas.append(list(venda))
-            
-            # Salvar arquivo
-            caminho_arquivo = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Arquivos Excel", "*.xlsx")],
-                title="Salvar relatório como"
-            )
-            
-            if caminho_arquivo:
-                wb.save(caminho_arquivo)
-                messagebox.showinfo("Sucesso", f"Dados exportados para:\n{caminho_arquivo}")
+        """Exporta os dados para Excel, CSV, Parquet ou uma cópia do banco.
+        
+        As vendas seguem o intervalo de datas filtrado na aba de relatórios.
+        """
+        periodo = self.periodo_relatorio
+        caminho_arquivo = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=formatos_disponiveis(),
+            title="Salvar relatório como"
+        )
+        if not caminho_arquivo:
+            return
+        
+        def exportar_arquivo(tarefa):
+            with self.conectar_banco() as conn:
+                return exportar(conn, caminho_arquivo, tarefa, *periodo)
+        
+        def concluir(arquivos):
+            self.encerrar_progresso()
+            messagebox.showinfo("Sucesso", "Dados exportados para:\n" + "\n".join(arquivos))
+        
+        tarefa = self.executor.submeter(
+            exportar_arquivo,
+            ao_concluir=concluir,
+            ao_erro=self.falha_exportacao,
+            ao_progresso=self.atualizar_progresso,
+            nome="exportar relatório")
+        self.acompanhar_tarefa(tarefa, "Exportando relatório...")
+
+    def arquivar_vendas_antigas(self):
+        """Move as vendas antigas para os arquivos anuais, mantendo os totais."""
+        dias = simpledialog.askinteger(
+            "Arquivar Vendas",
+            "Arquivar vendas com mais de quantos dias?\n"
+            "Elas continuam nos relatórios e nos totais.",
+            initialvalue=ARQUIVAR_APOS_DIAS, minvalue=1, parent=self.root)
+        if dias is None:
+            return
+        
+        def arquivar(tarefa):
+            with self.conectar_banco(escrita=True) as conn:
+                return arquivar_vendas(conn, dias, tarefa=tarefa)
+        
+        def concluir(movidas):
+            self.encerrar_progresso()
+            if movidas:
+                detalhes = "\n".join(f"{ano}: {quantidade} vendas" for ano, quantidade in movidas.items())
+                messagebox.showinfo("Sucesso", f"Vendas arquivadas:\n{detalhes}")
+            else:
+                messagebox.showinfo("Arquivar Vendas", "Nenhuma venda a arquivar.")
+        
+        def falhar(erro):
+            self.encerrar_progresso()
+            messagebox.showerror("Erro", f"Erro ao arquivar vendas: {erro}")
+        
+        tarefa = self.executor.submeter(
+            arquivar,
+            ao_concluir=concluir,
+            ao_erro=falhar,
+            ao_progresso=self.atualizar_progresso,
+            nome="arquivar vendas")
+        self.acompanhar_tarefa(tarefa, "Arquivando vendas...")
+
+    def sincronizar_lojas(self):
+        """Troca as alterações com as outras lojas pela pasta compartilhada."""
+        pasta = filedialog.askdirectory(title="Pasta de sincronização das lojas")
+        if not pasta:
+            return
+        
+        def sincronizar(tarefa):
+            with self.conectar_banco(escrita=True) as conn:
+                return sincronizar_pasta(conn, pasta, tarefa=tarefa)
+        
+        def concluir(relatorio):
+            self.encerrar_progresso()
+            messagebox.showinfo("Sincronização concluída", descrever_relatorio(relatorio))
+            self.atualizar_abas()
+        
+        def falhar(erro):
+            self.encerrar_progresso()
+            messagebox.showerror("Erro", f"Erro ao sincronizar: {erro}")
+        
+        tarefa = self.executor.submeter(
+            sincronizar,
+            ao_concluir=concluir,
+            ao_erro=falhar,
+            ao_progresso=self.atualizar_progresso,
+            nome="sincronizar lojas")
+        self.acompanhar_tarefa(tarefa, "Sincronizando lojas...")
+
+    def importar_produtos(self):
+        """Importa produtos em massa de um arquivo CSV ou Excel."""
+        caminho_arquivo = filedialog.askopenfilename(
+            filetypes=[("Planilhas", "*.csv *.xlsx"), ("Arquivos CSV", "*.csv"),
+                       ("Arquivos Excel", "*.xlsx")],
+            title="Importar produtos de"
+        )
+        if not caminho_arquivo:
+            return
+        
+        def importar(tarefa):
+            with self.conectar_banco(escrita=True) as conn:
+                return executar_transacao(
+                    conn, lambda conn: importar_produtos(conn, caminho_arquivo, tarefa))
+        
+        def concluir(resultado):
+            self.encerrar_progresso()
+            mensagem = (f"Produtos inseridos: {resultado['inseridos']}\n"
+                        f"Produtos atualizados: {resultado['atualizados']}\n"
+                        f"Linhas rejeitadas: {resultado['rejeitados']}")
+            if resultado["relatorio"]:
+                mensagem += f"\n\nMotivos das rejeições em:\n{resultado['relatorio']}"
+            messagebox.showinfo("Importação concluída", mensagem)
+            self.atualizar_abas()
+        
+        def falhar(erro):
+            self.encerrar_progresso()
+            messagebox.showerror("Erro", f"Erro ao importar produtos: {erro}")
+        
+        tarefa = self.executor.submeter(
+            importar,
+            ao_concluir=concluir,
+            ao_erro=falhar,
+            ao_progresso=self.atualizar_progresso,
+            nome="importar produtos")
+        self.acompanhar_tarefa(tarefa, "Importando produtos...")
+
+    def falha_exportacao(self, erro):
+        """Informa uma falha na exportação."""
+        self.encerrar_progresso()
+        messagebox.showerror("Erro", f"Erro ao exportar relatório: {erro}")
 
 if __name__ == "__main__":
     root = tk.Tk()
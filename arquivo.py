@@ -0,0 +1,223 @@
+import os
+import sqlite3
+from datetime import date, timedelta
+from banco import executar_transacao
+from relatorios import fechamento_atual, PERIODO_FECHADO, SUBTRAIR_DIA
+
+# Vendas mais antigas que isso podem ir para os arquivos anuais
+ARQUIVAR_APOS_DIAS = 365
+
+# Colunas gravadas de uma venda; as colunas geradas são recalculadas pelo SQLite
+COLUNAS_VENDA = "id, produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda"
+
+# Mesma estrutura de vendas no banco principal, um arquivo por ano
+CRIAR_VENDAS_ARQUIVO = '''
+    CREATE TABLE IF NOT EXISTS {0}.vendas (
+        id INTEGER PRIMARY KEY,
+        produto_id INTEGER NOT NULL,
+        nome_produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_venda INTEGER NOT NULL,
+        preco_custo INTEGER NOT NULL,
+        data_venda TEXT NOT NULL,
+        total_venda INTEGER GENERATED ALWAYS AS (quantidade * preco_venda) STORED,
+        total_custo INTEGER GENERATED ALWAYS AS (quantidade * preco_custo) STORED,
+        lucro INTEGER GENERATED ALWAYS AS (quantidade * (preco_venda - preco_custo)) STORED
+    )
+'''
+
+# Ao mover vendas para o arquivo, a exclusão não altera o diário, o resumo nem o consolidado
+NAO_ARQUIVANDO = "NOT (SELECT arquivando FROM vendas_fechamento WHERE id = 1)"
+
+
+def criar_arquivamento(conn):
+    """Registro dos arquivos anuais e gatilhos de exclusão que ignoram o arquivamento."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_arquivos (
+            ano TEXT PRIMARY KEY,
+            arquivo TEXT NOT NULL
+        )
+    ''')
+    # Vendas anteriores a `arquivado_ate` estão nos arquivos, não em vendas
+    conn.execute("ALTER TABLE vendas_fechamento ADD COLUMN arquivado_ate TEXT NOT NULL DEFAULT ''")
+    conn.execute("ALTER TABLE vendas_fechamento ADD COLUMN arquivando INTEGER NOT NULL DEFAULT 0")
+
+    for gatilho in ("vendas_diario_d", "vendas_resumo_d", "vendas_dia_d"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+    conn.execute(f'''
+        CREATE TRIGGER vendas_diario_d AFTER DELETE ON vendas
+        WHEN {NAO_ARQUIVANDO}
+        BEGIN
+            INSERT INTO alteracoes (tabela, linha_id, operacao) VALUES ('vendas', OLD.id, 'D');
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER vendas_resumo_d AFTER DELETE ON vendas
+        WHEN {NAO_ARQUIVANDO}
+        BEGIN
+            UPDATE resumo SET
+                total_vendas = total_vendas - OLD.total_venda,
+                total_custo = total_custo - OLD.total_custo,
+                lucro_total = lucro_total - OLD.lucro
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER vendas_dia_d AFTER DELETE ON vendas
+        WHEN {PERIODO_FECHADO.format("OLD")} AND {NAO_ARQUIVANDO}
+        BEGIN
+            {SUBTRAIR_DIA}
+        END
+    ''')
+
+
+def arquivado_ate(conn):
+    """Data até a qual (exclusive) as vendas foram movidas para os arquivos."""
+    linha = conn.execute("SELECT arquivado_ate FROM vendas_fechamento WHERE id = 1").fetchone()
+    return linha[0] if linha else ""
+
+
+def pasta_banco(conn):
+    """Pasta do banco principal, onde ficam os arquivos anuais."""
+    caminho = conn.execute("PRAGMA database_list").fetchone()[2]
+    return os.path.dirname(os.path.abspath(caminho)) if caminho else os.getcwd()
+
+
+def nome_arquivo(ano):
+    """Nome do arquivo com as vendas de um ano."""
+    return f"vendas_{ano}.db"
+
+
+def anexar_arquivos(conn, arquivos):
+    """Anexa à conexão os arquivos `{ano: arquivo}` e desanexa os que sobrarem.
+
+    Precisa rodar fora de transação. Retorna os apelidos anexados, do ano
+    mais antigo para o mais recente.
+    """
+    pasta = pasta_banco(conn)
+    desejados = {f"arquivo_{ano}": os.path.join(pasta, arquivo)
+                 for ano, arquivo in sorted(arquivos.items())}
+    anexados = {linha[1] for linha in conn.execute("PRAGMA database_list")}
+
+    for apelido in anexados:
+        if apelido.startswith("arquivo_") and apelido not in desejados:
+            conn.execute(f"DETACH DATABASE {apelido}")
+    for apelido, caminho in desejados.items():
+        if apelido not in anexados:
+            conn.execute(f"ATTACH DATABASE ? AS {apelido}", (caminho,))
+    return list(desejados)
+
+
+def fonte_vendas(conn, inicio=None, fim=None):
+    """Origem das vendas no intervalo `[inicio, fim]`, para usar após FROM.
+
+    Quando o intervalo alcança vendas já arquivadas, anexa os arquivos dos
+    anos necessários e devolve a união deles com a tabela principal; caso
+    contrário devolve apenas `vendas`. Precisa rodar fora de transação.
+    """
+    ate = arquivado_ate(conn)
+    if not ate or (inicio and inicio >= ate):
+        anexar_arquivos(conn, {})
+        return "vendas"
+
+    pasta = pasta_banco(conn)
+    arquivos = {ano: arquivo for ano, arquivo in conn.execute(
+        "SELECT ano, arquivo FROM vendas_arquivos WHERE ano >= ? AND ano <= ?",
+        ((inicio or "")[:4], (fim or "9999")[:4]))
+        if os.path.exists(os.path.join(pasta, arquivo))}
+
+    apelidos = anexar_arquivos(conn, arquivos)
+    if not apelidos:
+        return "vendas"
+
+    # `ate` vem do próprio banco e sempre é uma data AAAA-MM-DD
+    ate = date.fromisoformat(ate).isoformat()
+    colunas = COLUNAS_VENDA + ", total_venda, total_custo, lucro"
+    partes = [f"SELECT {colunas} FROM main.vendas"]
+    partes += [f"SELECT {colunas} FROM {apelido}.vendas WHERE data_venda < '{ate}'"
+               for apelido in reversed(apelidos)]
+    return "(" + " UNION ALL ".join(partes) + ")"
+
+
+def arquivar_vendas(conn, horizonte_dias=ARQUIVAR_APOS_DIAS, hoje=None, tarefa=None,
+                   compactar=False):
+    """Move as vendas mais antigas que o horizonte para arquivos SQLite anuais.
+
+    Só vendas de períodos já fechados são movidas, de modo que os totais
+    consolidados em vendas_por_dia e o resumo continuam cobrindo tudo. Cada
+    ano vai para `vendas_<ano>.db` ao lado do banco principal. Com
+    `compactar`, o banco principal é compactado ao final. Retorna
+    `{ano: vendas movidas}`.
+
+    Em modo WAL o SQLite não garante um commit atômico entre bancos
+    anexados, por isso copiar e excluir são transações separadas: cada ano
+    é copiado para o seu arquivo e conferido, e só então as vendas que já
+    estão nos arquivos saem do banco principal. Se o processo parar no
+    meio, basta arquivar de novo, pois a cópia pode ser repetida.
+    """
+    corte = min(((hoje or date.today()) - timedelta(days=horizonte_dias)).isoformat(),
+                fechamento_atual(conn))
+    anterior = arquivado_ate(conn)
+    if corte <= anterior:
+        return {}
+
+    anos = [ano for (ano,) in conn.execute(
+        "SELECT DISTINCT substr(data_venda, 1, 4) FROM vendas WHERE data_venda < ? ORDER BY 1",
+        (corte,))]
+    intervalos = {ano: (ano, min(corte, str(int(ano) + 1))) for ano in anos}
+    # ATTACH não pode rodar dentro da transação
+    registrados = dict(conn.execute("SELECT ano, arquivo FROM vendas_arquivos"))
+    arquivos = {ano: registrados.get(ano, nome_arquivo(ano)) for ano in anos}
+    anexar_arquivos(conn, arquivos)
+
+    def copiar(conn, ano):
+        apelido = f"arquivo_{ano}"
+        conn.execute(CRIAR_VENDAS_ARQUIVO.format(apelido))
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {apelido}.idx_vendas_data "
+                     "ON vendas (data_venda, id)")
+        conn.execute(
+            f'''INSERT OR IGNORE INTO {apelido}.vendas ({COLUNAS_VENDA})
+            SELECT {COLUNAS_VENDA} FROM main.vendas
+            WHERE data_venda >= ? AND data_venda < ?''', intervalos[ano])
+
+    def conferir(conn, ano):
+        faltando = conn.execute(
+            f'''SELECT COUNT(*) FROM main.vendas
+            WHERE data_venda >= ? AND data_venda < ?
+              AND id NOT IN (SELECT id FROM arquivo_{ano}.vendas)''',
+            intervalos[ano]).fetchone()[0]
+        if faltando:
+            raise sqlite3.DatabaseError(
+                f"{faltando} vendas de {ano} não foram copiadas para {arquivos[ano]}; "
+                "nenhuma venda foi excluída.")
+
+    def excluir(conn):
+        # Com `arquivando`, os gatilhos não descontam as vendas dos totais
+        conn.execute("UPDATE vendas_fechamento SET arquivando = 1 WHERE id = 1")
+        movidas = {}
+        for ano in anos:
+            movidas[ano] = conn.execute(
+                f'''DELETE FROM main.vendas
+                WHERE data_venda >= ? AND data_venda < ?
+                  AND id IN (SELECT id FROM arquivo_{ano}.vendas)''', intervalos[ano]).rowcount
+            conn.execute("INSERT OR IGNORE INTO vendas_arquivos (ano, arquivo) VALUES (?, ?)",
+                         (ano, arquivos[ano]))
+        conn.execute("UPDATE vendas_fechamento SET arquivando = 0, arquivado_ate = ? WHERE id = 1",
+                     (corte,))
+        return movidas
+
+    try:
+        for feito, ano in enumerate(anos):
+            # Só o arquivo do ano é gravado nesta transação
+            executar_transacao(conn, lambda conn: copiar(conn, ano))
+            conferir(conn, ano)
+            if tarefa is not None:
+                tarefa.informar_progresso(feito + 1, len(anos))
+        # E só o banco principal nesta
+        movidas = executar_transacao(conn, excluir)
+    finally:
+        anexar_arquivos(conn, {})
+
+    if compactar:
+        conn.execute("VACUUM")
+    return movidas
@@ -0,0 +1,226 @@
+import sqlite3
+import threading
+import queue
+import random
+import time
+from contextlib import contextmanager
+from metricas import conectar
+
+CAMINHO_BANCO = 'estoque.db'
+
+# Pragmas aplicados em toda conexão aberta pelo gerenciador
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class GerenciadorConexoes:
+    """Mantém uma conexão de escrita e um pequeno pool de conexões de leitura.
+
+    Com `metricas`, todas as instruções das conexões abertas são medidas.
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, tamanho_pool=3, cache_instrucoes=256,
+                 metricas=None):
+        self.caminho = caminho
+        self.tamanho_pool = tamanho_pool
+        self.cache_instrucoes = cache_instrucoes
+        self.metricas = metricas
+        self._trava_escrita = threading.RLock()
+        self._trava_pool = threading.Lock()
+        self._leitores = queue.LifoQueue()
+        self._abertas = []
+        self._escritor = None
+
+    def _abrir(self):
+        """Abre uma nova conexão já configurada com os pragmas."""
+        if self.metricas is not None:
+            conn = conectar(self.caminho, self.metricas,
+                            check_same_thread=False,
+                            cached_statements=self.cache_instrucoes)
+        else:
+            conn = sqlite3.connect(self.caminho,
+                                   check_same_thread=False,
+                                   cached_statements=self.cache_instrucoes)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        self._abertas.append(conn)
+        return conn
+
+    def _obter_leitor(self):
+        """Retira uma conexão de leitura do pool, criando-a se houver vaga."""
+        try:
+            return self._leitores.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._trava_pool:
+            # A conexão de escrita não conta no limite do pool
+            leitores_abertos = len(self._abertas) - (1 if self._escritor else 0)
+            if leitores_abertos < self.tamanho_pool:
+                return self._abrir()
+
+        return self._leitores.get()
+
+    @contextmanager
+    def leitura(self):
+        """Empresta uma conexão de leitura do pool."""
+        conn = self._obter_leitor()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._leitores.put(conn)
+
+    @contextmanager
+    def escrita(self):
+        """Empresta a conexão única de escrita, serializando os escritores."""
+        with self._trava_escrita:
+            if self._escritor is None:
+                with self._trava_pool:
+                    self._escritor = self._abrir()
+            try:
+                yield self._escritor
+            finally:
+                # Alterações não confirmadas são descartadas, como ao fechar a conexão
+                if self._escritor.in_transaction:
+                    self._escritor.rollback()
+
+    def fechar(self):
+        """Fecha todas as conexões abertas."""
+        with self._trava_escrita, self._trava_pool:
+            # Atualiza as estatísticas que o planejador usa para escolher os índices
+            if self._escritor is not None:
+                try:
+                    self._escritor.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+            for conn in self._abertas:
+                conn.close()
+            self._abertas.clear()
+            self._escritor = None
+            while not self._leitores.empty():
+                self._leitores.get_nowait()
+
+
+def banco_ocupado(erro):
+    """Indica se o erro é de banco ocupado/travado por outra conexão."""
+    codigo = getattr(erro, "sqlite_errorcode", None)
+    if codigo is not None:
+        return codigo & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(erro) or "busy" in str(erro)
+
+
+def executar_transacao(conn, funcao, tentativas=6, espera=0.05):
+    """Executa `funcao(conn)` dentro de BEGIN IMMEDIATE e faz commit.
+
+    A trava de escrita é obtida já no início, de modo que as leituras feitas
+    por `funcao` continuam válidas até o commit. Se outro processo estiver
+    escrevendo, a transação inteira é repetida com espera exponencial.
+    """
+    for tentativa in range(tentativas):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            resultado = funcao(conn)
+            conn.commit()
+            return resultado
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not banco_ocupado(e) or tentativa == tentativas - 1:
+                raise
+            time.sleep(espera * 2 ** tentativa + random.uniform(0, espera))
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+def versao_atual(conn):
+    """Retorna o número da última alteração registrada no diário."""
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes").fetchone()[0]
+
+
+def ler_alteracoes(conn, desde, limite=500):
+    """Lê do diário as linhas alteradas após a versão `desde`.
+
+    Retorna a versão atual e um dicionário {tabela: conjunto de ids}. O
+    dicionário é None quando não há versão anterior ou quando as alterações
+    passam do limite, situações em que recarregar tudo sai mais barato.
+    """
+    seq = versao_atual(conn)
+    if seq == desde:
+        return seq, {}
+    if desde is None or seq < desde:
+        return seq, None
+
+    # O trecho desejado já foi podado do diário
+    menor = conn.execute("SELECT MIN(seq) FROM alteracoes").fetchone()[0]
+    if menor is None or menor > desde + 1:
+        return seq, None
+
+    cursor = conn.execute(
+        '''SELECT DISTINCT tabela, linha_id FROM alteracoes
+        WHERE seq > ? AND seq <= ?
+        LIMIT ?''',
+        (desde, seq, limite + 1))
+    linhas = cursor.fetchall()
+    if len(linhas) > limite:
+        return seq, None
+
+    alteradas = {}
+    for tabela, linha_id in linhas:
+        alteradas.setdefault(tabela, set()).add(linha_id)
+    return seq, alteradas
+
+
+def podar_alteracoes(conn, manter=10000):
+    """Remove do diário as entradas mais antigas, mantendo as últimas `manter`."""
+    conn.execute("DELETE FROM alteracoes WHERE seq <= ?", (versao_atual(conn) - manter,))
+
+
+# Soma de uma coluna de vendas, incluindo as vendas arquivadas pelos totais consolidados por dia
+SOMA_VENDAS = '''SELECT
+    (SELECT COALESCE(SUM({0}), 0) FROM vendas) +
+    (SELECT COALESCE(SUM({0}), 0) FROM vendas_por_dia
+     WHERE dia < (SELECT arquivado_ate FROM vendas_fechamento WHERE id = 1))'''
+
+# Colunas da tabela resumo (em centavos) e a expressão que as recalcula a partir das tabelas brutas
+COLUNAS_RESUMO = (
+    ("valor_estoque", "SELECT COALESCE(SUM(quantidade * preco_custo), 0) FROM produtos"),
+    ("total_vendas", SOMA_VENDAS.format("total_venda")),
+    ("total_custo", SOMA_VENDAS.format("total_custo")),
+    ("lucro_total", SOMA_VENDAS.format("lucro")),
+)
+
+
+def ler_resumo(conn):
+    """Lê os totais materializados como um dicionário."""
+    colunas = ", ".join(nome for nome, _ in COLUNAS_RESUMO)
+    linha = conn.execute(f"SELECT {colunas} FROM resumo WHERE id = 1").fetchone()
+    return dict(zip((nome for nome, _ in COLUNAS_RESUMO), linha or (0,) * len(COLUNAS_RESUMO)))
+
+
+def reconciliar_resumo(conn):
+    """Recalcula o resumo a partir das tabelas brutas e corrige a linha materializada.
+
+    Retorna um dicionário {coluna: (valor_materializado, valor_recalculado)}
+    apenas com as colunas que divergiam. Não faz commit.
+    """
+    atual = ler_resumo(conn)
+    recalculado = {nome: conn.execute(sql).fetchone()[0] for nome, sql in COLUNAS_RESUMO}
+
+    divergencias = {nome: (atual[nome], valor)
+                    for nome, valor in recalculado.items()
+                    if atual[nome] != valor}
+
+    atribuicoes = ", ".join(f"{nome} = :{nome}" for nome in recalculado)
+    conn.execute("INSERT OR IGNORE INTO resumo (id) VALUES (1)")
+    conn.execute(f"UPDATE resumo SET {atribuicoes} WHERE id = 1", recalculado)
+    return divergencias
@@ -0,0 +1,319 @@
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from banco import ler_resumo, podar_alteracoes
+from dinheiro import para_reais, formatar_moedas
+from exportacao import exportar
+from arquivo import fonte_vendas
+from motor import MotorEstoque, consultar_produtos, CONSULTA_PRODUTOS
+from relatorios import agregar_vendas, resumir_produtos, totalizar_vendas, fechar_periodos
+from reposicao import FilaReposicao, recalcular_giro
+from tabela_virtual import TabelaVirtual, buscar_pagina, buscar_por_ids
+from vendas import registrar_itens
+
+# Medição de desempenho com dados sintéticos: gera um banco reprodutível a
+# partir de uma semente e mede as consultas e renderizações da interface,
+# comparando o resultado com uma linha de base salva.
+
+SEMENTE_PADRAO = 42
+TAMANHO_LOTE = 50000
+
+# Regressão: mais lento que a linha de base além da tolerância e da folga,
+# que absorve o ruído das medições de menos de um milissegundo
+TOLERANCIA_PADRAO = 0.20
+FOLGA_MS = 0.5
+
+# Mesmos limites da aba de relatórios
+LIMITE_AGRUPADO = 5000
+LIMITE_MAIS_VENDIDOS = 10
+
+# Partes dos nomes dos produtos gerados, com acentos para exercitar a busca
+ITENS = ("Caneta", "Caderno", "Lápis", "Borracha", "Régua", "Parafuso", "Porca", "Arruela",
+         "Martelo", "Alicate", "Chave", "Fita", "Cola", "Tesoura", "Grampo", "Pincel",
+         "Tinta", "Lixa", "Broca", "Serrote", "Café", "Açúcar", "Feijão", "Sabão")
+VARIANTES = ("Azul", "Preto", "Vermelho", "Grande", "Pequeno", "Médio", "Inox", "Econômico",
+             "Reforçado", "Premium", "Básico", "Colorido")
+
+
+def gerar_dados(caminho, produtos=10000, vendas=100000, dias=730, semente=SEMENTE_PADRAO,
+                hoje=None, tarefa=None):
+    """Cria um banco novo com produtos e vendas sintéticos.
+
+    Os mesmos parâmetros geram sempre os mesmos dados (as datas terminam
+    em `hoje`). As vendas se distribuem pelos últimos `dias` em ordem
+    cronológica e se concentram nos produtos populares, como numa loja
+    real. Retorna as contagens geradas.
+    """
+    if os.path.exists(caminho):
+        raise FileExistsError(f"O arquivo já existe: {caminho}")
+
+    rng = random.Random(semente)
+    hoje = hoje or date.today()
+    motor = MotorEstoque(caminho)
+    try:
+        custos, nomes = [], []
+        with motor.banco.escrita() as conn:
+            for inicio in range(0, produtos, TAMANHO_LOTE):
+                lote = []
+                for numero in range(inicio + 1, min(inicio + TAMANHO_LOTE, produtos) + 1):
+                    nome = f"{rng.choice(ITENS)} {rng.choice(VARIANTES)} {numero}"
+                    custo = rng.randint(50, 50000)
+                    nomes.append(nome)
+                    custos.append(custo)
+                    lote.append((nome, rng.randint(100, 5000), custo))
+                conn.executemany(
+                    "INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, ?, ?)", lote)
+                conn.commit()
+
+            primeira = datetime.combine(hoje - timedelta(days=dias), datetime.min.time())
+            intervalo = dias * 86400 / max(vendas, 1)
+            for inicio in range(0, vendas, TAMANHO_LOTE):
+                lote = []
+                for numero in range(inicio, min(inicio + TAMANHO_LOTE, vendas)):
+                    # Poucos produtos concentram a maior parte das vendas
+                    indice = int(produtos * rng.random() ** 3)
+                    custo = custos[indice]
+                    data = primeira + timedelta(seconds=int(numero * intervalo))
+                    lote.append((indice + 1, nomes[indice], rng.randint(1, 5),
+                                 custo + custo * rng.randint(10, 100) // 100, custo,
+                                 data.strftime("%Y-%m-%d %H:%M:%S")))
+                conn.executemany(
+                    '''INSERT INTO vendas
+                    (produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+                    VALUES (?, ?, ?, ?, ?, ?)''', lote)
+                conn.commit()
+                if tarefa is not None:
+                    tarefa.informar_progresso(min(inicio + TAMANHO_LOTE, vendas), vendas)
+
+            # As vendas foram inseridas direto, sem passar por registrar_itens
+            recalcular_giro(conn, datetime.combine(hoje, datetime.min.time()))
+            fechar_periodos(conn, hoje)
+            podar_alteracoes(conn)
+            conn.commit()
+            conn.execute("ANALYZE")
+    finally:
+        motor.fechar()
+    return {"produtos": produtos, "vendas": vendas}
+
+
+def percentil(ordenados, p):
+    """Percentil `p` (0 a 100) de uma lista ordenada, pelo método do posto mais próximo."""
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def medir(funcao, repeticoes, aquecimento=1):
+    """Executa `funcao` várias vezes e retorna os tempos, em segundos, ordenados."""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos
+
+
+def estatisticas(tempos):
+    """Latências em milissegundos e vazão (operações por segundo) de uma medição."""
+    return {
+        "n": len(tempos),
+        "p50_ms": percentil(tempos, 50) * 1000,
+        "p95_ms": percentil(tempos, 95) * 1000,
+        "p99_ms": percentil(tempos, 99) * 1000,
+        "max_ms": tempos[-1] * 1000,
+        "ops_s": len(tempos) / sum(tempos) if sum(tempos) else float("inf"),
+    }
+
+
+class Bancada:
+    """Cenários de medição sobre um banco, reproduzindo o que a interface faz.
+
+    As vendas registradas são desfeitas ao fim de cada medição, de modo que
+    o banco não muda. Os cenários de interface só existem quando há uma
+    tela disponível (uma tela virtual, como a do Xvfb, serve).
+    """
+
+    def __init__(self, caminho, semente=SEMENTE_PADRAO):
+        self.motor = MotorEstoque(caminho)
+        self.rng = random.Random(semente)
+        self.pasta_exportacao = tempfile.mkdtemp(prefix="bench_")
+        with self.motor.banco.leitura() as conn:
+            self.produtos = conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0]
+            self.vendas = conn.execute("SELECT COUNT(*) FROM vendas").fetchone()[0]
+            # Amostra de chaves para buscar páginas e linhas em posições variadas
+            maior_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM produtos").fetchone()[0]
+            ids = self.rng.sample(range(1, maior_id + 1), min(1000, maior_id))
+            self.chaves = [(nome, produto_id) for produto_id, nome in buscar_por_ids(
+                conn, "SELECT id, nome FROM produtos", ids)]
+            self.ultima_venda = conn.execute("SELECT MAX(data_venda) FROM vendas").fetchone()[0]
+        self.fim_mes = (self.ultima_venda or date.today().isoformat())[:10]
+        self.inicio_mes = (date.fromisoformat(self.fim_mes) - timedelta(days=30)).isoformat()
+        self.root = self.tree = self.agrupado = None
+        self.abrir_interface()
+
+    def abrir_interface(self):
+        """Cria uma janela com uma Treeview para medir a renderização, se houver tela."""
+        try:
+            import tkinter as tk
+            from tkinter import ttk
+            self.root = tk.Tk()
+        except Exception:  # Sem Tk instalado ou sem tela (TclError)
+            return
+        self.tree = ttk.Treeview(self.root, columns=tuple(range(8)), show="headings", height=20)
+        scroll = ttk.Scrollbar(self.root, command=self.tree.yview)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+        self.tabela = TabelaVirtual(self.tree, scroll, self.pagina_produtos)
+        self.root.update()
+
+    def fechar(self):
+        """Fecha o banco, a janela e remove os arquivos exportados."""
+        if self.root is not None:
+            self.root.destroy()
+        self.motor.fechar()
+        shutil.rmtree(self.pasta_exportacao, ignore_errors=True)
+
+    # Cenários
+
+    def pagina_produtos(self, apos=None, antes=None, limite=100):
+        """Página de produtos no formato da tabela da interface."""
+        linhas = self.motor.ler(buscar_pagina, CONSULTA_PRODUTOS, ("nome", "id"),
+                                apos, antes, limite)
+        return [(produto_id, (nome, produto_id), (produto_id, nome, qtd, para_reais(preco)))
+                for produto_id, nome, qtd, preco in linhas]
+
+    def pagina_aleatoria(self):
+        return self.pagina_produtos(apos=tuple(self.rng.choice(self.chaves)))
+
+    def pesquisar(self):
+        return self.motor.ler(consultar_produtos, self.rng.choice(ITENS)[:3])
+
+    def linhas_por_id(self):
+        ids = [produto_id for _, produto_id in self.rng.sample(self.chaves, min(50, len(self.chaves)))]
+        return self.motor.ler(buscar_por_ids, CONSULTA_PRODUTOS, ids)
+
+    def pagina_vendas(self):
+        def consultar(conn):
+            consulta = f'''SELECT id, nome_produto, quantidade, preco_custo, preco_venda,
+                                  total_custo, total_venda, lucro, data_venda
+                           FROM {fonte_vendas(conn)}'''
+            return buscar_pagina(conn, consulta, ("data_venda", "id"), None, None, 100,
+                                 descendente=True)
+        return [formatar_moedas(linha[3:8]) for linha in self.motor.ler(consultar)]
+
+    def analise(self, agrupamento, inicio=None, fim=None):
+        """Consultas da aba de relatórios num mesmo instantâneo, como na interface."""
+        def consultar(conn):
+            conn.execute("BEGIN")
+            totais = totalizar_vendas(conn, inicio, fim) if inicio or fim else ler_resumo(conn)
+            mais_vendidos = resumir_produtos(conn, inicio, fim, LIMITE_MAIS_VENDIDOS)
+            agrupado = agregar_vendas(conn, agrupamento, inicio, fim, LIMITE_AGRUPADO)
+            return totais, mais_vendidos, agrupado
+        return self.motor.ler(consultar)
+
+    def registrar_venda(self):
+        itens = [(produto_id, 1, 1000) for _, produto_id in self.rng.sample(self.chaves, 3)]
+        with self.motor.banco.escrita() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                registrar_itens(conn, itens)
+            finally:
+                conn.rollback()
+
+    def carregar_fila_reposicao(self):
+        def carregar(conn):
+            fila = FilaReposicao()
+            fila.atualizar(conn)
+            return fila.em_risco()
+        return self.motor.ler(carregar)
+
+    def exportar(self, extensao, inicio=None, fim=None):
+        caminho = os.path.join(self.pasta_exportacao, "relatorio" + extensao)
+        return self.motor.ler(exportar, caminho, None, inicio, fim)
+
+    def renderizar_pagina(self):
+        self.tabela.recarregar()
+        self.root.update()
+
+    def renderizar_agrupado(self):
+        # A consulta já tem cenário próprio; aqui só conta a inserção na Treeview
+        if self.agrupado is None:
+            self.agrupado = self.analise("dia")[2]
+        self.tree.delete(*self.tree.get_children())
+        for periodo, produto_id, nome, qtd, vendas, *valores in self.agrupado:
+            self.tree.insert("", "end", iid=f"{periodo}:{produto_id}", values=(
+                periodo, nome, qtd, vendas, *formatar_moedas(valores)))
+        self.root.update()
+
+    def cenarios(self):
+        """Lista de `(nome, função, pesado)`; os pesados rodam menos vezes."""
+        cenarios = [
+            ("produtos: primeira página", self.pagina_produtos, False),
+            ("produtos: página aleatória", self.pagina_aleatoria, False),
+            ("produtos: pesquisa", self.pesquisar, False),
+            ("produtos: linhas por id", self.linhas_por_id, False),
+            ("vendas: primeira página", self.pagina_vendas, False),
+            ("relatórios: último mês por dia",
+             lambda: self.analise("dia", self.inicio_mes, self.fim_mes), False),
+            ("relatórios: tudo por mês", lambda: self.analise("mes"), True),
+            ("relatórios: tudo por semana", lambda: self.analise("semana"), True),
+            ("venda: registrar 3 itens", self.registrar_venda, False),
+            ("estoque: posição ao fim do dia",
+             lambda: self.motor.estoque_em(date.today().isoformat()), False),
+            ("reposição: produtos em risco", self.motor.reposicao, False),
+            ("reposição: carregar a fila", self.carregar_fila_reposicao, False),
+            ("exportar: CSV do último mês",
+             lambda: self.exportar(".csv", self.inicio_mes, self.fim_mes), True),
+            ("exportar: CSV completo", lambda: self.exportar(".csv"), True),
+        ]
+        if self.root is not None:
+            cenarios += [
+                ("interface: página na Treeview", self.renderizar_pagina, False),
+                ("interface: relatório agrupado na Treeview", self.renderizar_agrupado, False),
+            ]
+        return cenarios
+
+    def executar(self, repeticoes=20, filtro=None, ao_medir=None):
+        """Mede os cenários cujo nome contém `filtro` e retorna `{nome: estatísticas}`."""
+        resultados = {}
+        for nome, funcao, pesado in self.cenarios():
+            if filtro and filtro not in nome:
+                continue
+            vezes = max(3, repeticoes // 10) if pesado else repeticoes
+            resultados[nome] = estatisticas(medir(funcao, vezes))
+            if ao_medir is not None:
+                ao_medir(nome, resultados[nome])
+        return resultados
+
+
+def salvar_linha_base(caminho, resultados, produtos, vendas):
+    """Grava os resultados como a linha de base das próximas comparações."""
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"produtos": produtos, "vendas": vendas, "cenarios": resultados},
+                  arquivo, ensure_ascii=False, indent=2)
+
+
+def ler_linha_base(caminho):
+    """Lê uma linha de base gravada por `salvar_linha_base`."""
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def comparar(resultados, base, tolerancia=TOLERANCIA_PADRAO):
+    """Lista as regressões `(cenário, métrica, antes_ms, agora_ms)` frente à linha de base."""
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = base["cenarios"].get(nome)
+        if anterior is None:
+            continue
+        for metrica in ("p50_ms", "p95_ms"):
+            antes, agora = anterior[metrica], atual[metrica]
+            if agora > antes * (1 + tolerancia) and agora - antes > FOLGA_MS:
+                regressoes.append((nome, metrica, antes, agora))
+    return regressoes
@@ -0,0 +1,59 @@
+import re
+
+# Índice FTS5 sobre produtos.nome: sem acento, sem diferenciar maiúsculas e com prefixos indexados
+CRIAR_INDICE_BUSCA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5(
+        nome,
+        content='produtos',
+        content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2",
+        prefix='1 2 3'
+    )
+'''
+
+# Gatilhos que mantêm o índice em sincronia com a tabela de produtos
+GATILHOS_BUSCA = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_i AFTER INSERT ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (rowid, nome) VALUES (NEW.id, NEW.nome);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_d AFTER DELETE ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (produtos_busca, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_u AFTER UPDATE OF nome ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (produtos_busca, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+        INSERT INTO produtos_busca (rowid, nome) VALUES (NEW.id, NEW.nome);
+    END
+    ''',
+)
+
+FILTRO_BUSCA = "id IN (SELECT rowid FROM produtos_busca WHERE produtos_busca MATCH ?)"
+
+
+def criar_indice_busca(conn):
+    """Cria o índice de busca e seus gatilhos, populando-o se ainda não existia."""
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'produtos_busca'").fetchone()
+    conn.execute(CRIAR_INDICE_BUSCA)
+    for gatilho in GATILHOS_BUSCA:
+        conn.execute(gatilho)
+    if not existia:
+        conn.execute("INSERT INTO produtos_busca (produtos_busca) VALUES ('rebuild')")
+
+
+def expressao_busca(termo):
+    """Converte o texto digitado numa consulta FTS5 em que cada palavra é um prefixo.
+
+    Retorna None quando o termo não contém nenhuma palavra pesquisável.
+    """
+    palavras = re.findall(r"\w+", termo or "")
+    if not palavras:
+        return None
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
@@ -0,0 +1,106 @@
+import threading
+import unicodedata
+from banco import ler_alteracoes
+from tabela_virtual import buscar_por_ids
+
+# Cópia em memória do cadastro de produtos, para a interface consultar o
+# produto selecionado sem reler o banco nem reinterpretar os textos do
+# Treeview. As tabelas de produtos e de estoque a aquecem com as linhas que
+# exibem, de modo que toda linha na tela tem o seu produto em memória.
+
+CONSULTA_CATALOGO = "SELECT id, nome, quantidade, preco_custo FROM produtos"
+
+
+def normalizar_nome(nome):
+    """Nome sem acentos, sem diferenciar maiúsculas e com os espaços simplificados."""
+    sem_acento = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode()
+    return " ".join(sem_acento.casefold().split())
+
+
+class Produto:
+    """Produto do catálogo, com o preço de custo em centavos."""
+
+    __slots__ = ("id", "nome", "quantidade", "preco_custo")
+
+    def __init__(self, produto_id, nome, quantidade, preco_custo):
+        self.id = produto_id
+        self.nome = nome
+        self.quantidade = quantidade
+        self.preco_custo = preco_custo
+
+    def __repr__(self):
+        return f"Produto({self.id}, {self.nome!r}, {self.quantidade}, {self.preco_custo})"
+
+
+class CatalogoProdutos:
+    """Produtos em memória, por id e por nome normalizado.
+
+    Só guarda os produtos já lidos do banco. Quem grava um produto chama
+    `carregar` depois do commit; `atualizar` relê, pelo diário de
+    alterações, os produtos guardados que foram gravados fora da interface
+    (serviço, sincronização, outro processo). Escrito pela thread do banco
+    e lido pela interface, por isso cada operação segura a trava.
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._por_id = {}
+        self._por_nome = {}  # nome normalizado: {produto_id}
+        self.versao = None
+
+    def _guardar(self, produto):
+        anterior = self._por_id.get(produto.id)
+        if anterior is not None:
+            self._descartar(anterior)
+        self._por_id[produto.id] = produto
+        self._por_nome.setdefault(normalizar_nome(produto.nome), set()).add(produto.id)
+
+    def _descartar(self, produto):
+        del self._por_id[produto.id]
+        nome = normalizar_nome(produto.nome)
+        ids = self._por_nome.get(nome)
+        if ids is not None:
+            ids.discard(produto.id)
+            if not ids:
+                del self._por_nome[nome]
+
+    def guardar(self, linhas):
+        """Guarda as linhas `(id, nome, quantidade, preco_custo)` lidas do banco; retorna os produtos."""
+        produtos = [Produto(*linha) for linha in linhas]
+        with self._trava:
+            for produto in produtos:
+                self._guardar(produto)
+        return produtos
+
+    def obter(self, produto_id):
+        """Produto guardado com esse id, ou None se ele não estiver em memória."""
+        with self._trava:
+            return self._por_id.get(produto_id)
+
+    def com_nome(self, nome):
+        """Produtos guardados com o mesmo nome normalizado, em ordem de id."""
+        with self._trava:
+            return [self._por_id[produto_id]
+                    for produto_id in sorted(self._por_nome.get(normalizar_nome(nome), ()))]
+
+    def carregar(self, conn, ids):
+        """Relê do banco os produtos informados; os que não existem mais saem do catálogo."""
+        ids = list(ids)
+        encontrados = {produto.id for produto in
+                       self.guardar(buscar_por_ids(conn, CONSULTA_CATALOGO, ids))}
+        with self._trava:
+            for produto_id in ids:
+                anterior = self._por_id.get(produto_id)
+                if anterior is not None and produto_id not in encontrados:
+                    self._descartar(anterior)
+
+    def atualizar(self, conn):
+        """Relê os produtos guardados que mudaram desde a versão anterior do diário."""
+        seq, alteradas = ler_alteracoes(conn, self.versao)
+        with self._trava:
+            guardados = set(self._por_id)
+        if alteradas is None:
+            self.carregar(conn, guardados)
+        elif "produtos" in alteradas:
+            self.carregar(conn, alteradas["produtos"] & guardados)
+        self.versao = seq
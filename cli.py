@@ -0,0 +1,385 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from datetime import date
+from arquivo import arquivar_vendas, ARQUIVAR_APOS_DIAS
+from banco import CAMINHO_BANCO
+from benchmark import (Bancada, gerar_dados, salvar_linha_base, ler_linha_base, comparar,
+                       SEMENTE_PADRAO, TOLERANCIA_PADRAO)
+from dinheiro import para_reais, formatar_moeda
+from exportacao import exportar, montar_consultas
+from importacao import importar_produtos
+from metricas import Metricas, ARQUIVO_LENTAS
+from motor import MotorEstoque
+from relatorios import agregar_vendas, resumir_produtos, interpretar_data, PERIODOS
+from reposicao import recalcular_giro, LIMITE_ALERTAS
+from sincronizacao import sincronizar_pasta, sincronizar_servidor, descrever_relatorio, ErroSincronizacao
+
+# Operações em lote sem interface gráfica, para agendamentos (cron) e scripts.
+# Não importa Tk nem PIL: roda em servidores sem tela. Os dados vão para a
+# saída padrão à medida que são lidos; progresso e mensagens vão para stderr.
+
+TAMANHO_LOTE = 5000
+
+
+class ProgressoTerminal:
+    """Faz o papel da tarefa do executor, mostrando o progresso em stderr."""
+
+    def __init__(self, rotulo, saida=sys.stderr):
+        self.rotulo = rotulo
+        self.saida = saida
+        self.interativo = saida.isatty()
+
+    def informar_progresso(self, feito, total=None):
+        """Mostra o progresso; fora de um terminal, não escreve nada."""
+        if not self.interativo:
+            return
+        if total:
+            texto = f"{self.rotulo}: {feito}/{total} ({feito * 100 // total}%)"
+        else:
+            texto = f"{self.rotulo}: {feito}"
+        self.saida.write("\r" + texto)
+        self.saida.flush()
+
+    def concluir(self):
+        """Termina a linha de progresso."""
+        if self.interativo:
+            self.saida.write("\n")
+
+
+def mensagem(texto):
+    """Escreve uma mensagem para o usuário em stderr."""
+    print(texto, file=sys.stderr)
+
+
+def data_argumento(texto):
+    """Tipo de argumento para datas DD/MM/AAAA ou AAAA-MM-DD."""
+    try:
+        return interpretar_data(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto!r}") from None
+
+
+def linhas_vendas(conn, inicio, fim):
+    """Percorre as vendas do intervalo em lotes, sem carregá-las todas na memória."""
+    titulo, colunas, sql, parametros = montar_consultas(conn, inicio, fim)[1]
+    yield [nome for nome, _ in colunas]
+    cursor = conn.execute(sql, parametros)
+    while True:
+        linhas = cursor.fetchmany(TAMANHO_LOTE)
+        if not linhas:
+            break
+        yield from linhas
+
+
+def comando_exportar(motor, args):
+    """Exporta o relatório para um arquivo, como o botão da interface."""
+    progresso = ProgressoTerminal("Exportando")
+    arquivos = motor.ler(exportar, args.arquivo, progresso, args.de, args.ate)
+    progresso.concluir()
+    for arquivo in arquivos:
+        print(arquivo)
+
+
+def comando_importar(motor, args):
+    """Importa produtos de um CSV ou XLSX."""
+    progresso = ProgressoTerminal("Importando")
+    resultado = motor.escrever(importar_produtos, args.arquivo, progresso)
+    progresso.concluir()
+    print(f"inseridos={resultado['inseridos']} atualizados={resultado['atualizados']} "
+          f"rejeitados={resultado['rejeitados']}")
+    if resultado["relatorio"]:
+        mensagem(f"Motivos das rejeições em: {resultado['relatorio']}")
+    return 1 if resultado["rejeitados"] else 0
+
+
+def comando_relatorio(motor, args):
+    """Escreve o relatório em CSV na saída padrão, com valores em reais."""
+    escritor = csv.writer(sys.stdout)
+    if args.agrupar == "vendas":
+        with motor.banco.leitura() as conn:
+            for linha in linhas_vendas(conn, args.de, args.ate):
+                escritor.writerow(linha)
+    elif args.agrupar == "produto":
+        escritor.writerow(["ID", "Produto", "Quantidade", "Vendas",
+                           "Total Venda", "Total Custo", "Lucro"])
+        for produto_id, nome, qtd, vendas, *valores in motor.ler(
+                resumir_produtos, args.de, args.ate, args.limite):
+            escritor.writerow([produto_id, nome, qtd, vendas, *map(para_reais, valores)])
+    else:
+        escritor.writerow(["Período", "ID", "Produto", "Quantidade", "Vendas",
+                           "Total Venda", "Total Custo", "Lucro"])
+        for periodo, produto_id, nome, qtd, vendas, *valores in motor.ler(
+                agregar_vendas, args.agrupar, args.de, args.ate, args.limite):
+            escritor.writerow([periodo, produto_id, nome, qtd, vendas, *map(para_reais, valores)])
+    sys.stdout.flush()
+
+    totais = motor.totais(args.de, args.ate)
+    mensagem(f"Total em Vendas: {formatar_moeda(totais['total_vendas'])} | "
+             f"Custos: {formatar_moeda(totais['total_custo'])} | "
+             f"Lucro: {formatar_moeda(totais['lucro_total'])}")
+
+
+def comando_estoque(motor, args):
+    """Escreve em CSV o estoque de cada produto ao fim do dia informado."""
+    data = args.em or date.today().isoformat()
+    linhas, totais = motor.estoque_em(data)
+    escritor = csv.writer(sys.stdout)
+    escritor.writerow(["ID", "Produto", "Quantidade", "Preço de Custo", "Valor"])
+    for produto_id, nome, qtd, custo, valor in linhas:
+        escritor.writerow([produto_id, nome, qtd, para_reais(custo), para_reais(valor)])
+    sys.stdout.flush()
+    mensagem(f"Estoque em {data}: {totais['quantidade']} unidades | "
+             f"Valor: {formatar_moeda(totais['valor_estoque'])}")
+
+
+def comando_reposicao(motor, args):
+    """Escreve em CSV os produtos no ponto de pedido, dos mais urgentes aos menos."""
+    if args.recalcular:
+        motor.escrever(recalcular_giro)
+    linhas = motor.reposicao(args.limite)
+    escritor = csv.writer(sys.stdout)
+    escritor.writerow(["ID", "Produto", "Estoque", "Venda/dia", "Cobertura (dias)",
+                       "Ponto de Pedido", "Sugestão"])
+    for produto_id, nome, qtd, velocidade, cobertura, ponto_pedido, sugestao in linhas:
+        escritor.writerow([produto_id, nome, qtd, f"{velocidade:.2f}",
+                           "" if cobertura is None else f"{cobertura:.1f}", ponto_pedido, sugestao])
+    sys.stdout.flush()
+    mensagem(f"Produtos para repor: {len(linhas)}")
+
+
+def comando_sincronizar(motor, args):
+    """Troca lotes de alterações com as outras lojas."""
+    if args.nova_identidade:
+        mensagem(f"Nova identidade desta loja: {motor.nova_identidade()}")
+        if not (args.pasta or args.servidor):
+            return 0
+    elif not (args.pasta or args.servidor):
+        mensagem("Informe --pasta ou --servidor.")
+        return 1
+    progresso = ProgressoTerminal("Aplicando lotes")
+    with motor.banco.escrita() as conn:
+        if args.servidor:
+            relatorio = sincronizar_servidor(conn, args.servidor, tarefa=progresso)
+        else:
+            relatorio = sincronizar_pasta(conn, args.pasta, tarefa=progresso)
+    progresso.concluir()
+    print(descrever_relatorio(relatorio))
+    return 0
+
+
+def comando_arquivar(motor, args):
+    """Move as vendas antigas para os arquivos anuais."""
+    progresso = ProgressoTerminal("Arquivando")
+    with motor.banco.escrita() as conn:
+        movidas = arquivar_vendas(conn, args.dias, tarefa=progresso, compactar=args.compactar)
+    progresso.concluir()
+    for ano, quantidade in movidas.items():
+        print(f"{ano}: {quantidade} vendas")
+    if not movidas:
+        mensagem("Nenhuma venda a arquivar.")
+
+
+def comando_reconciliar(motor, args):
+    """Confere os totais materializados com as tabelas e corrige as divergências."""
+    divergencias = motor.reconciliar()
+    for chave, (antes, depois) in divergencias.items():
+        print(f"{chave}: {formatar_moeda(antes)} -> {formatar_moeda(depois)}")
+    if not divergencias:
+        mensagem("Totais conferidos: nenhuma divergência.")
+
+    # O livro de movimentos não é corrigido: só aponta o que mudou por fora dele
+    estoque = motor.conferir_estoque()
+    for produto_id, (atual, livro) in estoque.items():
+        print(f"produto {produto_id}: quantidade {atual}, movimentos {livro}")
+    if not estoque:
+        mensagem("Estoque conferido com o livro de movimentos: nenhuma divergência.")
+    return 1 if divergencias or estoque else 0
+
+
+def comando_compactar(motor, args):
+    """Atualiza as estatísticas e compacta o banco com VACUUM."""
+    antes = os.path.getsize(motor.banco.caminho)
+    with motor.banco.escrita() as conn:
+        conn.execute("PRAGMA optimize")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    depois = os.path.getsize(motor.banco.caminho)
+    print(f"{motor.banco.caminho}: {antes} -> {depois} bytes")
+
+
+def comando_gerar(motor, args):
+    """Cria um banco com dados sintéticos para medições."""
+    progresso = ProgressoTerminal("Gerando vendas")
+    gerados = gerar_dados(args.banco, args.produtos, args.vendas, args.dias, args.semente,
+                          tarefa=progresso)
+    progresso.concluir()
+    print(f"{args.banco}: {gerados['produtos']} produtos, {gerados['vendas']} vendas")
+
+
+def comando_bench(motor, args):
+    """Mede consultas, vendas, exportação e renderização; falha se houver regressão."""
+    if args.salvar_linha_base and args.linha_base is None:
+        mensagem("Informe em --linha-base o arquivo onde salvar.")
+        return 2
+    bancada = Bancada(args.banco, args.semente)
+    try:
+        mensagem(f"{bancada.produtos} produtos, {bancada.vendas} vendas")
+        if bancada.root is None:
+            mensagem("Sem tela: cenários de interface ignorados (use xvfb-run para incluí-los).")
+
+        print("cenario,n,p50_ms,p95_ms,p99_ms,max_ms,ops_s")
+
+        def mostrar(nome, medida):
+            print(f"{nome},{medida['n']},{medida['p50_ms']:.3f},{medida['p95_ms']:.3f},"
+                  f"{medida['p99_ms']:.3f},{medida['max_ms']:.3f},{medida['ops_s']:.1f}")
+            sys.stdout.flush()
+
+        resultados = bancada.executar(args.repeticoes, args.cenarios, mostrar)
+    finally:
+        bancada.fechar()
+
+    if args.linha_base is None:
+        return 0
+    if args.salvar_linha_base:
+        salvar_linha_base(args.linha_base, resultados, bancada.produtos, bancada.vendas)
+        mensagem(f"Linha de base salva em {args.linha_base}")
+        return 0
+
+    base = ler_linha_base(args.linha_base)
+    if (base["produtos"], base["vendas"]) != (bancada.produtos, bancada.vendas):
+        mensagem(f"Aviso: a linha de base foi medida com {base['produtos']} produtos e "
+                 f"{base['vendas']} vendas.")
+    regressoes = comparar(resultados, base, args.tolerancia)
+    for nome, metrica, antes, agora in regressoes:
+        mensagem(f"Regressão em {nome} ({metrica}): {antes:.3f} ms -> {agora:.3f} ms")
+    if not regressoes:
+        mensagem("Nenhuma regressão em relação à linha de base.")
+    return 1 if regressoes else 0
+
+
+def criar_parser():
+    """Monta o parser dos comandos de linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog="app.py", description="Operações do controle de estoque sem interface gráfica.")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco de dados")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="grava em JSON o tempo de cada consulta; as lentas vão para "
+                             f"{ARQUIVO_LENTAS}")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    sub = comandos.add_parser("exportar", aliases=["export"],
+                              help="exporta para .xlsx, .csv, .parquet ou .db")
+    sub.add_argument("arquivo")
+    sub.add_argument("--de", "--from", type=data_argumento, help="data inicial (DD/MM/AAAA)")
+    sub.add_argument("--ate", "--to", type=data_argumento, help="data final (DD/MM/AAAA)")
+    sub.set_defaults(funcao=comando_exportar)
+
+    sub = comandos.add_parser("importar", aliases=["import"],
+                              help="importa produtos de .csv ou .xlsx")
+    sub.add_argument("arquivo")
+    sub.set_defaults(funcao=comando_importar)
+
+    sub = comandos.add_parser("relatorio", aliases=["report"],
+                              help="relatório de vendas em CSV na saída padrão")
+    sub.add_argument("--de", "--from", type=data_argumento, help="data inicial (DD/MM/AAAA)")
+    sub.add_argument("--ate", "--to", type=data_argumento, help="data final (DD/MM/AAAA)")
+    sub.add_argument("--agrupar", default="produto", choices=["produto", "vendas", *PERIODOS])
+    sub.add_argument("--limite", type=int)
+    sub.set_defaults(funcao=comando_relatorio)
+
+    sub = comandos.add_parser("estoque", aliases=["stock"],
+                              help="estoque e valor em uma data, em CSV na saída padrão")
+    sub.add_argument("--em", "--at", type=data_argumento, help="data (DD/MM/AAAA); padrão: hoje")
+    sub.set_defaults(funcao=comando_estoque)
+
+    sub = comandos.add_parser("reposicao", aliases=["reorder"],
+                              help="produtos a repor pelo giro de vendas, em CSV na saída padrão")
+    sub.add_argument("--limite", type=int, default=LIMITE_ALERTAS)
+    sub.add_argument("--recalcular", action="store_true",
+                     help="refaz o giro a partir das vendas antes de listar")
+    sub.set_defaults(funcao=comando_reposicao)
+
+    sub = comandos.add_parser("sincronizar", aliases=["sync"],
+                              help="troca alterações com as outras lojas")
+    destino = sub.add_mutually_exclusive_group()
+    destino.add_argument("--pasta", help="pasta compartilhada entre as lojas")
+    destino.add_argument("--servidor", metavar="URL",
+                         help="serviço HTTP de outra loja (ex.: http://loja1:8765)")
+    sub.add_argument("--nova-identidade", action="store_true",
+                     help="gera uma identidade nova para este banco, copiado de outra loja")
+    sub.set_defaults(funcao=comando_sincronizar)
+
+    sub = comandos.add_parser("arquivar", aliases=["archive"],
+                              help="move vendas antigas para os arquivos anuais")
+    sub.add_argument("--dias", type=int, default=ARQUIVAR_APOS_DIAS,
+                     help="idade mínima das vendas, em dias")
+    sub.add_argument("--compactar", action="store_true",
+                     help="compacta o banco principal ao final (VACUUM)")
+    sub.set_defaults(funcao=comando_arquivar)
+
+    sub = comandos.add_parser("reconciliar", aliases=["reconcile"],
+                              help="confere e corrige os totais materializados")
+    sub.set_defaults(funcao=comando_reconciliar)
+
+    sub = comandos.add_parser("compactar", aliases=["vacuum"],
+                              help="atualiza estatísticas e compacta o banco")
+    sub.set_defaults(funcao=comando_compactar)
+
+    sub = comandos.add_parser("gerar", aliases=["generate"],
+                              help="cria um banco novo com dados sintéticos (em --banco)")
+    sub.add_argument("--produtos", type=int, default=10000)
+    sub.add_argument("--vendas", type=int, default=100000)
+    sub.add_argument("--dias", type=int, default=730, help="período coberto pelas vendas")
+    sub.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    sub.set_defaults(funcao=comando_gerar, sem_motor=True)
+
+    sub = comandos.add_parser("bench", help="mede latência e vazão e compara com a linha de base")
+    sub.add_argument("--repeticoes", type=int, default=20)
+    sub.add_argument("--cenarios", help="mede só os cenários cujo nome contém este texto")
+    sub.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    sub.add_argument("--linha-base", help="arquivo JSON da linha de base")
+    sub.add_argument("--salvar-linha-base", action="store_true",
+                     help="grava os resultados como nova linha de base")
+    sub.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                     help="piora tolerada antes de acusar regressão (0.2 = 20%%)")
+    sub.set_defaults(funcao=comando_bench, sem_motor=True)
+    return parser
+
+
+def main(argv=None):
+    """Executa um comando e retorna o código de saída."""
+    args = criar_parser().parse_args(argv)
+
+    # Geração e medição abrem o banco por conta própria
+    motor = None
+    metricas = Metricas() if args.metricas else None
+    try:
+        if not getattr(args, "sem_motor", False):
+            motor = MotorEstoque(args.banco, metricas=metricas)
+    except sqlite3.Error as e:
+        mensagem(f"Erro de conexão com o banco de dados: {e}")
+        return 1
+    try:
+        return args.funcao(motor, args) or 0
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: `| head`): descarta o que restar
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, LookupError, OSError, sqlite3.Error, ErroSincronizacao) as e:
+        mensagem(f"Erro: {e}")
+        return 1
+    finally:
+        if motor is not None:
+            motor.fechar()
+        if metricas is not None:
+            try:
+                metricas.exportar(args.metricas)
+            except OSError as e:
+                mensagem(f"Erro ao gravar as métricas: {e}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+# Valores monetários são guardados no banco como centavos inteiros
+
+
+def para_centavos(valor):
+    """Converte um valor em reais (número ou texto) para centavos inteiros."""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def para_reais(centavos):
+    """Converte centavos inteiros para reais."""
+    return centavos / 100
+
+
+class FormatadorMoeda:
+    """Formata centavos como moeda sem depender de `locale.setlocale`.
+
+    As convenções (símbolo e separadores) são fixadas na criação, de modo
+    que o resultado é o mesmo em qualquer máquina, com ou sem a localidade
+    instalada. Os valores já formatados ficam em cache, já que os mesmos
+    preços se repetem em muitas linhas.
+    """
+
+    def __init__(self, simbolo="R$", separador_milhar=".", separador_decimal=",",
+                 tamanho_cache=8192):
+        self.simbolo = simbolo
+        self.separador_milhar = separador_milhar
+        self.separador_decimal = separador_decimal
+        self.formatar = lru_cache(maxsize=tamanho_cache)(self._formatar)
+
+    def _formatar(self, centavos):
+        sinal = "-" if centavos < 0 else ""
+        reais, resto = divmod(abs(int(centavos)), 100)
+        inteiro = f"{reais:,}".replace(",", self.separador_milhar)
+        return f"{sinal}{self.simbolo} {inteiro}{self.separador_decimal}{resto:02d}"
+
+    def formatar_coluna(self, valores):
+        """Formata uma sequência de valores em centavos, na mesma ordem."""
+        return list(map(self.formatar, valores))
+
+
+# Formato brasileiro: R$ 1.234,56
+REAL = FormatadorMoeda()
+
+
+def formatar_moeda(centavos):
+    """Formata um valor em centavos como moeda."""
+    return REAL.formatar(centavos)
+
+
+def formatar_moedas(valores):
+    """Formata vários valores em centavos como moeda."""
+    return REAL.formatar_coluna(valores)
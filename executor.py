@@ -0,0 +1,152 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_local = threading.local()
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro de uma tarefa quando ela é cancelada."""
+
+
+def tarefa_atual():
+    """Retorna a tarefa em execução na thread atual, se houver."""
+    return getattr(_local, "tarefa", None)
+
+
+class Tarefa:
+    """Operação submetida ao executor, com progresso e cancelamento."""
+
+    def __init__(self, executor, funcao, args, ao_concluir, ao_erro, ao_progresso, nome=None):
+        self._executor = executor
+        self.funcao = funcao
+        self.nome = nome
+        self.args = args
+        self.ao_concluir = ao_concluir
+        self.ao_erro = ao_erro
+        self.ao_progresso = ao_progresso
+        self._cancelada = threading.Event()
+        self._conexao = None
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        """Cancela a tarefa; se ela estiver consultando o banco, interrompe a consulta."""
+        self._cancelada.set()
+        conn = self._conexao
+        if conn is not None:
+            conn.interrupt()
+
+    def verificar_cancelamento(self):
+        """Interrompe a execução da tarefa se ela tiver sido cancelada."""
+        if self.cancelada:
+            raise TarefaCancelada()
+
+    def informar_progresso(self, feito, total=None):
+        """Envia o progresso à interface; também serve de ponto de cancelamento."""
+        self.verificar_cancelamento()
+        if self.ao_progresso:
+            self._executor._respostas.put((self, self.ao_progresso, (feito, total)))
+
+    @contextmanager
+    def interrompivel(self, conn):
+        """Registra a conexão para que `cancelar` possa interromper a consulta em andamento."""
+        self._conexao = conn
+        try:
+            yield conn
+        finally:
+            self._conexao = None
+
+
+class ExecutorBanco:
+    """Executa as operações de banco numa thread dedicada, fora do loop do Tk.
+
+    Os resultados voltam à interface pela fila de respostas, lida
+    periodicamente com `root.after`, de modo que todos os callbacks rodam
+    na thread principal. As tarefas são executadas na ordem de submissão.
+    Com `metricas`, as tarefas com nome têm medidos o trabalho no banco
+    (tipo "tarefa") e o callback na interface (tipo "interface").
+    """
+
+    def __init__(self, root, ao_erro=None, intervalo_ms=20, metricas=None):
+        self.root = root
+        self.ao_erro = ao_erro
+        self.metricas = metricas
+        self.intervalo_ms = intervalo_ms
+        self._pedidos = queue.Queue()
+        self._respostas = queue.Queue()
+        self._thread = threading.Thread(target=self._trabalhar, name="executor-banco", daemon=True)
+        self._thread.start()
+        self._agendado = self.root.after(self.intervalo_ms, self._processar_respostas)
+
+    def submeter(self, funcao, *args, ao_concluir=None, ao_erro=None, ao_progresso=None,
+                 nome=None):
+        """Agenda `funcao(tarefa, *args)` na thread do banco e retorna a tarefa."""
+        tarefa = Tarefa(self, funcao, args, ao_concluir, ao_erro, ao_progresso, nome)
+        self._pedidos.put(tarefa)
+        return tarefa
+
+    def _trabalhar(self):
+        """Laço da thread de banco."""
+        while True:
+            tarefa = self._pedidos.get()
+            if tarefa is None:
+                break
+            if tarefa.cancelada:
+                continue
+
+            _local.tarefa = tarefa
+            inicio = time.perf_counter()
+            try:
+                resultado = tarefa.funcao(tarefa, *tarefa.args)
+            except TarefaCancelada:
+                pass
+            except Exception as e:
+                # Consultas interrompidas por cancelamento não são erros
+                if not (tarefa.cancelada and isinstance(e, sqlite3.OperationalError)):
+                    if self._medindo(tarefa):
+                        self.metricas.registrar_erro("tarefa", tarefa.nome)
+                    self._respostas.put((tarefa, tarefa.ao_erro or self.ao_erro, (e,)))
+            else:
+                if self._medindo(tarefa):
+                    self.metricas.registrar("tarefa", tarefa.nome,
+                                            (time.perf_counter() - inicio) * 1000)
+                if tarefa.ao_concluir:
+                    self._respostas.put((tarefa, tarefa.ao_concluir, (resultado,)))
+            finally:
+                _local.tarefa = None
+
+    def _processar_respostas(self):
+        """Entrega à interface as respostas prontas e reagenda a próxima leitura."""
+        try:
+            while True:
+                tarefa, callback, args = self._respostas.get_nowait()
+                if callback and not tarefa.cancelada:
+                    with self._medir("interface", tarefa):
+                        callback(*args)
+        except queue.Empty:
+            pass
+        finally:
+            self._agendado = self.root.after(self.intervalo_ms, self._processar_respostas)
+
+    def _medindo(self, tarefa):
+        """Indica se as etapas da tarefa são medidas."""
+        return self.metricas is not None and tarefa.nome is not None
+
+    def _medir(self, tipo, tarefa):
+        """Mede a etapa da tarefa, se ela tiver nome e houver métricas."""
+        if not self._medindo(tarefa):
+            return nullcontext()
+        return self.metricas.medir(tipo, tarefa.nome)
+
+    def encerrar(self, espera=5.0):
+        """Termina as tarefas pendentes e encerra a thread do banco."""
+        self._pedidos.put(None)
+        self._thread.join(espera)
+        if self._agendado is not None:
+            self.root.after_cancel(self._agendado)
+            self._agendado = None
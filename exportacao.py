@@ -0,0 +1,274 @@
+import csv
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+from arquivo import fonte_vendas
+from relatorios import fim_exclusivo
+
+# Tabelas do relatório: título, colunas (nome, tipo) e consulta que gera as linhas,
+# com os valores do banco convertidos de centavos para reais. Em vendas, {vendas}
+# é a origem (com os arquivos, se preciso) e {onde} o filtro de datas.
+TABELAS = (
+    ("Produtos",
+     (("ID", "inteiro"), ("Nome", "texto"), ("Quantidade", "inteiro"),
+      ("Preço Custo", "real"), ("Valor Total", "real")),
+     '''SELECT id, nome, quantidade, preco_custo / 100.0, quantidade * preco_custo / 100.0
+        FROM produtos
+        ORDER BY nome'''),
+    ("Vendas",
+     (("ID", "inteiro"), ("Produto", "texto"), ("Quantidade", "inteiro"),
+      ("Preço Custo", "real"), ("Preço Venda", "real"), ("Total Custo", "real"),
+      ("Total Venda", "real"), ("Lucro", "real"), ("Data", "texto")),
+     '''SELECT id, nome_produto, quantidade, preco_custo / 100.0, preco_venda / 100.0,
+               total_custo / 100.0, total_venda / 100.0, lucro / 100.0, data_venda
+        FROM {vendas}{onde}
+        ORDER BY data_venda DESC'''),
+)
+
+TAMANHO_LOTE = 5000
+
+
+def montar_consultas(conn, inicio=None, fim=None):
+    """Consultas do relatório para o intervalo de datas, como (título, colunas, sql, parâmetros).
+
+    Anexa os arquivos de vendas que o intervalo alcançar, então precisa
+    rodar fora de transação.
+    """
+    condicoes, parametros = [], []
+    if inicio:
+        condicoes.append("data_venda >= ?")
+        parametros.append(inicio)
+    if fim:
+        condicoes.append("data_venda < ?")
+        parametros.append(fim_exclusivo(fim))
+    onde = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+
+    vendas = fonte_vendas(conn, inicio, fim)
+    return [(titulo, colunas, consulta.format(vendas=vendas, onde=onde),
+             parametros if "{onde}" in consulta else [])
+            for titulo, colunas, consulta in TABELAS]
+
+
+def contar_linhas(conn, consultas):
+    """Total de linhas que o relatório vai exportar."""
+    return sum(conn.execute(f"SELECT COUNT(*) FROM ({sql})", parametros).fetchone()[0]
+               for _, _, sql, parametros in consultas)
+
+
+def caminho_por_tabela(caminho, titulo):
+    """Arquivo de uma tabela nos formatos que gravam um arquivo por tabela."""
+    base, extensao = os.path.splitext(caminho)
+    return f"{base}_{titulo.lower()}{extensao}"
+
+
+class Escritor(ABC):
+    """Base dos formatos de exportação por tabela.
+
+    Cada tabela é gravada num arquivo temporário; `concluir` move os
+    temporários para o destino e `descartar` os remove. Os formatos
+    implementam `iniciar_tabela` e `escrever`.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.temporarios = {}
+
+    def temporario(self, destino):
+        """Registra e retorna o arquivo temporário de um destino."""
+        self.temporarios[destino] = destino + ".tmp"
+        return self.temporarios[destino]
+
+    @abstractmethod
+    def iniciar_tabela(self, titulo, colunas):
+        """Começa uma tabela com as colunas `(nome, tipo)`."""
+
+    @abstractmethod
+    def escrever(self, linhas):
+        """Grava um lote de linhas da tabela atual."""
+
+    def finalizar_tabela(self):
+        """Fecha a tabela atual; por padrão não há nada a fazer."""
+
+    def concluir(self):
+        """Move os arquivos temporários para o destino e retorna os arquivos gerados."""
+        for destino, temporario in self.temporarios.items():
+            os.replace(temporario, destino)
+        return list(self.temporarios)
+
+    def descartar(self):
+        """Remove os arquivos temporários de uma exportação interrompida."""
+        for temporario in self.temporarios.values():
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+
+class EscritorXlsx(Escritor):
+    """Pasta de trabalho do Excel somente-escrita, uma planilha por tabela."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        from openpyxl import Workbook
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+
+    def iniciar_tabela(self, titulo, colunas):
+        self.ws = self.wb.create_sheet(titulo)
+        self.ws.append([nome for nome, _ in colunas])
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            self.ws.append(linha)
+
+    def concluir(self):
+        self.wb.save(self.temporario(self.caminho))
+        return super().concluir()
+
+
+class EscritorCsv(Escritor):
+    """Um arquivo CSV em UTF-8 por tabela."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.arquivo = None
+        self.writer = None
+
+    def iniciar_tabela(self, titulo, colunas):
+        destino = caminho_por_tabela(self.caminho, titulo)
+        self.arquivo = open(self.temporario(destino), "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.arquivo)
+        self.writer.writerow([nome for nome, _ in colunas])
+
+    def escrever(self, linhas):
+        self.writer.writerows(linhas)
+
+    def finalizar_tabela(self):
+        self.arquivo.close()
+        self.arquivo = None
+
+    def descartar(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+        super().descartar()
+
+
+class EscritorParquet(Escritor):
+    """Um arquivo Parquet por tabela, gravado em grupos de linhas com pyarrow."""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.tipos = {"inteiro": pyarrow.int64(), "real": pyarrow.float64(),
+                      "texto": pyarrow.string()}
+        self.schema = None
+        self.writer = None
+
+    def iniciar_tabela(self, titulo, colunas):
+        destino = caminho_por_tabela(self.caminho, titulo)
+        self.schema = self.pa.schema([(nome, self.tipos[tipo]) for nome, tipo in colunas])
+        self.writer = self.pq.ParquetWriter(self.temporario(destino), self.schema)
+
+    def escrever(self, linhas):
+        colunas = list(zip(*linhas)) if linhas else [[] for _ in self.schema]
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(valores, type=campo.type)
+             for valores, campo in zip(colunas, self.schema)],
+            schema=self.schema))
+
+    def finalizar_tabela(self):
+        self.writer.close()
+        self.writer = None
+
+    def descartar(self):
+        if self.writer is not None:
+            self.writer.close()
+        super().descartar()
+
+
+def exportar_tabelas(conn, escritor, tarefa=None, lote=TAMANHO_LOTE, inicio=None, fim=None):
+    """Percorre as tabelas do relatório em lotes, entregando as linhas ao escritor."""
+    consultas = montar_consultas(conn, inicio, fim)
+    conn.execute("BEGIN")  # Mesmo instantâneo do banco para todas as tabelas
+    try:
+        total = contar_linhas(conn, consultas)
+        feito = 0
+
+        for titulo, colunas, sql, parametros in consultas:
+            escritor.iniciar_tabela(titulo, colunas)
+            cursor = conn.execute(sql, parametros)
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    break
+                escritor.escrever(linhas)
+                feito += len(linhas)
+                if tarefa is not None:
+                    tarefa.informar_progresso(feito, total)
+            escritor.finalizar_tabela()
+
+        return escritor.concluir()
+    except BaseException:
+        escritor.descartar()
+        raise
+    finally:
+        conn.rollback()
+
+
+def exportar_snapshot(conn, caminho, tarefa=None, paginas=1024):
+    """Copia o banco inteiro para um novo arquivo SQLite com a API de backup online."""
+    origem = conn.execute("PRAGMA database_list").fetchone()[2]
+    if origem and os.path.abspath(origem) == os.path.abspath(caminho):
+        raise ValueError("O destino da cópia não pode ser o próprio banco de dados.")
+
+    temporario = caminho + ".tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    def progresso(status, restantes, total):
+        if tarefa is not None:
+            tarefa.informar_progresso(total - restantes, total)
+
+    destino = sqlite3.connect(temporario)
+    try:
+        conn.backup(destino, pages=paginas, progress=progresso)
+        destino.close()
+        os.replace(temporario, caminho)
+        return [caminho]
+    except BaseException:
+        destino.close()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+ESCRITORES = {
+    ".xlsx": EscritorXlsx,
+    ".csv": EscritorCsv,
+    ".parquet": EscritorParquet,
+}
+
+
+def formatos_disponiveis():
+    """Tipos de arquivo para o diálogo de salvar, conforme as bibliotecas instaladas."""
+    formatos = [("Arquivos Excel", "*.xlsx"), ("Arquivos CSV", "*.csv")]
+    if find_spec("pyarrow") is not None:
+        formatos.append(("Arquivos Parquet", "*.parquet"))
+    formatos.append(("Cópia do banco SQLite", "*.db"))
+    return formatos
+
+
+def exportar(conn, caminho, tarefa=None, inicio=None, fim=None):
+    """Exporta o relatório no formato indicado pela extensão do arquivo.
+
+    `inicio` e `fim` (AAAA-MM-DD) limitam as vendas exportadas; a cópia em
+    SQLite é sempre do banco principal inteiro. Retorna a lista de arquivos gerados.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in (".db", ".sqlite", ".sqlite3"):
+        return exportar_snapshot(conn, caminho, tarefa)
+    if extensao not in ESCRITORES:
+        raise ValueError(f"Formato de exportação não suportado: {extensao or caminho}")
+    return exportar_tabelas(conn, ESCRITORES[extensao](caminho), tarefa, inicio=inicio, fim=fim)
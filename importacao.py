@@ -0,0 +1,178 @@
+import csv
+import os
+import unicodedata
+from produtos import validar_produto, ProdutoInvalido
+from tabela_virtual import buscar_por_ids
+
+TAMANHO_LOTE = 5000
+
+# Nomes aceitos no cabeçalho, já normalizados, para cada campo do produto
+CABECALHOS = {
+    "id": "id",
+    "nome": "nome",
+    "produto": "nome",
+    "quantidade": "quantidade",
+    "qtd": "quantidade",
+    "preco_custo": "preco_custo",
+    "preco_de_custo": "preco_custo",
+    "custo": "preco_custo",
+}
+
+
+def normalizar_cabecalho(texto):
+    """Minúsculas, sem acentos e com sublinhado no lugar de espaços."""
+    texto = unicodedata.normalize("NFKD", str(texto or "").strip().lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return "_".join(texto.split())
+
+
+def mapear_colunas(cabecalho):
+    """Associa cada campo do produto ao índice da coluna correspondente no arquivo."""
+    colunas = {}
+    for indice, titulo in enumerate(cabecalho):
+        campo = CABECALHOS.get(normalizar_cabecalho(titulo))
+        if campo and campo not in colunas:
+            colunas[campo] = indice
+
+    faltando = {"nome", "quantidade", "preco_custo"} - colunas.keys()
+    if faltando:
+        raise ValueError("Colunas obrigatórias ausentes no arquivo: " + ", ".join(sorted(faltando)))
+    return colunas
+
+
+def ler_csv(caminho):
+    """Lê as linhas de um CSV, detectando o separador (vírgula ou ponto e vírgula)."""
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(arquivo, dialeto)
+
+
+def ler_xlsx(caminho):
+    """Lê as linhas da primeira planilha em modo somente-leitura."""
+    from openpyxl import load_workbook
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+LEITORES = {
+    ".csv": ler_csv,
+    ".xlsx": ler_xlsx,
+}
+
+
+def valor_celula(valor):
+    """Converte números inteiros vindos como float da planilha (10.0 -> 10)."""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def gravar_lote(conn, lote):
+    """Insere ou atualiza um lote de produtos validados; retorna (inseridos, atualizados)."""
+    com_id = [linha for linha in lote if linha[0] is not None]
+    sem_id = [linha[1:] for linha in lote if linha[0] is None]
+
+    existentes = {linha[0] for linha in buscar_por_ids(
+        conn, "SELECT id FROM produtos", {linha[0] for linha in com_id})}
+
+    conn.executemany(
+        '''INSERT INTO produtos (id, nome, quantidade, preco_custo) VALUES (?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            nome = excluded.nome,
+            quantidade = excluded.quantidade,
+            preco_custo = excluded.preco_custo''',
+        com_id)
+    conn.executemany(
+        "INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, ?, ?)",
+        sem_id)
+
+    # Um id repetido no lote é inserido na primeira linha e atualizado nas seguintes
+    atualizados = 0
+    for linha in com_id:
+        if linha[0] in existentes:
+            atualizados += 1
+        else:
+            existentes.add(linha[0])
+    return len(lote) - atualizados, atualizados
+
+
+def importar_produtos(conn, caminho, tarefa=None, lote=TAMANHO_LOTE):
+    """Importa produtos de um CSV ou XLSX em lotes, dentro da transação do chamador.
+
+    Cada linha passa pelas mesmas regras do cadastro manual. Linhas com ID
+    atualizam o produto existente (ou o criam com esse ID); as demais são
+    inseridas como novos produtos. As linhas recusadas vão para um relatório
+    `<arquivo>_rejeitados.csv` ao lado do arquivo importado.
+
+    Retorna um dicionário com as contagens e o caminho do relatório, se houver.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in LEITORES:
+        raise ValueError(f"Formato de importação não suportado: {extensao or caminho}")
+
+    linhas = LEITORES[extensao](caminho)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        raise ValueError("O arquivo está vazio.")
+    colunas = mapear_colunas(cabecalho)
+
+    resultado = {"inseridos": 0, "atualizados": 0, "rejeitados": 0, "relatorio": None}
+    rejeitados = []
+    pendentes = []
+    lidas = 0
+
+    for numero, linha in enumerate(linhas, start=2):
+        linha = [valor_celula(valor) for valor in linha]
+        if not any(valor not in (None, "") for valor in linha):
+            continue
+
+        def campo(nome):
+            indice = colunas.get(nome)
+            return linha[indice] if indice is not None and indice < len(linha) else None
+
+        try:
+            produto = validar_produto(campo("nome"), campo("quantidade"), campo("preco_custo"))
+            produto_id = campo("id")
+            if produto_id in (None, ""):
+                produto_id = None
+            elif not str(produto_id).strip().isdigit():
+                raise ProdutoInvalido("ID inválido!")
+            else:
+                produto_id = int(str(produto_id).strip())
+        except ProdutoInvalido as e:
+            rejeitados.append((numero, *linha, str(e)))
+            continue
+
+        pendentes.append((produto_id, *produto))
+        lidas += 1
+        if len(pendentes) >= lote:
+            inseridos, atualizados = gravar_lote(conn, pendentes)
+            resultado["inseridos"] += inseridos
+            resultado["atualizados"] += atualizados
+            pendentes = []
+            if tarefa is not None:
+                tarefa.informar_progresso(lidas)
+
+    if pendentes:
+        inseridos, atualizados = gravar_lote(conn, pendentes)
+        resultado["inseridos"] += inseridos
+        resultado["atualizados"] += atualizados
+
+    resultado["rejeitados"] = len(rejeitados)
+    if rejeitados:
+        relatorio = os.path.splitext(caminho)[0] + "_rejeitados.csv"
+        with open(relatorio, "w", newline="", encoding="utf-8") as arquivo:
+            writer = csv.writer(arquivo)
+            writer.writerow(["Linha", *cabecalho, "Motivo"])
+            writer.writerows(rejeitados)
+        resultado["relatorio"] = relatorio
+
+    return resultado
@@ -0,0 +1,350 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+# Instrumentação de desempenho: tempo e linhas de cada instrução SQL, de cada
+# renderização de tabela e de cada tarefa da interface, em histogramas de
+# faixas fixas. Instruções lentas vão para um log rotativo com o plano de
+# execução (EXPLAIN QUERY PLAN).
+
+# Limites superiores das faixas dos histogramas, em milissegundos
+FAIXAS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+LIMIAR_LENTA_MS = 100
+ARQUIVO_LENTAS = "consultas_lentas.log"
+TAMANHO_LOG_LENTAS = 1024 * 1024
+COPIAS_LOG_LENTAS = 3
+
+# Listas de marcadores de tamanho variável (IN (?, ?, ...)) viram uma só chave
+_MARCADORES = re.compile(r"\?(\s*,\s*\?)+")
+_ESPACOS = re.compile(r"\s+")
+
+# Só estas instruções têm plano; EXPLAIN de um PRAGMA já aplicaria o pragma
+COM_PLANO = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def normalizar_sql(sql):
+    """Texto da instrução em uma linha, usado como nome da série."""
+    return _MARCADORES.sub("?, …", _ESPACOS.sub(" ", sql).strip())
+
+
+class Serie:
+    """Contagem, tempo, linhas e histograma de uma operação medida."""
+
+    __slots__ = ("chamadas", "total_ms", "max_ms", "linhas", "erros", "faixas")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.linhas = 0
+        self.erros = 0
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+
+    def registrar(self, ms, linhas):
+        self.chamadas += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.linhas += linhas
+        self.faixas[bisect_left(FAIXAS_MS, ms)] += 1
+
+    def percentil(self, p):
+        """Limite superior da faixa que contém o percentil `p` (0 a 100)."""
+        if not self.chamadas:
+            return 0.0
+        alvo = self.chamadas * p / 100
+        acumulado = 0
+        for indice, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if acumulado >= alvo and quantidade:
+                # A última faixa não tem limite: usa o maior tempo visto
+                return min(FAIXAS_MS[indice], self.max_ms) if indice < len(FAIXAS_MS) else self.max_ms
+        return self.max_ms
+
+    def copiar(self):
+        copia = Serie()
+        for atributo in Serie.__slots__:
+            valor = getattr(self, atributo)
+            setattr(copia, atributo, list(valor) if isinstance(valor, list) else valor)
+        return copia
+
+    def como_dict(self):
+        media = self.total_ms / self.chamadas if self.chamadas else 0.0
+        return {"chamadas": self.chamadas, "linhas": self.linhas, "erros": self.erros,
+                "total_ms": round(self.total_ms, 3), "media_ms": round(media, 3),
+                "p50_ms": round(self.percentil(50), 3), "p95_ms": round(self.percentil(95), 3),
+                "p99_ms": round(self.percentil(99), 3), "max_ms": round(self.max_ms, 3),
+                "histograma": list(self.faixas)}
+
+
+class Medicao:
+    """Valor entregue por `Metricas.medir`; o bloco pode informar as linhas."""
+
+    __slots__ = ("linhas",)
+
+    def __init__(self):
+        self.linhas = 0
+
+
+class Metricas:
+    """Registro das séries medidas, compartilhado entre threads."""
+
+    def __init__(self, limiar_lenta_ms=LIMIAR_LENTA_MS, arquivo_lentas=ARQUIVO_LENTAS):
+        self.limiar_lenta_ms = limiar_lenta_ms
+        self.arquivo_lentas = arquivo_lentas
+        self.inicio = datetime.now()
+        self._series = {}
+        self._planos = {}
+        self._nomes_sql = {}
+        self._trava = threading.Lock()
+        self._log_lentas = None
+
+    def registrar(self, tipo, nome, ms, linhas=0):
+        """Acrescenta uma medição de `ms` milissegundos à série `(tipo, nome)`."""
+        with self._trava:
+            serie = self._series.get((tipo, nome))
+            if serie is None:
+                serie = self._series[(tipo, nome)] = Serie()
+            serie.registrar(ms, linhas)
+
+    def registrar_erro(self, tipo, nome):
+        """Conta uma falha na série `(tipo, nome)`."""
+        with self._trava:
+            serie = self._series.get((tipo, nome))
+            if serie is None:
+                serie = self._series[(tipo, nome)] = Serie()
+            serie.erros += 1
+
+    @contextmanager
+    def medir(self, tipo, nome):
+        """Mede o tempo do bloco; atribua `medicao.linhas` para contar linhas."""
+        medicao = Medicao()
+        inicio = time.perf_counter()
+        try:
+            yield medicao
+        except Exception:
+            self.registrar_erro(tipo, nome)
+            raise
+        self.registrar(tipo, nome, (time.perf_counter() - inicio) * 1000, medicao.linhas)
+
+    def nome_sql(self, sql):
+        """Nome normalizado da instrução, guardado para não refazer a conversão."""
+        nome = self._nomes_sql.get(sql)
+        if nome is None:
+            nome = normalizar_sql(sql)
+            if len(self._nomes_sql) < 4096:
+                self._nomes_sql[sql] = nome
+        return nome
+
+    def registrar_sql(self, conn, sql, parametros, ms, linhas):
+        """Registra uma instrução e, se passou do limiar, grava-a no log de lentas."""
+        nome = self.nome_sql(sql)
+        self.registrar("sql", nome, ms, linhas)
+        if ms >= self.limiar_lenta_ms:
+            self.consulta_lenta(conn, nome, sql, parametros, ms, linhas)
+
+    def plano(self, conn, nome, sql, parametros):
+        """Plano de execução da instrução, capturado uma vez por texto."""
+        with self._trava:
+            plano = self._planos.get(nome)
+        if plano is None and parametros is not None and nome.upper().startswith(COM_PLANO):
+            try:
+                # Cursor comum, para que o próprio EXPLAIN não seja medido
+                linhas = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parametros)
+                plano = [detalhe for _, _, _, detalhe in linhas]
+            except (sqlite3.Error, ValueError):
+                plano = []
+            # O EXPLAIN roda fora da trava; vale o primeiro plano guardado
+            with self._trava:
+                plano = self._planos.setdefault(nome, plano)
+        return plano or []
+
+    def consulta_lenta(self, conn, nome, sql, parametros, ms, linhas):
+        """Grava no log rotativo a instrução lenta com o seu plano."""
+        plano = self.plano(conn, nome, sql, parametros)
+        if self.arquivo_lentas is None:
+            return
+        with self._trava:
+            if self._log_lentas is None:
+                self._log_lentas = self._abrir_log_lentas()
+        self._log_lentas.info(
+            "%.1f ms, %d linhas: %s\n%s", ms, linhas, nome,
+            "\n".join(f"    {detalhe}" for detalhe in plano))
+
+    def _abrir_log_lentas(self):
+        """Log rotativo das instruções lentas; o arquivo só é criado na primeira."""
+        import logging
+        import logging.handlers
+        log = logging.getLogger(f"estoque.lentas.{id(self)}")
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        try:
+            manipulador = logging.handlers.RotatingFileHandler(
+                self.arquivo_lentas, maxBytes=TAMANHO_LOG_LENTAS,
+                backupCount=COPIAS_LOG_LENTAS, encoding="utf-8")
+        except OSError:
+            manipulador = logging.NullHandler()
+        manipulador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log.addHandler(manipulador)
+        return log
+
+    def series(self):
+        """Cópia das séries, como `{(tipo, nome): Serie}`."""
+        with self._trava:
+            return {chave: serie.copiar() for chave, serie in self._series.items()}
+
+    def planos(self):
+        """Planos capturados das instruções lentas, por nome da instrução."""
+        with self._trava:
+            return {nome: list(plano) for nome, plano in self._planos.items() if plano}
+
+    def zerar(self):
+        """Descarta todas as medições e os planos capturados."""
+        with self._trava:
+            self._series.clear()
+            self._planos.clear()
+            self.inicio = datetime.now()
+
+    def como_dict(self):
+        """Medições em formato serializável, ordenadas pelo tempo total."""
+        series = sorted(self.series().items(), key=lambda item: -item[1].total_ms)
+        return {"inicio": self.inicio.isoformat(timespec="seconds"),
+                "gerado_em": datetime.now().isoformat(timespec="seconds"),
+                "faixas_ms": list(FAIXAS_MS),
+                "limiar_lenta_ms": self.limiar_lenta_ms,
+                "series": [{"tipo": tipo, "nome": nome, **serie.como_dict()}
+                           for (tipo, nome), serie in series],
+                "planos": self.planos()}
+
+    def exportar(self, caminho):
+        """Grava as medições em JSON."""
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(self.como_dict(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que mede cada instrução, do execute até a última linha lida.
+
+    Só conta o tempo gasto dentro das chamadas ao SQLite, não o que o
+    chamador faz entre uma linha e outra.
+    """
+
+    _pendente = None  # [sql, parametros, ms acumulados, linhas lidas]
+
+    def _concluir(self):
+        pendente, self._pendente = self._pendente, None
+        if pendente is not None:
+            self.connection.metricas.registrar_sql(self.connection, *pendente)
+
+    def _medir_execucao(self, executar, sql, parametros, plano):
+        self._concluir()
+        inicio = time.perf_counter()
+        try:
+            executar(sql, parametros)
+        except Exception:
+            self.connection.metricas.registrar_erro("sql", self.connection.metricas.nome_sql(sql))
+            raise
+        ms = (time.perf_counter() - inicio) * 1000
+        if self.description is None:
+            # Sem linhas a ler: a instrução terminou no execute
+            self.connection.metricas.registrar_sql(self.connection, sql, plano, ms,
+                                                   max(self.rowcount, 0))
+        else:
+            self._pendente = [sql, plano, ms, 0]
+        return self
+
+    def execute(self, sql, parametros=()):
+        return self._medir_execucao(super().execute, sql, parametros, parametros)
+
+    def executemany(self, sql, sequencia):
+        # Sem um conjunto de parâmetros único, o plano não é capturado
+        return self._medir_execucao(super().executemany, sql, sequencia, None)
+
+    def executescript(self, script):
+        return self._medir_execucao(lambda sql, _: super(CursorMedido, self).executescript(sql),
+                                    script, (), None)
+
+    def _acumular(self, inicio, linhas, fim):
+        pendente = self._pendente
+        if pendente is not None:
+            pendente[2] += (time.perf_counter() - inicio) * 1000
+            pendente[3] += linhas
+            if fim:
+                self._concluir()
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        self._acumular(inicio, linha is not None, linha is None)
+        return linha
+
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(tamanho)
+        self._acumular(inicio, len(linhas), len(linhas) < tamanho)
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        self._acumular(inicio, len(linhas), True)
+        return linhas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            self._acumular(inicio, 0, True)
+            raise
+        self._acumular(inicio, 1, False)
+        return linha
+
+    def close(self):
+        self._concluir()
+        super().close()
+
+    def __del__(self):
+        # Cursores abandonados antes da última linha (ex.: fetchone de um total)
+        try:
+            self._concluir()
+        except Exception:
+            pass
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão cujos cursores registram as instruções em `metricas`."""
+
+    metricas = None
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        with self.metricas.medir("sql", "COMMIT"):
+            super().commit()
+
+
+def conectar(caminho, metricas, **opcoes):
+    """Abre uma conexão medida por `metricas`."""
+    conn = sqlite3.connect(caminho, factory=ConexaoMedida, **opcoes)
+    conn.metricas = metricas
+    return conn
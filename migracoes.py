@@ -0,0 +1,281 @@
+from banco import executar_transacao
+from busca import criar_indice_busca, GATILHOS_BUSCA
+from dinheiro import para_centavos
+from relatorios import criar_consolidado
+from arquivo import criar_arquivamento
+from movimentos import criar_movimentos
+from reposicao import criar_reposicao, converter_giro_log
+from sincronizacao import criar_sincronizacao, criar_repasse
+
+
+def criar_tabelas(conn):
+    """Tabelas de produtos e vendas."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_custo REAL NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vendas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            produto_id INTEGER NOT NULL,
+            nome_produto TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_venda REAL NOT NULL,
+            preco_custo REAL NOT NULL,
+            data_venda TEXT NOT NULL,
+            FOREIGN KEY (produto_id) REFERENCES produtos (id)
+        )
+    ''')
+
+
+def criar_diario(conn):
+    """Diário de alterações usado para atualizar as abas de forma incremental."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            linha_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL
+        )
+    ''')
+
+    for tabela in ("produtos", "vendas"):
+        for evento, operacao, linha in (("INSERT", "I", "NEW"),
+                                        ("UPDATE", "U", "NEW"),
+                                        ("DELETE", "D", "OLD")):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {tabela}_diario_{operacao.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    INSERT INTO alteracoes (tabela, linha_id, operacao)
+                    VALUES ('{tabela}', {linha}.id, '{operacao}');
+                END
+            ''')
+
+
+def criar_gatilhos_resumo(conn, estoque, venda):
+    """Cria os gatilhos que aplicam ao resumo a diferença de cada alteração.
+
+    `estoque` e `venda` mapeiam cada coluna do resumo para a expressão, com
+    `{0}` no lugar de NEW/OLD, que calcula a contribuição de uma linha.
+    """
+    for tabela, colunas in (("produtos", estoque), ("vendas", venda)):
+        for evento, sufixo, termos in (("INSERT", "i", ("+ {novo}",)),
+                                       ("UPDATE", "u", ("+ {novo}", "- {antigo}")),
+                                       ("DELETE", "d", ("- {antigo}",))):
+            atribuicoes = ", ".join(
+                f"{coluna} = {coluna} " + " ".join(
+                    termo.format(novo=expr.format("NEW"), antigo=expr.format("OLD"))
+                    for termo in termos)
+                for coluna, expr in colunas.items())
+            conn.execute(f"DROP TRIGGER IF EXISTS {tabela}_resumo_{sufixo}")
+            conn.execute(f'''
+                CREATE TRIGGER {tabela}_resumo_{sufixo}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    UPDATE resumo SET {atribuicoes} WHERE id = 1;
+                END
+            ''')
+
+
+def criar_resumo(conn):
+    """Totais materializados, mantidos por gatilhos."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resumo (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            valor_estoque REAL NOT NULL DEFAULT 0,
+            total_vendas REAL NOT NULL DEFAULT 0,
+            total_custo REAL NOT NULL DEFAULT 0,
+            lucro_total REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+    criar_gatilhos_resumo(
+        conn,
+        {"valor_estoque": "{0}.quantidade * {0}.preco_custo"},
+        {"total_vendas": "{0}.quantidade * {0}.preco_venda",
+         "total_custo": "{0}.quantidade * {0}.preco_custo",
+         "lucro_total": "{0}.quantidade * ({0}.preco_venda - {0}.preco_custo)"})
+
+    # Banco anterior ao resumo: calcular a partir das tabelas
+    if conn.execute("INSERT OR IGNORE INTO resumo (id) VALUES (1)").rowcount:
+        conn.execute('''
+            UPDATE resumo SET
+                valor_estoque = (SELECT COALESCE(SUM(quantidade * preco_custo), 0) FROM produtos),
+                total_vendas = (SELECT COALESCE(SUM(quantidade * preco_venda), 0) FROM vendas),
+                total_custo = (SELECT COALESCE(SUM(quantidade * preco_custo), 0) FROM vendas),
+                lucro_total = (SELECT COALESCE(SUM(quantidade * (preco_venda - preco_custo)), 0) FROM vendas)
+            WHERE id = 1
+        ''')
+
+
+def criar_indices(conn):
+    """Índices de cobertura para a listagem de produtos e o relatório de vendas."""
+    # Listagem e paginação de produtos por (nome, id)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_produtos_nome
+        ON produtos (nome, id, quantidade, preco_custo)
+    ''')
+    # Relatório e paginação de vendas por (data_venda, id), sem voltar à tabela
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_data
+        ON vendas (data_venda, id, nome_produto, quantidade, preco_custo, preco_venda)
+    ''')
+    # Vendas de um produto, em ordem cronológica
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_produto
+        ON vendas (produto_id, data_venda)
+    ''')
+
+
+def converter_para_centavos(conn):
+    """Passa os valores monetários para centavos inteiros.
+
+    SQLite não altera o tipo de uma coluna, então produtos, vendas e resumo
+    são recriadas e copiadas. Vendas ganha colunas geradas com o total, o
+    custo e o lucro de cada linha, somadas pelos gatilhos do resumo.
+    """
+    conn.create_function("centavos", 1, para_centavos, deterministic=True)
+    sequencias = dict(conn.execute(
+        "SELECT name, seq FROM sqlite_sequence WHERE name IN ('produtos', 'vendas')"))
+
+    # Os gatilhos são recriados sobre as tabelas novas
+    gatilhos = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ('produtos', 'vendas')"
+    ).fetchall()
+    for (gatilho,) in gatilhos:
+        conn.execute(f"DROP TRIGGER {gatilho}")
+
+    conn.execute('''
+        CREATE TABLE produtos_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_custo INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO produtos_nova (id, nome, quantidade, preco_custo)
+        SELECT id, nome, quantidade, centavos(preco_custo) FROM produtos
+    ''')
+
+    conn.execute('''
+        CREATE TABLE vendas_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            produto_id INTEGER NOT NULL,
+            nome_produto TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_venda INTEGER NOT NULL,
+            preco_custo INTEGER NOT NULL,
+            data_venda TEXT NOT NULL,
+            total_venda INTEGER GENERATED ALWAYS AS (quantidade * preco_venda) STORED,
+            total_custo INTEGER GENERATED ALWAYS AS (quantidade * preco_custo) STORED,
+            lucro INTEGER GENERATED ALWAYS AS (quantidade * (preco_venda - preco_custo)) STORED,
+            FOREIGN KEY (produto_id) REFERENCES produtos (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO vendas_nova
+        (id, produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+        SELECT id, produto_id, nome_produto, quantidade,
+               centavos(preco_venda), centavos(preco_custo), data_venda
+        FROM vendas
+    ''')
+
+    for tabela in ("vendas", "produtos"):
+        conn.execute(f"DROP TABLE {tabela}")
+        conn.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+        # Mantém o AUTOINCREMENT sem reaproveitar ids de linhas já excluídas
+        if tabela in sequencias:
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                         (sequencias[tabela], tabela))
+            if not conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = ?", (tabela,)).fetchone():
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                             (tabela, sequencias[tabela]))
+
+    conn.execute("DROP TABLE resumo")
+    conn.execute('''
+        CREATE TABLE resumo (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            valor_estoque INTEGER NOT NULL DEFAULT 0,
+            total_vendas INTEGER NOT NULL DEFAULT 0,
+            total_custo INTEGER NOT NULL DEFAULT 0,
+            lucro_total INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT INTO resumo (id) VALUES (1)")
+    criar_gatilhos_resumo(
+        conn,
+        {"valor_estoque": "{0}.quantidade * {0}.preco_custo"},
+        {"total_vendas": "{0}.total_venda",
+         "total_custo": "{0}.total_custo",
+         "lucro_total": "{0}.lucro"})
+    conn.execute('''
+        UPDATE resumo SET
+            valor_estoque = (SELECT COALESCE(SUM(quantidade * preco_custo), 0) FROM produtos),
+            total_vendas = (SELECT COALESCE(SUM(total_venda), 0) FROM vendas),
+            total_custo = (SELECT COALESCE(SUM(total_custo), 0) FROM vendas),
+            lucro_total = (SELECT COALESCE(SUM(lucro), 0) FROM vendas)
+        WHERE id = 1
+    ''')
+
+    criar_diario(conn)
+    for gatilho in GATILHOS_BUSCA:
+        conn.execute(gatilho)
+
+    criar_indices(conn)
+
+
+# Migrações em ordem; o número de cada uma é gravado em PRAGMA user_version.
+# Bancos criados antes do controle de versão (user_version 0) passam por
+# todas, por isso as primeiras usam IF NOT EXISTS.
+MIGRACOES = (
+    (1, criar_tabelas),
+    (2, criar_diario),
+    (3, criar_resumo),
+    (4, criar_indice_busca),
+    (5, criar_indices),
+    (6, converter_para_centavos),
+    (7, criar_consolidado),
+    (8, criar_arquivamento),
+    (9, criar_movimentos),
+    (10, criar_reposicao),
+    (11, criar_sincronizacao),
+    (12, converter_giro_log),
+    (13, criar_repasse),
+)
+
+
+def versao_schema(conn):
+    """Versão do schema gravada no banco."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migracoes(conn, migracoes=MIGRACOES):
+    """Aplica, cada uma em sua transação, as migrações ainda não aplicadas.
+
+    Depois de migrar, atualiza as estatísticas do planejador com ANALYZE
+    para que os novos índices sejam escolhidos. Retorna as versões aplicadas.
+    """
+    aplicadas = []
+    for versao, migracao in migracoes:
+        def migrar(conn):
+            # Outra instância pode ter migrado enquanto esperávamos a trava
+            if versao_schema(conn) >= versao:
+                return False
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {versao}")
+            return True
+
+        if versao_schema(conn) < versao and executar_transacao(conn, migrar):
+            aplicadas.append(versao)
+
+    if aplicadas:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return aplicadas
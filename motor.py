@@ -0,0 +1,204 @@
+import sqlite3
+from banco import (GerenciadorConexoes, CAMINHO_BANCO, executar_transacao, podar_alteracoes,
+                   ler_resumo, reconciliar_resumo, banco_ocupado)
+from busca import expressao_busca, FILTRO_BUSCA
+from migracoes import aplicar_migracoes
+from movimentos import (origem_movimento, fechar_saldos, estoque_em, valor_estoque_em,
+                        divergencias_estoque)
+from produtos import validar_produto, validar_entrada, ProdutoNaoEncontrado
+from relatorios import fechar_periodos, agregar_vendas, resumir_produtos, totalizar_vendas
+from reposicao import produtos_em_risco, LIMITE_ALERTAS
+from sincronizacao import podar_lotes, redefinir_loja
+from tabela_virtual import buscar_pagina, buscar_por_ids
+from vendas import registrar_itens
+
+# Regras de negócio do estoque, sem nenhuma dependência de interface. As
+# funções recebem a conexão e não fazem commit; MotorEstoque cuida das
+# conexões e das transações para quem não usa o executor da interface.
+
+CONSULTA_PRODUTOS = "SELECT id, nome, quantidade, preco_custo FROM produtos"
+
+
+def preparar_banco(conn):
+    """Aplica as migrações pendentes e a manutenção feita ao abrir o banco."""
+    aplicar_migracoes(conn)
+    podar_alteracoes(conn)
+    fechar_periodos(conn)
+    fechar_saldos(conn)
+    podar_lotes(conn)
+    conn.commit()
+
+
+def inserir_produto(conn, nome, quantidade, preco_custo):
+    """Cadastra um produto já validado e retorna o seu id."""
+    return conn.execute(
+        "INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, ?, ?)",
+        (nome, quantidade, preco_custo)).lastrowid
+
+
+def alterar_produto(conn, produto_id, nome, quantidade, preco_custo):
+    """Atualiza um produto já validado."""
+    cursor = conn.execute(
+        "UPDATE produtos SET nome = ?, quantidade = ?, preco_custo = ? WHERE id = ?",
+        (nome, quantidade, preco_custo, produto_id))
+    if not cursor.rowcount:
+        raise ProdutoNaoEncontrado(produto_id)
+
+
+def remover_produto(conn, produto_id):
+    """Exclui um produto."""
+    if not conn.execute("DELETE FROM produtos WHERE id = ?", (produto_id,)).rowcount:
+        raise ProdutoNaoEncontrado(produto_id)
+
+
+def registrar_entrada(conn, produto_id, quantidade, preco_custo=None):
+    """Soma ao estoque uma entrada já validada, com o novo custo se informado."""
+    with origem_movimento(conn, "E"):
+        cursor = conn.execute(
+            "UPDATE produtos SET quantidade = quantidade + ?, "
+            "preco_custo = COALESCE(?, preco_custo) WHERE id = ?",
+            (quantidade, preco_custo, produto_id))
+    if not cursor.rowcount:
+        raise ProdutoNaoEncontrado(produto_id)
+
+
+def consultar_estoque_em(conn, data):
+    """Linhas de `estoque_em` e os totais de `valor_estoque_em`, do mesmo instantâneo."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    return estoque_em(conn, data), valor_estoque_em(conn, data)
+
+
+def consultar_produtos(conn, termo=None, apos=None, limite=100):
+    """Página de produtos ordenada por nome, opcionalmente filtrada pela busca.
+
+    `apos` é a chave `(nome, id)` do último produto da página anterior.
+    """
+    expressao = expressao_busca(termo)
+    onde, parametros = (FILTRO_BUSCA, (expressao,)) if expressao else (None, ())
+    return buscar_pagina(conn, CONSULTA_PRODUTOS, ("nome", "id"), apos, None, limite,
+                         onde=onde, parametros=parametros)
+
+
+def obter_produto(conn, produto_id):
+    """Linha `(id, nome, quantidade, preco_custo)` de um produto."""
+    linhas = buscar_por_ids(conn, CONSULTA_PRODUTOS, [produto_id])
+    if not linhas:
+        raise ProdutoNaoEncontrado(produto_id)
+    return linhas[0]
+
+
+class MotorEstoque:
+    """Acesso ao estoque para clientes sem interface gráfica.
+
+    Leituras usam o pool de conexões e podem rodar em paralelo; as escritas
+    passam pela conexão única de escrita, uma transação por vez.
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, tamanho_pool=3, metricas=None):
+        self.banco = GerenciadorConexoes(caminho, tamanho_pool, metricas=metricas)
+        with self.banco.escrita() as conn:
+            preparar_banco(conn)
+
+    def ler(self, funcao, *args):
+        """Executa `funcao(conn, *args)` numa conexão de leitura."""
+        with self.banco.leitura() as conn:
+            return funcao(conn, *args)
+
+    def escrever(self, funcao, *args):
+        """Executa `funcao(conn, *args)` numa transação de escrita."""
+        with self.banco.escrita() as conn:
+            return executar_transacao(conn, lambda conn: funcao(conn, *args))
+
+    def escrever_lote(self, operacoes, tentativas=6):
+        """Executa várias escritas `(funcao, args)` numa única transação.
+
+        Cada operação roda num SAVEPOINT próprio: a que falhar é desfeita
+        sozinha, sem afetar as demais, e o commit é um só para o lote.
+        Retorna, na ordem, `(True, resultado)` ou `(False, exceção)`.
+        """
+        def gravar(conn):
+            resultados = []
+            for funcao, args in operacoes:
+                conn.execute("SAVEPOINT operacao")
+                try:
+                    resultado = funcao(conn, *args)
+                except sqlite3.OperationalError as e:
+                    if banco_ocupado(e):
+                        raise  # Repete o lote inteiro
+                    conn.execute("ROLLBACK TO operacao")
+                    resultados.append((False, e))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operacao")
+                    resultados.append((False, e))
+                else:
+                    resultados.append((True, resultado))
+                conn.execute("RELEASE operacao")
+            return resultados
+
+        with self.banco.escrita() as conn:
+            return executar_transacao(conn, gravar, tentativas)
+
+    def adicionar_produto(self, nome, quantidade, preco_custo):
+        """Valida e cadastra um produto; o preço é em reais. Retorna o id."""
+        return self.escrever(inserir_produto, *validar_produto(nome, quantidade, preco_custo))
+
+    def atualizar_produto(self, produto_id, nome, quantidade, preco_custo):
+        """Valida e atualiza um produto; o preço é em reais."""
+        self.escrever(alterar_produto, produto_id, *validar_produto(nome, quantidade, preco_custo))
+
+    def excluir_produto(self, produto_id):
+        """Exclui um produto."""
+        self.escrever(remover_produto, produto_id)
+
+    def listar_produtos(self, termo=None, apos=None, limite=100):
+        """Página de produtos ordenada por nome; veja `consultar_produtos`."""
+        return self.ler(consultar_produtos, termo, apos, limite)
+
+    def produto(self, produto_id):
+        """Linha de um produto pelo id."""
+        return self.ler(obter_produto, produto_id)
+
+    def registrar_venda(self, itens):
+        """Registra uma venda de itens `(produto_id, quantidade, preco_venda_centavos)`."""
+        return self.escrever(registrar_itens, itens)
+
+    def registrar_entrada(self, produto_id, quantidade, preco_custo=None):
+        """Valida e registra uma entrada de estoque; o preço é em reais."""
+        self.escrever(registrar_entrada, produto_id, *validar_entrada(quantidade, preco_custo))
+
+    def estoque_em(self, data):
+        """Estoque de cada produto e os totais ao fim do dia `data`."""
+        return self.ler(consultar_estoque_em, data)
+
+    def reposicao(self, limite=LIMITE_ALERTAS):
+        """Produtos no ponto de pedido ou abaixo, com a sugestão de compra."""
+        return self.ler(produtos_em_risco, limite)
+
+    def totais(self, inicio=None, fim=None):
+        """Totais de vendas no intervalo, ou os totais gerais com o valor em estoque."""
+        if inicio or fim:
+            return self.ler(totalizar_vendas, inicio, fim)
+        return self.ler(ler_resumo)
+
+    def relatorio(self, periodo=None, inicio=None, fim=None, limite=None):
+        """Vendas agrupadas por período e produto, ou só por produto sem `periodo`."""
+        if periodo is None:
+            return self.ler(resumir_produtos, inicio, fim, limite)
+        return self.ler(agregar_vendas, periodo, inicio, fim, limite)
+
+    def reconciliar(self):
+        """Recalcula os totais materializados e retorna as divergências."""
+        return self.escrever(reconciliar_resumo)
+
+    def conferir_estoque(self):
+        """Produtos cuja quantidade não bate com o livro de movimentos."""
+        return self.ler(divergencias_estoque)
+
+    def nova_identidade(self):
+        """Dá uma identidade nova a este banco, depois de copiado de outra loja."""
+        return self.escrever(redefinir_loja)
+
+    def fechar(self):
+        """Fecha as conexões com o banco."""
+        self.banco.fechar()
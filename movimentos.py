@@ -0,0 +1,207 @@
+from contextlib import contextmanager
+from datetime import datetime
+from relatorios import inicio_periodo_aberto, fim_exclusivo
+
+# Livro de movimentos de estoque: cada variação de produtos.quantidade (ou do
+# custo) vira uma linha, gravada por gatilho na mesma transação da alteração.
+# A quantidade em produtos continua sendo a posição atual; o livro e os saldos
+# periódicos respondem qual era o estoque numa data passada.
+
+TIPOS_MOVIMENTO = {"E": "Entrada", "V": "Venda", "A": "Ajuste", "S": "Sincronização"}
+
+CRIAR_MOVIMENTOS = '''
+    CREATE TABLE IF NOT EXISTS movimentos (
+        id INTEGER PRIMARY KEY,
+        produto_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_custo INTEGER NOT NULL,
+        data TEXT NOT NULL
+    )
+'''
+
+# Tipo dos movimentos gerados pela alteração em curso; fora de
+# `origem_movimento` vale 'A', o ajuste manual
+CRIAR_ORIGEM = '''
+    CREATE TABLE IF NOT EXISTS movimento_origem (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        tipo TEXT NOT NULL
+    )
+'''
+
+# Saldo de cada produto no início de `data`: tudo o que foi movimentado antes
+CRIAR_SALDOS = '''
+    CREATE TABLE IF NOT EXISTS saldos (
+        data TEXT NOT NULL,
+        produto_id INTEGER NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_custo INTEGER NOT NULL,
+        PRIMARY KEY (data, produto_id)
+    ) WITHOUT ROWID
+'''
+
+# Datas em que houve fechamento de saldo, mesmo sem nenhum produto em estoque
+CRIAR_DATAS_SALDOS = "CREATE TABLE IF NOT EXISTS saldos_datas (data TEXT PRIMARY KEY)"
+
+# Sempre a hora da gravação, nunca a data informada pelo usuário: o livro só
+# cresce no fim, e um saldo fechado não muda com lançamentos retroativos
+DATA_MOVIMENTO = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+TIPO_MOVIMENTO = "(SELECT tipo FROM movimento_origem WHERE id = 1)"
+
+GATILHOS_MOVIMENTOS = (
+    ("produtos_movimento_i", "AFTER INSERT ON produtos", "NEW.quantidade != 0",
+     "NEW.id, 'E', NEW.quantidade, NEW.preco_custo"),
+    ("produtos_movimento_u", "AFTER UPDATE OF quantidade, preco_custo ON produtos",
+     "NEW.quantidade != OLD.quantidade OR NEW.preco_custo != OLD.preco_custo",
+     f"NEW.id, {TIPO_MOVIMENTO}, NEW.quantidade - OLD.quantidade, NEW.preco_custo"),
+    ("produtos_movimento_d", "AFTER DELETE ON produtos", "OLD.quantidade != 0",
+     "OLD.id, 'A', -OLD.quantidade, OLD.preco_custo"),
+)
+
+
+def agora():
+    """Data e hora atuais no formato gravado no banco."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def criar_movimentos(conn):
+    """Cria o livro de movimentos, seus gatilhos e o saldo de abertura.
+
+    O estoque atual vira o primeiro saldo, já que não há histórico anterior.
+    """
+    conn.execute(CRIAR_MOVIMENTOS)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movimentos_data "
+                 "ON movimentos (data, produto_id, quantidade, preco_custo)")
+    conn.execute(CRIAR_ORIGEM)
+    conn.execute("INSERT OR IGNORE INTO movimento_origem (id, tipo) VALUES (1, 'A')")
+    conn.execute(CRIAR_SALDOS)
+    conn.execute(CRIAR_DATAS_SALDOS)
+
+    for nome, evento, condicao, valores in GATILHOS_MOVIMENTOS:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nome} {evento}
+            WHEN {condicao}
+            BEGIN
+                INSERT INTO movimentos (produto_id, tipo, quantidade, preco_custo, data)
+                VALUES ({valores}, {DATA_MOVIMENTO});
+            END
+        ''')
+
+    abertura = agora()
+    conn.execute("INSERT INTO saldos_datas (data) VALUES (?)", (abertura,))
+    conn.execute('''
+        INSERT INTO saldos (data, produto_id, quantidade, preco_custo)
+        SELECT ?, id, quantidade, preco_custo FROM produtos WHERE quantidade != 0
+    ''', (abertura,))
+
+
+@contextmanager
+def origem_movimento(conn, tipo):
+    """Classifica como `tipo` os movimentos gerados dentro do bloco.
+
+    Precisa rodar dentro da transação que faz as alterações.
+    """
+    conn.execute("UPDATE movimento_origem SET tipo = ? WHERE id = 1", (tipo,))
+    try:
+        yield
+    finally:
+        conn.execute("UPDATE movimento_origem SET tipo = 'A' WHERE id = 1")
+
+
+def ultimo_saldo(conn, antes_de):
+    """Data do saldo mais recente anterior a `antes_de`, ou None."""
+    return conn.execute("SELECT MAX(data) FROM saldos_datas WHERE data < ?",
+                        (antes_de,)).fetchone()[0]
+
+
+def posicao_estoque(conn, antes_de):
+    """Subconsulta com a posição de cada produto em `antes_de` (exclusive).
+
+    Parte do saldo mais recente e soma só os movimentos posteriores a ele.
+    Retorna o SQL e os parâmetros; as colunas são `produto_id`,
+    `quantidade` e `preco_custo` (o custo vigente naquele momento).
+    """
+    base = ultimo_saldo(conn, antes_de)
+    partes, parametros = [], []
+    if base is not None:
+        partes.append("SELECT produto_id, quantidade, preco_custo, 0 AS ordem "
+                      "FROM saldos WHERE data = ?")
+        parametros.append(base)
+    # O custo vem do último movimento de cada produto (MAX escolhe a linha)
+    partes.append('''
+        SELECT produto_id, SUM(quantidade) AS quantidade, preco_custo, MAX(id) AS ordem
+        FROM movimentos
+        WHERE data >= ? AND data < ?
+        GROUP BY produto_id''')
+    parametros += [base or "", antes_de]
+    sql = f'''
+        SELECT produto_id, SUM(quantidade) AS quantidade, preco_custo, MAX(ordem)
+        FROM ({" UNION ALL ".join(partes)})
+        GROUP BY produto_id'''
+    return sql, parametros
+
+
+def estoque_em(conn, data):
+    """Estoque de cada produto ao fim do dia `data` (AAAA-MM-DD).
+
+    Retorna tuplas `(produto_id, nome, quantidade, preco_custo, valor)`
+    com valores em centavos, só dos produtos com saldo, ordenadas por nome.
+    """
+    posicao, parametros = posicao_estoque(conn, fim_exclusivo(data))
+    return conn.execute(f'''
+        SELECT p.produto_id, COALESCE(produtos.nome, 'Produto ' || p.produto_id),
+               p.quantidade, p.preco_custo, p.quantidade * p.preco_custo
+        FROM ({posicao}) AS p
+        LEFT JOIN produtos ON produtos.id = p.produto_id
+        WHERE p.quantidade != 0
+        ORDER BY 2, 1
+    ''', parametros).fetchall()
+
+
+def valor_estoque_em(conn, data):
+    """Quantidade total e valor (em centavos) do estoque ao fim do dia `data`."""
+    posicao, parametros = posicao_estoque(conn, fim_exclusivo(data))
+    quantidade, valor = conn.execute(f'''
+        SELECT COALESCE(SUM(quantidade), 0), COALESCE(SUM(quantidade * preco_custo), 0)
+        FROM ({posicao})
+    ''', parametros).fetchone()
+    return {"quantidade": quantidade, "valor_estoque": valor}
+
+
+def tirar_saldo(conn, data):
+    """Grava o saldo de todos os produtos no início de `data`. Não faz commit."""
+    posicao, parametros = posicao_estoque(conn, data)
+    conn.execute("INSERT INTO saldos_datas (data) VALUES (?)", (data,))
+    conn.execute(f'''
+        INSERT INTO saldos (data, produto_id, quantidade, preco_custo)
+        SELECT ?, produto_id, quantidade, preco_custo FROM ({posicao})
+        WHERE quantidade != 0
+    ''', [data, *parametros])
+
+
+def fechar_saldos(conn, hoje=None):
+    """Grava o saldo do início do mês corrente, se ainda não houver um.
+
+    Assim uma consulta de posição nunca soma mais que um mês de
+    movimentos. Não faz commit. Retorna a data do saldo gravado, ou None.
+    """
+    inicio = inicio_periodo_aberto(hoje)
+    ultimo = conn.execute("SELECT MAX(data) FROM saldos_datas").fetchone()[0]
+    if ultimo is not None and ultimo >= inicio:
+        return None
+    tirar_saldo(conn, inicio)
+    return inicio
+
+
+def divergencias_estoque(conn):
+    """Produtos cuja quantidade difere da soma do livro de movimentos.
+
+    Retorna `{produto_id: (quantidade_em_produtos, quantidade_no_livro)}`;
+    vazio enquanto todas as alterações passarem pelos gatilhos.
+    """
+    posicao, parametros = posicao_estoque(conn, "9999-12-31")
+    return {produto_id: (atual, livro) for produto_id, atual, livro in conn.execute(f'''
+        SELECT produtos.id, produtos.quantidade, COALESCE(p.quantidade, 0)
+        FROM produtos LEFT JOIN ({posicao}) AS p ON p.produto_id = produtos.id
+        WHERE produtos.quantidade != COALESCE(p.quantidade, 0)
+    ''', parametros)}
@@ -0,0 +1,58 @@
+import math
+from dinheiro import para_centavos
+
+
+class ProdutoInvalido(ValueError):
+    """Dados de produto que não passam na validação do cadastro."""
+
+
+class ProdutoNaoEncontrado(LookupError):
+    """O produto informado não existe (ou já foi excluído)."""
+
+    def __init__(self, produto_id):
+        self.produto_id = produto_id
+        super().__init__(f"Produto {produto_id} não encontrado!")
+
+
+def validar_produto(nome, quantidade, preco_custo):
+    """Valida os campos do cadastro de produto e os converte.
+
+    Retorna a tupla `(nome, quantidade, preco_custo)` já convertida, com o
+    preço em centavos, ou levanta `ProdutoInvalido` com a mensagem a exibir
+    ao usuário.
+    """
+    nome = str(nome if nome is not None else "").strip()
+    quantidade = str(quantidade if quantidade is not None else "").strip()
+    preco_custo = str(preco_custo if preco_custo is not None else "").strip()
+
+    if not nome or not quantidade or not preco_custo:
+        raise ProdutoInvalido("Preencha todos os campos!")
+
+    if not quantidade.isdigit() or int(quantidade) <= 0:
+        raise ProdutoInvalido("Quantidade deve ser um número positivo!")
+
+    try:
+        preco = float(preco_custo)
+        if not math.isfinite(preco) or preco <= 0:
+            raise ValueError
+    except ValueError:
+        raise ProdutoInvalido("Preço de custo inválido!") from None
+
+    centavos = para_centavos(preco_custo)
+    if centavos <= 0:
+        raise ProdutoInvalido("Preço de custo inválido!")
+
+    return nome, int(quantidade), centavos
+
+
+def validar_entrada(quantidade, preco_custo=None):
+    """Valida uma entrada de estoque e converte o custo para centavos.
+
+    Sem `preco_custo`, o produto mantém o custo atual.
+    """
+    quantidade = str(quantidade if quantidade is not None else "").strip()
+    if not quantidade.isdigit() or int(quantidade) <= 0:
+        raise ProdutoInvalido("Quantidade deve ser um número positivo!")
+    if preco_custo is None or not str(preco_custo).strip():
+        return int(quantidade), None
+    return int(quantidade), validar_produto("entrada", 1, preco_custo)[2]
@@ -0,0 +1,232 @@
+from datetime import date, timedelta
+
+# Expressão que leva um dia (AAAA-MM-DD) ao início do seu período
+PERIODOS = {
+    "dia": "{0}",
+    "semana": "date({0}, '-6 days', 'weekday 1')",  # segunda-feira da semana
+    "mes": "substr({0}, 1, 7)",
+}
+
+# Valores somados em cada agregação
+COLUNAS_AGREGADAS = ("quantidade", "vendas", "total_venda", "total_custo", "lucro")
+
+CRIAR_VENDAS_POR_DIA = '''
+    CREATE TABLE IF NOT EXISTS vendas_por_dia (
+        dia TEXT NOT NULL,
+        produto_id INTEGER NOT NULL,
+        nome_produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        vendas INTEGER NOT NULL,
+        total_venda INTEGER NOT NULL,
+        total_custo INTEGER NOT NULL,
+        lucro INTEGER NOT NULL,
+        PRIMARY KEY (dia, produto_id)
+    ) WITHOUT ROWID
+'''
+
+# Dias anteriores a `ate` já estão consolidados em vendas_por_dia
+CRIAR_FECHAMENTO = '''
+    CREATE TABLE IF NOT EXISTS vendas_fechamento (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        ate TEXT NOT NULL
+    )
+'''
+
+# Vendas gravadas ou alteradas num período já fechado corrigem o consolidado
+SOMAR_DIA = '''
+    INSERT INTO vendas_por_dia
+    (dia, produto_id, nome_produto, quantidade, vendas, total_venda, total_custo, lucro)
+    VALUES (substr(NEW.data_venda, 1, 10), NEW.produto_id, NEW.nome_produto,
+            NEW.quantidade, 1, NEW.total_venda, NEW.total_custo, NEW.lucro)
+    ON CONFLICT (dia, produto_id) DO UPDATE SET
+        quantidade = quantidade + excluded.quantidade,
+        vendas = vendas + 1,
+        total_venda = total_venda + excluded.total_venda,
+        total_custo = total_custo + excluded.total_custo,
+        lucro = lucro + excluded.lucro;
+'''
+
+SUBTRAIR_DIA = '''
+    UPDATE vendas_por_dia SET
+        quantidade = quantidade - OLD.quantidade,
+        vendas = vendas - 1,
+        total_venda = total_venda - OLD.total_venda,
+        total_custo = total_custo - OLD.total_custo,
+        lucro = lucro - OLD.lucro
+    WHERE dia = substr(OLD.data_venda, 1, 10) AND produto_id = OLD.produto_id;
+'''
+
+PERIODO_FECHADO = "substr({0}.data_venda, 1, 10) < (SELECT ate FROM vendas_fechamento WHERE id = 1)"
+
+GATILHOS_FECHAMENTO = (
+    ("vendas_dia_i", "AFTER INSERT", "NEW", SOMAR_DIA),
+    ("vendas_dia_d", "AFTER DELETE", "OLD", SUBTRAIR_DIA),
+    ("vendas_dia_u_antigo", "AFTER UPDATE", "OLD", SUBTRAIR_DIA),
+    ("vendas_dia_u_novo", "AFTER UPDATE", "NEW", SOMAR_DIA),
+)
+
+
+def criar_consolidado(conn):
+    """Cria a tabela de vendas consolidadas por dia e os gatilhos que a mantêm."""
+    conn.execute(CRIAR_VENDAS_POR_DIA)
+    conn.execute(CRIAR_FECHAMENTO)
+    conn.execute("INSERT OR IGNORE INTO vendas_fechamento (id, ate) VALUES (1, '')")
+    for nome, evento, linha, corpo in GATILHOS_FECHAMENTO:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nome} {evento} ON vendas
+            WHEN {PERIODO_FECHADO.format(linha)}
+            BEGIN
+                {corpo}
+            END
+        ''')
+
+
+def inicio_periodo_aberto(hoje=None):
+    """Primeiro dia do mês corrente: tudo antes dele é período fechado."""
+    return (hoje or date.today()).replace(day=1).isoformat()
+
+
+def fechamento_atual(conn):
+    """Data até a qual (exclusive) as vendas estão consolidadas."""
+    linha = conn.execute("SELECT ate FROM vendas_fechamento WHERE id = 1").fetchone()
+    return linha[0] if linha else ""
+
+
+def fechar_periodos(conn, hoje=None):
+    """Consolida em vendas_por_dia as vendas dos meses já encerrados.
+
+    Só lê as vendas entre o fechamento anterior e o início do mês corrente,
+    de modo que cada venda é consolidada uma única vez. Não faz commit.
+    Retorna a nova data de fechamento.
+    """
+    ate = inicio_periodo_aberto(hoje)
+    anterior = fechamento_atual(conn)
+    if ate <= anterior:
+        return anterior
+
+    conn.execute('''
+        INSERT INTO vendas_por_dia
+        (dia, produto_id, nome_produto, quantidade, vendas, total_venda, total_custo, lucro)
+        SELECT substr(data_venda, 1, 10), produto_id, MAX(nome_produto), SUM(quantidade),
+               COUNT(*), SUM(total_venda), SUM(total_custo), SUM(lucro)
+        FROM vendas
+        WHERE data_venda >= ? AND data_venda < ?
+        GROUP BY 1, 2
+        ON CONFLICT (dia, produto_id) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            vendas = vendas + excluded.vendas,
+            total_venda = total_venda + excluded.total_venda,
+            total_custo = total_custo + excluded.total_custo,
+            lucro = lucro + excluded.lucro
+    ''', (anterior, ate))
+    conn.execute("UPDATE vendas_fechamento SET ate = ? WHERE id = 1", (ate,))
+    return ate
+
+
+def fim_exclusivo(fim):
+    """Converte a data final inclusiva (AAAA-MM-DD) no dia seguinte."""
+    return (date.fromisoformat(fim) + timedelta(days=1)).isoformat()
+
+
+def fontes_vendas(conn, inicio=None, fim=None):
+    """Monta a união das vendas consolidadas e brutas no intervalo `[inicio, fim]`.
+
+    Os dias já fechados vêm de vendas_por_dia; só o período aberto é lido
+    de vendas, pelo índice em data_venda. Retorna o SQL e os parâmetros de
+    uma subconsulta com as colunas `dia`, `produto_id`, `nome_produto` e
+    os valores de COLUNAS_AGREGADAS.
+    """
+    corte = fechamento_atual(conn)
+    inicio = inicio or ""
+    fim = fim_exclusivo(fim) if fim else "9999-12-31"
+
+    partes, parametros = [], []
+    if inicio < min(corte, fim):
+        partes.append('''
+            SELECT dia, produto_id, nome_produto, quantidade, vendas,
+                   total_venda, total_custo, lucro
+            FROM vendas_por_dia
+            WHERE dia >= ? AND dia < ?''')
+        parametros += [inicio, min(corte, fim)]
+    if max(inicio, corte) < fim:
+        partes.append('''
+            SELECT substr(data_venda, 1, 10) AS dia, produto_id, nome_produto, quantidade,
+                   1 AS vendas, total_venda, total_custo, lucro
+            FROM vendas
+            WHERE data_venda >= ? AND data_venda < ?''')
+        parametros += [max(inicio, corte), fim]
+    if not partes:
+        return "SELECT NULL AS dia, NULL AS produto_id, NULL AS nome_produto, " + \
+            ", ".join(f"0 AS {coluna}" for coluna in COLUNAS_AGREGADAS) + " WHERE 0", []
+
+    colunas = "dia, produto_id, nome_produto, " + ", ".join(COLUNAS_AGREGADAS)
+    return f"SELECT {colunas} FROM (" + " UNION ALL ".join(partes) + ")", parametros
+
+
+def agregar_vendas(conn, periodo, inicio=None, fim=None, limite=None):
+    """Totais de vendas por período e produto no intervalo informado.
+
+    `periodo` é "dia", "semana" ou "mes". Retorna tuplas `(inicio_periodo,
+    produto_id, nome_produto, quantidade, vendas, total_venda, total_custo,
+    lucro)`, dos períodos mais recentes para os mais antigos.
+    """
+    fonte, parametros = fontes_vendas(conn, inicio, fim)
+    chave = PERIODOS[periodo].format("dia")
+    somas = ", ".join(f"SUM({coluna})" for coluna in COLUNAS_AGREGADAS)
+    sql = f'''
+        SELECT {chave} AS periodo, produto_id, MAX(nome_produto), {somas}
+        FROM ({fonte})
+        GROUP BY periodo, produto_id
+        HAVING SUM(vendas) > 0
+        ORDER BY periodo DESC, SUM(total_venda) DESC
+    '''
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros = [*parametros, limite]
+    return conn.execute(sql, parametros).fetchall()
+
+
+def resumir_produtos(conn, inicio=None, fim=None, limite=None):
+    """Totais por produto no intervalo, dos que mais faturaram para os que menos.
+
+    Retorna tuplas `(produto_id, nome_produto, quantidade, vendas,
+    total_venda, total_custo, lucro)`; a margem é `lucro / total_venda`.
+    """
+    fonte, parametros = fontes_vendas(conn, inicio, fim)
+    somas = ", ".join(f"SUM({coluna})" for coluna in COLUNAS_AGREGADAS)
+    sql = f'''
+        SELECT produto_id, MAX(nome_produto), {somas}
+        FROM ({fonte})
+        GROUP BY produto_id
+        HAVING SUM(vendas) > 0
+        ORDER BY SUM(total_venda) DESC, produto_id
+    '''
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros = [*parametros, limite]
+    return conn.execute(sql, parametros).fetchall()
+
+
+def totalizar_vendas(conn, inicio=None, fim=None):
+    """Total vendido, custo e lucro no intervalo, nas chaves usadas pelo resumo."""
+    fonte, parametros = fontes_vendas(conn, inicio, fim)
+    total_venda, total_custo, lucro = conn.execute(f'''
+        SELECT COALESCE(SUM(total_venda), 0), COALESCE(SUM(total_custo), 0),
+               COALESCE(SUM(lucro), 0)
+        FROM ({fonte})
+    ''', parametros).fetchone()
+    return {"total_vendas": total_venda, "total_custo": total_custo, "lucro_total": lucro}
+
+
+def interpretar_data(texto):
+    """Converte DD/MM/AAAA ou AAAA-MM-DD em AAAA-MM-DD; None se estiver vazio.
+
+    Levanta ValueError se a data for inválida.
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return None
+    if "/" in texto:
+        dia, mes, ano = texto.split("/")
+        return date(int(ano), int(mes), int(dia)).isoformat()
+    return date.fromisoformat(texto).isoformat()
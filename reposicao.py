@@ -0,0 +1,284 @@
+import bisect
+import heapq
+import math
+from datetime import datetime, timedelta
+from banco import ler_alteracoes
+from tabela_virtual import buscar_por_ids
+
+# Reposição de estoque a partir do giro de vendas de cada produto.
+#
+# O giro é uma média móvel exponencial das unidades vendidas por dia. Para
+# não depender do relógio, cada venda entra com peso exp((t - EPOCA) / JANELA)
+# e o banco guarda só a soma ponderada; a velocidade atual é essa soma vezes
+# exp(-(agora - EPOCA) / JANELA) / JANELA. Assim o giro muda apenas quando o
+# produto vende, e a ordem de risco (estoque / soma) não muda com o passar
+# dos dias: só os produtos alterados precisam ser reavaliados.
+#
+# Os pesos crescem sem limite e passariam do maior float por volta de 2074,
+# por isso a coluna `giro` guarda o logaritmo da soma, e as somas são feitas
+# em escala logarítmica (log-sum-exp). A chave de risco também é
+# logarítmica: log(estoque) - giro.
+
+JANELA_GIRO_DIAS = 28
+EPOCA_GIRO = datetime(2020, 1, 1)
+
+# Prazo de entrega do fornecedor e estoque de segurança, em dias de venda
+PRAZO_ENTREGA_DIAS = 7
+COBERTURA_SEGURANCA_DIAS = 7
+# Uma sugestão de compra repõe o estoque para este número de dias além do prazo
+COBERTURA_ALVO_DIAS = 30
+
+LIMITE_ALERTAS = 200
+
+CRIAR_REPOSICAO = '''
+    CREATE TABLE IF NOT EXISTS reposicao (
+        produto_id INTEGER PRIMARY KEY,
+        giro REAL NOT NULL DEFAULT 0,
+        ultima_venda TEXT
+    )
+'''
+
+CONSULTA_SITUACAO = '''
+    SELECT produtos.id, produtos.nome, produtos.quantidade, reposicao.giro
+    FROM produtos LEFT JOIN reposicao ON reposicao.produto_id = produtos.id'''
+
+
+def dias_desde_epoca(momento):
+    """Dias (com fração) entre a época do giro e `momento` (datetime ou texto)."""
+    if isinstance(momento, str):
+        momento = datetime.fromisoformat(momento)
+    return (momento - EPOCA_GIRO).total_seconds() / 86400
+
+
+def log_peso_venda(data_venda):
+    """Logaritmo do peso de uma venda na soma do giro."""
+    return dias_desde_epoca(data_venda) / JANELA_GIRO_DIAS
+
+
+def somar_log(a, b):
+    """log(exp(a) + exp(b)) sem calcular as exponenciais; None conta como zero."""
+    if a is None or b is None:
+        return b if a is None else a
+    maior, menor = max(a, b), min(a, b)
+    return maior + math.log1p(math.exp(menor - maior))
+
+
+def fator_velocidade(agora=None):
+    """Logaritmo do fator que converte a soma ponderada do giro em unidades por dia, em `agora`."""
+    return -log_peso_venda(agora or datetime.now()) - math.log(JANELA_GIRO_DIAS)
+
+
+def criar_reposicao(conn):
+    """Cria a tabela do giro e calcula o giro a partir das vendas recentes."""
+    conn.execute(CRIAR_REPOSICAO)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_reposicao_d
+        AFTER DELETE ON produtos
+        BEGIN
+            DELETE FROM reposicao WHERE produto_id = OLD.id;
+        END
+    ''')
+    recalcular_giro(conn)
+
+
+def recalcular_giro(conn, agora=None):
+    """Refaz o giro de todos os produtos a partir das vendas. Não faz commit.
+
+    Vendas com mais de seis janelas pesam menos de 0,3% e ficam de fora,
+    de modo que só o trecho recente de vendas é lido.
+    """
+    agora = agora or datetime.now()
+    inicio = agora - timedelta(days=6 * JANELA_GIRO_DIAS)
+    # Pesos relativos a `agora` ficam perto de 1 e podem ser somados direto
+    referencia = log_peso_venda(agora)
+    conn.create_function("peso_relativo", 1,
+                         lambda data: math.exp(log_peso_venda(data) - referencia))
+    somas = conn.execute('''
+        SELECT produto_id, SUM(quantidade * peso_relativo(data_venda)), MAX(data_venda)
+        FROM vendas
+        WHERE data_venda >= ? AND produto_id IN (SELECT id FROM produtos)
+        GROUP BY produto_id
+        HAVING SUM(quantidade) > 0
+    ''', (inicio.strftime("%Y-%m-%d %H:%M:%S"),)).fetchall()
+    conn.execute("DELETE FROM reposicao")
+    conn.executemany(
+        "INSERT INTO reposicao (produto_id, giro, ultima_venda) VALUES (?, ?, ?)",
+        [(produto_id, referencia + math.log(soma), ultima)
+         for produto_id, soma, ultima in somas])
+
+
+def converter_giro_log(conn):
+    """Passa a coluna `giro` para a escala logarítmica, recalculando-a das vendas."""
+    recalcular_giro(conn)
+
+
+def registrar_giro(conn, pedidos, data_venda):
+    """Soma ao giro as unidades vendidas `{produto_id: quantidade}`. Não faz commit."""
+    peso = log_peso_venda(data_venda)
+    conn.create_function("somar_log", 2, somar_log, deterministic=True)
+    conn.executemany(
+        '''INSERT INTO reposicao (produto_id, giro, ultima_venda) VALUES (?, ?, ?)
+        ON CONFLICT (produto_id) DO UPDATE SET
+            giro = somar_log(giro, excluded.giro),
+            ultima_venda = MAX(COALESCE(ultima_venda, ''), excluded.ultima_venda)''',
+        [(produto_id, math.log(quantidade) + peso, data_venda)
+         for produto_id, quantidade in pedidos.items() if quantidade > 0])
+
+
+def chave_risco(quantidade, giro):
+    """Ordem de urgência do produto: quanto menor, mais perto de faltar.
+
+    Logaritmo de um valor proporcional aos dias de cobertura, independente
+    da data; produtos sem giro ficam com chave infinita e produtos sem
+    estoque, com chave menos infinita.
+    """
+    if giro is None:
+        return math.inf
+    if quantidade <= 0:
+        return -math.inf
+    return math.log(quantidade) - giro
+
+
+def avaliar(quantidade, giro, fator):
+    """Velocidade, dias de cobertura, ponto de pedido e sugestão de compra.
+
+    `fator` vem de `fator_velocidade`. A cobertura é None para produtos
+    sem venda recente; a sugestão é zero enquanto o estoque estiver acima
+    do ponto de pedido.
+    """
+    velocidade = 0.0 if giro is None else math.exp(giro + fator)
+    if velocidade <= 0:
+        return 0.0, None, 0, 0
+    cobertura = max(quantidade, 0) / velocidade
+    ponto_pedido = math.ceil(velocidade * (PRAZO_ENTREGA_DIAS + COBERTURA_SEGURANCA_DIAS))
+    sugestao = 0
+    if quantidade <= ponto_pedido:
+        sugestao = max(math.ceil(velocidade * (PRAZO_ENTREGA_DIAS + COBERTURA_ALVO_DIAS)) - quantidade, 0)
+    return velocidade, cobertura, ponto_pedido, sugestao
+
+
+def limite_chave_risco(fator):
+    """Maior chave de risco que ainda está no ponto de pedido ou abaixo dele."""
+    return math.log(PRAZO_ENTREGA_DIAS + COBERTURA_SEGURANCA_DIAS) + fator
+
+
+def linha_alerta(produto_id, nome, quantidade, giro, fator):
+    """Linha `(id, nome, quantidade, velocidade, cobertura, ponto_pedido, sugestao)`."""
+    return (produto_id, nome, quantidade, *avaliar(quantidade, giro, fator))
+
+
+def produtos_em_risco(conn, limite=LIMITE_ALERTAS, agora=None):
+    """Produtos no ponto de pedido ou abaixo, dos mais urgentes aos menos.
+
+    Consulta avulsa, sem estado, para o serviço e a linha de comando; a
+    interface usa `FilaReposicao`, que só relê os produtos alterados.
+    """
+    fator = fator_velocidade(agora)
+    conn.create_function("chave_risco", 2, chave_risco, deterministic=True)
+    linhas = conn.execute(f'''
+        {CONSULTA_SITUACAO}
+        WHERE reposicao.giro IS NOT NULL
+          AND chave_risco(produtos.quantidade, reposicao.giro) <= ?
+        ORDER BY chave_risco(produtos.quantidade, reposicao.giro), produtos.id
+        LIMIT ?
+    ''', (limite_chave_risco(fator), limite)).fetchall()
+    return [linha_alerta(*linha, fator) for linha in linhas]
+
+
+class FilaReposicao:
+    """Fila de prioridade dos produtos em risco, atualizada pelo diário de alterações.
+
+    A primeira carga lê todos os produtos com giro; depois, cada
+    atualização relê só os produtos alterados desde a versão anterior e os
+    recoloca na fila. Entradas antigas ficam no heap e são descartadas ao
+    aparecer no topo. As chaves atuais também ficam numa lista ordenada,
+    para contar os produtos em risco por busca binária. Não é segura entre
+    threads: use sempre a mesma.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.atuais = {}  # produto_id: (chave, nome, quantidade, giro)
+        self.chaves = []  # chaves de self.atuais, em ordem
+        self.versao = None
+
+    def carregar(self, conn):
+        """Lê todos os produtos com giro e refaz a fila."""
+        self.atuais = {
+            produto_id: (chave_risco(quantidade, giro), nome, quantidade, giro)
+            for produto_id, nome, quantidade, giro in conn.execute(
+                f"{CONSULTA_SITUACAO} WHERE reposicao.giro IS NOT NULL")}
+        self.chaves = sorted(chave for chave, *_ in self.atuais.values())
+        self._refazer_heap()
+
+    def _refazer_heap(self):
+        self.heap = [(chave, produto_id) for produto_id, (chave, *_) in self.atuais.items()]
+        heapq.heapify(self.heap)
+
+    def _trocar_chave(self, anterior, nova):
+        """Substitui `anterior` por `nova` na lista ordenada; None indica ausência."""
+        if anterior is not None:
+            del self.chaves[bisect.bisect_left(self.chaves, anterior)]
+        if nova is not None:
+            bisect.insort(self.chaves, nova)
+
+    def aplicar(self, conn, ids):
+        """Reavalia os produtos informados (inseridos, alterados ou excluídos)."""
+        ids = list(ids)
+        encontrados = set()
+        for produto_id, nome, quantidade, giro in buscar_por_ids(
+                conn, CONSULTA_SITUACAO, ids, coluna_id="produtos.id"):
+            encontrados.add(produto_id)
+            chave = chave_risco(quantidade, giro)
+            anterior = self.atuais.get(produto_id)
+            if chave == math.inf:
+                if anterior is not None:
+                    del self.atuais[produto_id]
+                    self._trocar_chave(anterior[0], None)
+                continue
+            self.atuais[produto_id] = (chave, nome, quantidade, giro)
+            if anterior is None or anterior[0] != chave:
+                self._trocar_chave(None if anterior is None else anterior[0], chave)
+                heapq.heappush(self.heap, (chave, produto_id))
+        for produto_id in set(ids) - encontrados:
+            anterior = self.atuais.pop(produto_id, None)
+            if anterior is not None:
+                self._trocar_chave(anterior[0], None)
+
+        # Muitas entradas vencidas: reconstruir sai mais barato que descartá-las
+        if len(self.heap) > 2 * len(self.atuais) + 1000:
+            self._refazer_heap()
+
+    def atualizar(self, conn):
+        """Traz a fila para a versão atual do diário; recarrega se preciso."""
+        seq, alteradas = ler_alteracoes(conn, self.versao)
+        if alteradas is None:
+            self.carregar(conn)
+        elif "produtos" in alteradas:
+            self.aplicar(conn, alteradas["produtos"])
+        self.versao = seq
+
+    def em_risco(self, limite=LIMITE_ALERTAS, agora=None):
+        """Linhas dos produtos no ponto de pedido ou abaixo, dos mais urgentes.
+
+        Retira do topo só o necessário, descartando entradas vencidas, e
+        devolve ao heap as que continuam válidas.
+        """
+        fator = fator_velocidade(agora)
+        maximo = limite_chave_risco(fator)
+        retiradas, linhas = set(), []
+        while self.heap and len(linhas) < limite and self.heap[0][0] <= maximo:
+            chave, produto_id = heapq.heappop(self.heap)
+            atual = self.atuais.get(produto_id)
+            if atual is None or atual[0] != chave or produto_id in retiradas:
+                continue  # Entrada vencida ou repetida
+            retiradas.add(produto_id)
+            _, nome, quantidade, giro = atual
+            linhas.append(linha_alerta(produto_id, nome, quantidade, giro, fator))
+        for produto_id in retiradas:
+            heapq.heappush(self.heap, (self.atuais[produto_id][0], produto_id))
+        return linhas
+
+    def total_em_risco(self, agora=None):
+        """Quantos produtos estão no ponto de pedido ou abaixo."""
+        return bisect.bisect_right(self.chaves, limite_chave_risco(fator_velocidade(agora)))
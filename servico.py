@@ -0,0 +1,407 @@
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from banco import CAMINHO_BANCO, ler_resumo
+from dinheiro import para_reais
+from metricas import Metricas
+from motor import (MotorEstoque, inserir_produto, alterar_produto, remover_produto,
+                   consultar_produtos, obter_produto, registrar_entrada, consultar_estoque_em)
+from produtos import validar_produto, validar_entrada, ProdutoNaoEncontrado
+from relatorios import agregar_vendas, resumir_produtos, totalizar_vendas, interpretar_data, PERIODOS
+from reposicao import produtos_em_risco, LIMITE_ALERTAS
+from sincronizacao import (exportar_lote, aplicar_lote, situacao_sincronizacao, validar_lote,
+                           ErroSincronizacao, LOTES_POR_RESPOSTA)
+from vendas import registrar_itens, validar_item, EstoqueInsuficiente
+
+# Serviço HTTP/JSON local sobre o MotorEstoque, para terminais de venda e scripts.
+# Valores monetários entram e saem em reais; no banco continuam em centavos.
+
+PORTA_PADRAO = 8765
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+
+MENSAGENS_STATUS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class ErroHttp(Exception):
+    """Erro que vira diretamente uma resposta HTTP."""
+
+    def __init__(self, status, mensagem):
+        self.status = status
+        super().__init__(mensagem)
+
+
+def produto_json(linha):
+    """Converte uma linha de produto no formato da API."""
+    produto_id, nome, quantidade, preco_custo = linha
+    return {"id": produto_id, "nome": nome, "quantidade": quantidade,
+            "preco_custo": para_reais(preco_custo)}
+
+
+def totais_json(totais):
+    """Converte os totais em centavos para reais."""
+    return {chave: para_reais(valor) for chave, valor in totais.items()}
+
+
+def parametro_data(consulta, nome):
+    """Lê um parâmetro de data (DD/MM/AAAA ou AAAA-MM-DD) da query string."""
+    try:
+        return interpretar_data(consulta.get(nome))
+    except ValueError:
+        raise ErroHttp(400, f"Data inválida em '{nome}'.") from None
+
+
+def parametro_inteiro(consulta, nome, padrao=None):
+    """Lê um parâmetro inteiro não negativo da query string."""
+    valor = consulta.get(nome)
+    if valor in (None, ""):
+        return padrao
+    if not valor.isdigit():
+        raise ErroHttp(400, f"Valor inválido em '{nome}'.")
+    return int(valor)
+
+
+class ServicoEstoque:
+    """Servidor HTTP assíncrono que atende vários clientes ao mesmo tempo.
+
+    As leituras rodam num pool de threads com as conexões de leitura. As
+    escritas entram numa fila atendida por um único escritor, que grava
+    tudo o que estiver esperando numa só transação (um SAVEPOINT por
+    requisição), de modo que a carga concorrente vira poucos commits.
+    """
+
+    def __init__(self, motor, leitores=4, lote_maximo=64):
+        self.motor = motor
+        self.lote_maximo = lote_maximo
+        self._leitores = ThreadPoolExecutor(leitores, thread_name_prefix="leitura")
+        self._escritor = ThreadPoolExecutor(1, thread_name_prefix="escrita")
+        self._escritas = None
+        self._tarefa_escritor = None
+        self.rotas = (
+            ("GET", r"/produtos", self.listar_produtos),
+            ("POST", r"/produtos", self.adicionar_produto),
+            ("GET", r"/produtos/(\d+)", self.obter_produto),
+            ("PUT", r"/produtos/(\d+)", self.atualizar_produto),
+            ("DELETE", r"/produtos/(\d+)", self.excluir_produto),
+            ("POST", r"/produtos/(\d+)/entradas", self.registrar_entrada),
+            ("GET", r"/estoque", self.estoque_em),
+            ("GET", r"/reposicao", self.reposicao),
+            ("POST", r"/vendas", self.registrar_venda),
+            ("GET", r"/totais", self.totais),
+            ("GET", r"/relatorios", self.relatorio),
+            ("GET", r"/metricas", self.metricas),
+            ("GET", r"/sincronizacao", self.lotes_sincronizacao),
+            ("POST", r"/sincronizacao", self.receber_lote),
+        )
+
+    async def ler(self, funcao, *args):
+        """Executa `funcao(conn, *args)` numa conexão de leitura, fora do loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._leitores, partial(self.motor.ler, funcao, *args))
+
+    async def escrever(self, funcao, *args):
+        """Enfileira `funcao(conn, *args)` para o escritor e espera o resultado."""
+        futuro = asyncio.get_running_loop().create_future()
+        await self._escritas.put((funcao, args, futuro))
+        return await futuro
+
+    async def _gravar(self):
+        """Laço do escritor: junta as escritas pendentes e grava cada lote de uma vez."""
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._escritas.get()]
+            while len(lote) < self.lote_maximo and not self._escritas.empty():
+                lote.append(self._escritas.get_nowait())
+
+            operacoes = [(funcao, args) for funcao, args, _ in lote]
+            try:
+                resultados = await loop.run_in_executor(
+                    self._escritor, self.motor.escrever_lote, operacoes)
+            except Exception as e:
+                resultados = [(False, e)] * len(lote)
+
+            for (_, _, futuro), (sucesso, valor) in zip(lote, resultados):
+                if futuro.done():
+                    continue
+                if sucesso:
+                    futuro.set_result(valor)
+                else:
+                    futuro.set_exception(valor)
+
+    # Rotas
+
+    async def listar_produtos(self, consulta, corpo):
+        apos = None
+        if consulta.get("apos_nome") is not None:
+            apos = (consulta["apos_nome"], parametro_inteiro(consulta, "apos_id", 0))
+        limite = min(parametro_inteiro(consulta, "limite", 100), 1000)
+        linhas = await self.ler(consultar_produtos, consulta.get("termo"), apos, limite)
+
+        proximo = None
+        if len(linhas) == limite and linhas:
+            proximo = {"apos_nome": linhas[-1][1], "apos_id": linhas[-1][0]}
+        return 200, {"produtos": [produto_json(linha) for linha in linhas], "proximo": proximo}
+
+    async def obter_produto(self, consulta, corpo, produto_id):
+        return 200, produto_json(await self.ler(obter_produto, int(produto_id)))
+
+    async def adicionar_produto(self, consulta, corpo):
+        produto = validar_produto(corpo.get("nome"), corpo.get("quantidade"), corpo.get("preco_custo"))
+        return 201, {"id": await self.escrever(inserir_produto, *produto)}
+
+    async def atualizar_produto(self, consulta, corpo, produto_id):
+        produto = validar_produto(corpo.get("nome"), corpo.get("quantidade"), corpo.get("preco_custo"))
+        await self.escrever(alterar_produto, int(produto_id), *produto)
+        return 200, {"id": int(produto_id)}
+
+    async def excluir_produto(self, consulta, corpo, produto_id):
+        await self.escrever(remover_produto, int(produto_id))
+        return 200, {"id": int(produto_id)}
+
+    async def registrar_entrada(self, consulta, corpo, produto_id):
+        quantidade, preco_custo = validar_entrada(corpo.get("quantidade"), corpo.get("preco_custo"))
+        await self.escrever(registrar_entrada, int(produto_id), quantidade, preco_custo)
+        return 201, {"id": int(produto_id), "quantidade": quantidade}
+
+    async def estoque_em(self, consulta, corpo):
+        data = parametro_data(consulta, "data") or date.today().isoformat()
+        linhas, totais = await self.ler(consultar_estoque_em, data)
+        return 200, {"data": data, "quantidade": totais["quantidade"],
+                     "valor_estoque": para_reais(totais["valor_estoque"]), "produtos": [
+                         {"produto_id": produto_id, "nome": nome, "quantidade": qtd,
+                          "preco_custo": para_reais(custo), "valor": para_reais(valor)}
+                         for produto_id, nome, qtd, custo, valor in linhas]}
+
+    async def reposicao(self, consulta, corpo):
+        limite = parametro_inteiro(consulta, "limite", LIMITE_ALERTAS)
+        linhas = await self.ler(produtos_em_risco, limite)
+        return 200, {"produtos": [
+            {"produto_id": produto_id, "nome": nome, "quantidade": qtd,
+             "venda_dia": round(velocidade, 2),
+             "cobertura_dias": None if cobertura is None else round(cobertura, 1),
+             "ponto_pedido": ponto_pedido, "sugestao": sugestao}
+            for produto_id, nome, qtd, velocidade, cobertura, ponto_pedido, sugestao in linhas]}
+
+    async def registrar_venda(self, consulta, corpo):
+        itens = corpo.get("itens")
+        if not isinstance(itens, list) or not itens or \
+                not all(isinstance(item, dict) for item in itens):
+            raise ErroHttp(400, "Informe os itens da venda.")
+        itens = [validar_item(item.get("produto_id"), item.get("quantidade"), item.get("preco_venda"))
+                 for item in itens]
+
+        linhas = await self.escrever(registrar_itens, itens)
+        return 201, {"itens": len(linhas),
+                     "total": para_reais(sum(qtd * preco for _, qtd, preco in itens)),
+                     "data_venda": linhas[0][5]}
+
+    async def totais(self, consulta, corpo):
+        inicio, fim = parametro_data(consulta, "inicio"), parametro_data(consulta, "fim")
+        if inicio or fim:
+            return 200, totais_json(await self.ler(totalizar_vendas, inicio, fim))
+        return 200, totais_json(await self.ler(ler_resumo))
+
+    async def relatorio(self, consulta, corpo):
+        inicio, fim = parametro_data(consulta, "inicio"), parametro_data(consulta, "fim")
+        limite = parametro_inteiro(consulta, "limite")
+        periodo = consulta.get("periodo")
+        if periodo is None:
+            linhas = await self.ler(resumir_produtos, inicio, fim, limite)
+            return 200, {"produtos": [
+                {"produto_id": produto_id, "nome": nome, "quantidade": qtd, "vendas": vendas,
+                 "total_venda": para_reais(total), "total_custo": para_reais(custo),
+                 "lucro": para_reais(lucro)}
+                for produto_id, nome, qtd, vendas, total, custo, lucro in linhas]}
+
+        if periodo not in PERIODOS:
+            raise ErroHttp(400, "Período deve ser dia, semana ou mes.")
+        linhas = await self.ler(agregar_vendas, periodo, inicio, fim, limite)
+        return 200, {"periodos": [
+            {"periodo": chave, "produto_id": produto_id, "nome": nome, "quantidade": qtd,
+             "vendas": vendas, "total_venda": para_reais(total), "total_custo": para_reais(custo),
+             "lucro": para_reais(lucro)}
+            for chave, produto_id, nome, qtd, vendas, total, custo, lucro in linhas]}
+
+    async def lotes_sincronizacao(self, consulta, corpo):
+        loja = consulta.get("loja")
+        if not loja:
+            raise ErroHttp(400, "Informe a loja.")
+        # Exporta antes as alterações locais, um lote por escrita
+        while True:
+            lote = await self.escrever(exportar_lote)
+            if lote is None or not lote["mais"]:
+                break
+        limite = min(parametro_inteiro(consulta, "limite", LOTES_POR_RESPOSTA), LOTES_POR_RESPOSTA)
+        return 200, await self.ler(situacao_sincronizacao, loja,
+                                   parametro_inteiro(consulta, "desde", 0), limite,
+                                   consulta.get("origem"))
+
+    async def receber_lote(self, consulta, corpo):
+        lote = validar_lote(corpo.get("lote"), "lote recebido")
+        relatorio = await self.escrever(aplicar_lote, lote)
+        return 200, {"loja": lote["loja"], "lote": lote["lote"], "aplicado": relatorio is not None,
+                     "relatorio": relatorio}
+
+    async def metricas(self, consulta, corpo):
+        if self.motor.banco.metricas is None:
+            raise ErroHttp(404, "Métricas desativadas.")
+        return 200, self.motor.banco.metricas.como_dict()
+
+    # HTTP
+
+    def medir(self, rota):
+        """Mede o atendimento da rota, se o motor tiver métricas."""
+        if self.motor.banco.metricas is None:
+            return nullcontext()
+        return self.motor.banco.metricas.medir("http", rota)
+
+    async def despachar(self, metodo, caminho, consulta, corpo):
+        """Encaminha a requisição à rota e converte os erros em respostas."""
+        permitidos = []
+        for metodo_rota, padrao, funcao in self.rotas:
+            encontrado = re.fullmatch(padrao, caminho.rstrip("/") or "/")
+            if not encontrado:
+                continue
+            if metodo_rota != metodo:
+                permitidos.append(metodo_rota)
+                continue
+            try:
+                with self.medir(f"{metodo} {padrao}"):
+                    return await funcao(consulta, corpo, *encontrado.groups())
+            except ErroHttp as e:
+                return e.status, {"erro": str(e)}
+            except ProdutoNaoEncontrado as e:
+                return 404, {"erro": str(e)}
+            except EstoqueInsuficiente as e:
+                return 409, {"erro": "Quantidade em estoque insuficiente!", "faltas": [
+                    {"produto": nome, "pedido": pedido, "disponivel": disponivel}
+                    for nome, pedido, disponivel in e.faltas]}
+            except ErroSincronizacao as e:
+                return 409, {"erro": str(e)}
+            except ValueError as e:  # ProdutoInvalido, ItemInvalido
+                return 400, {"erro": str(e)}
+            except sqlite3.Error as e:
+                return 503, {"erro": f"Erro de conexão com o banco de dados: {e}"}
+
+        if permitidos:
+            return 405, {"erro": "Método não permitido."}
+        return 404, {"erro": "Rota não encontrada."}
+
+    async def atender(self, reader, writer):
+        """Atende uma conexão, com suporte a várias requisições (keep-alive)."""
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, _ = linha.decode("latin-1").split()
+                except ValueError:
+                    await self.responder(writer, 400, {"erro": "Requisição inválida."}, False)
+                    break
+
+                cabecalhos = {}
+                while True:
+                    linha = await reader.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                manter = cabecalhos.get("connection", "").lower() != "close"
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length") or 0)
+                    if tamanho < 0:
+                        raise ValueError
+                except ValueError:
+                    await self.responder(writer, 400, {"erro": "Content-Length inválido."}, False)
+                    break
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self.responder(writer, 413, {"erro": "Corpo da requisição muito grande."}, False)
+                    break
+                bruto = await reader.readexactly(tamanho) if tamanho else b""
+
+                try:
+                    corpo = json.loads(bruto) if bruto else {}
+                    if not isinstance(corpo, dict):
+                        raise ValueError
+                except ValueError:
+                    status, resposta = 400, {"erro": "O corpo deve ser um objeto JSON."}
+                else:
+                    url = urlsplit(alvo)
+                    consulta = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+                    try:
+                        status, resposta = await self.despachar(metodo.upper(), url.path, consulta, corpo)
+                    except Exception as e:
+                        status, resposta = 500, {"erro": str(e)}
+
+                await self.responder(writer, status, resposta, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def responder(self, writer, status, resposta, manter):
+        """Escreve uma resposta JSON."""
+        corpo = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {MENSAGENS_STATUS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + corpo)
+        await writer.drain()
+
+    async def iniciar(self, host="127.0.0.1", porta=PORTA_PADRAO):
+        """Abre o servidor e o escritor; retorna o `asyncio.Server`."""
+        self._escritas = asyncio.Queue()
+        self._tarefa_escritor = asyncio.create_task(self._gravar())
+        return await asyncio.start_server(self.atender, host, porta)
+
+    def encerrar(self):
+        """Para o escritor e libera as threads."""
+        if self._tarefa_escritor is not None:
+            self._tarefa_escritor.cancel()
+        self._leitores.shutdown(wait=False)
+        self._escritor.shutdown(wait=True)
+
+
+async def servir(caminho=CAMINHO_BANCO, host="127.0.0.1", porta=PORTA_PADRAO):
+    """Executa o serviço até ser interrompido."""
+    motor = MotorEstoque(caminho, metricas=Metricas())
+    servico = ServicoEstoque(motor)
+    servidor = await servico.iniciar(host, porta)
+    print(f"Serviço de estoque em http://{host}:{porta}")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servico.encerrar()
+        motor.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON do controle de estoque.")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco de dados")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço de escuta (padrão: só local)")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.banco, args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,815 @@
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+from banco import executar_transacao
+from catalogo import normalizar_nome
+from movimentos import origem_movimento, agora, DATA_MOVIMENTO, TIPO_MOVIMENTO
+from reposicao import registrar_giro
+
+# Sincronização entre lojas, cada uma com o seu estoque.db. Cada loja grava as
+# suas alterações em lotes numerados (JSON compactado com gzip) e aplica os
+# lotes das outras, em ordem. Os lotes trafegam por uma pasta compartilhada
+# (`<pasta>/<loja>/<lote>.json.gz`) ou pelo serviço HTTP local.
+#
+# Pelo serviço HTTP cada loja guarda também os lotes que aplicou das outras
+# e os repassa: ao sincronizar, o cliente recebe do servidor os lotes de
+# todas as lojas que o servidor conhece e envia os que o servidor ainda não
+# tem, próprios ou repassados. Assim lojas que só falam com um servidor
+# central (ou em cadeia) recebem as alterações umas das outras.
+#
+# Regras de conflito:
+# - estoque: cada lote leva a variação de quantidade por produto, tirada do
+#   livro de movimentos, e as variações se somam em qualquer ordem;
+# - vendas: só são acrescentadas, nunca alteradas;
+# - nome e custo: vale a alteração mais recente (data e, no empate, a loja);
+# - exclusão: prevalece sobre qualquer alteração do mesmo produto.
+#
+# Os produtos são identificados entre as lojas por uma chave própria. A
+# sincronização parte do estado de cada banco ao ser ativada: o histórico
+# anterior não é enviado, e os produtos já cadastrados recebem uma chave
+# derivada do nome, para que lojas que partiram da mesma cópia do banco (ou
+# que já usavam os mesmos nomes) reconheçam os mesmos produtos.
+
+FORMATO_LOTE = 1
+
+# Alterações de produtos e vendas por lote; o restante vai nos lotes seguintes
+ITENS_POR_LOTE = 2000
+
+# Lotes guardados no banco para as lojas que sincronizam pelo serviço HTTP
+DIAS_RETENCAO_LOTES = 90
+
+# Lotes devolvidos por resposta do serviço HTTP; o cliente pede os seguintes
+LOTES_POR_RESPOSTA = 20
+TEMPO_LIMITE_SERVIDOR = 60
+
+# Campos de cada entrada do lote e os tipos aceitos em cada campo
+DATA_LOTE = "data"
+ENTRADAS_LOTE = {
+    "produtos": ((str,), (str,), (int,), (DATA_LOTE,)),  # chave, nome, preco_custo, alterado_em
+    "removidos": ((str,), (DATA_LOTE,)),  # chave, removido_em
+    "movimentos": ((str,), (int,)),  # chave, quantidade
+    # chave (None para produto sem chave), nome_produto, quantidade, preco_venda,
+    # preco_custo, data_venda
+    "vendas": ((str, None), (str,), (int,), (int,), (int,), (DATA_LOTE,)),
+}
+
+PADRAO_LOTE = re.compile(r"^(\d{8})\.json\.gz$")
+
+ORIGEM_LOCAL = f"{TIPO_MOVIMENTO} != 'S'"
+
+CRIAR_NO = '''
+    CREATE TABLE IF NOT EXISTS sincronia_no (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        loja TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        lote INTEGER NOT NULL,
+        movimento INTEGER NOT NULL,
+        venda INTEGER NOT NULL,
+        catalogo INTEGER NOT NULL
+    )
+'''
+
+# Chave de cada produto entre as lojas e a versão do seu nome e custo
+CRIAR_PRODUTOS = '''
+    CREATE TABLE IF NOT EXISTS sincronia_produtos (
+        produto_id INTEGER PRIMARY KEY,
+        chave TEXT NOT NULL UNIQUE,
+        seq INTEGER NOT NULL,
+        loja TEXT NOT NULL,
+        alterado_em TEXT NOT NULL
+    )
+'''
+
+# Produtos excluídos: a exclusão vale para sempre, em todas as lojas
+CRIAR_REMOVIDOS = '''
+    CREATE TABLE IF NOT EXISTS sincronia_removidos (
+        chave TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        loja TEXT NOT NULL,
+        removido_em TEXT NOT NULL
+    )
+'''
+
+CRIAR_RECEBIDOS = '''
+    CREATE TABLE IF NOT EXISTS sincronia_recebidos (
+        loja TEXT PRIMARY KEY,
+        lote INTEGER NOT NULL
+    )
+'''
+
+# Vendas vindas de outras lojas ainda além da posição exportada
+CRIAR_VENDAS_RECEBIDAS = "CREATE TABLE IF NOT EXISTS sincronia_vendas (venda_id INTEGER PRIMARY KEY)"
+
+# Lotes gravados por esta loja, compactados, de onde saem os arquivos e as respostas HTTP
+CRIAR_SAIDA = '''
+    CREATE TABLE IF NOT EXISTS sincronia_saida (
+        lote INTEGER PRIMARY KEY,
+        criado_em TEXT NOT NULL,
+        dados BLOB NOT NULL
+    )
+'''
+
+# Lotes de outras lojas já aplicados aqui, guardados para repassar pelo serviço HTTP
+CRIAR_REPASSE = '''
+    CREATE TABLE IF NOT EXISTS sincronia_repasse (
+        loja TEXT NOT NULL,
+        lote INTEGER NOT NULL,
+        recebido_em TEXT NOT NULL,
+        dados BLOB NOT NULL,
+        PRIMARY KEY (loja, lote)
+    )
+'''
+
+LOJA_ATUAL = "(SELECT loja FROM sincronia_no WHERE id = 1)"
+SEQ_ATUAL = "(SELECT seq FROM sincronia_no WHERE id = 1)"
+PROXIMA_SEQ = "UPDATE sincronia_no SET seq = seq + 1 WHERE id = 1;"
+
+# Só as alterações feitas na própria loja entram nos lotes; as aplicadas
+# pela sincronização rodam com a origem 'S'
+GATILHOS_SINCRONIA = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_sincronia_i AFTER INSERT ON produtos
+    WHEN {ORIGEM_LOCAL}
+    BEGIN
+        {PROXIMA_SEQ}
+        INSERT INTO sincronia_produtos (produto_id, chave, seq, loja, alterado_em)
+        VALUES (NEW.id, lower(hex(randomblob(16))), {SEQ_ATUAL}, {LOJA_ATUAL}, {DATA_MOVIMENTO});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_sincronia_u AFTER UPDATE OF nome, preco_custo ON produtos
+    WHEN {ORIGEM_LOCAL} AND (NEW.nome != OLD.nome OR NEW.preco_custo != OLD.preco_custo)
+    BEGIN
+        {PROXIMA_SEQ}
+        UPDATE sincronia_produtos
+        SET seq = {SEQ_ATUAL}, loja = {LOJA_ATUAL}, alterado_em = {DATA_MOVIMENTO}
+        WHERE produto_id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_sincronia_d AFTER DELETE ON produtos
+    BEGIN
+        INSERT OR REPLACE INTO sincronia_removidos (chave, seq, loja, removido_em)
+        SELECT chave, {SEQ_ATUAL} + 1, {LOJA_ATUAL}, {DATA_MOVIMENTO}
+        FROM sincronia_produtos WHERE produto_id = OLD.id AND {ORIGEM_LOCAL};
+        UPDATE sincronia_no SET seq = seq + 1 WHERE id = 1 AND {ORIGEM_LOCAL};
+        DELETE FROM sincronia_produtos WHERE produto_id = OLD.id;
+    END
+    ''',
+)
+
+
+class ErroSincronizacao(Exception):
+    """Lote ilegível ou pasta de sincronização em estado inconsistente."""
+
+
+def chave_por_nome(nome):
+    """Chave de um produto cadastrado antes da sincronização: o nome normalizado."""
+    return "nome:" + normalizar_nome(nome)
+
+
+def criar_sincronizacao(conn, loja=None):
+    """Cria as tabelas e gatilhos da sincronização e a identidade da loja.
+
+    As posições de exportação partem do estado atual: só as alterações
+    feitas daqui em diante vão para os lotes.
+    """
+    for criar in (CRIAR_NO, CRIAR_PRODUTOS, CRIAR_REMOVIDOS, CRIAR_RECEBIDOS,
+                  CRIAR_VENDAS_RECEBIDAS, CRIAR_SAIDA):
+        conn.execute(criar)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sincronia_produtos_seq "
+                 "ON sincronia_produtos (seq)")
+    for gatilho in GATILHOS_SINCRONIA:
+        conn.execute(gatilho)
+
+    loja = loja or os.urandom(8).hex()
+    conn.execute('''
+        INSERT OR IGNORE INTO sincronia_no (id, loja, seq, lote, movimento, venda, catalogo)
+        VALUES (1, ?, 0, 0, (SELECT COALESCE(MAX(id), 0) FROM movimentos),
+                (SELECT COALESCE(MAX(id), 0) FROM vendas), 0)
+    ''', (loja,))
+
+    chaves = set()
+    linhas = []
+    for produto_id, nome in conn.execute("SELECT id, nome FROM produtos ORDER BY id"):
+        chave = chave_por_nome(nome)
+        if chave in chaves:
+            chave += f":{produto_id}"  # Nomes repetidos se distinguem pelo id
+        chaves.add(chave)
+        linhas.append((produto_id, chave, loja))
+    conn.executemany(
+        "INSERT OR IGNORE INTO sincronia_produtos (produto_id, chave, seq, loja, alterado_em) "
+        "VALUES (?, ?, 0, ?, '')", linhas)
+
+
+def criar_repasse(conn):
+    """Cria a tabela dos lotes de outras lojas guardados para repasse."""
+    conn.execute(CRIAR_REPASSE)
+
+
+def identidade_loja(conn):
+    """Identificador desta loja nos lotes."""
+    return conn.execute("SELECT loja FROM sincronia_no WHERE id = 1").fetchone()[0]
+
+
+def alteracoes_pendentes(conn):
+    """Indica se há alterações locais que ainda não foram para nenhum lote."""
+    return conn.execute('''
+        SELECT EXISTS (SELECT 1 FROM movimentos WHERE id > n.movimento AND tipo != 'S'
+                       AND produto_id IN (SELECT produto_id FROM sincronia_produtos))
+            OR EXISTS (SELECT 1 FROM vendas WHERE id > n.venda
+                       AND id NOT IN (SELECT venda_id FROM sincronia_vendas))
+            OR n.seq > n.catalogo
+        FROM sincronia_no AS n WHERE n.id = 1
+    ''').fetchone()[0] == 1
+
+
+def redefinir_loja(conn):
+    """Dá a este banco uma identidade nova, para uso depois de copiá-lo para outra loja.
+
+    As posições de exportação passam a ser o estado atual. Os lotes que a
+    identidade antiga já tinha gravado contam como recebidos, pois a cópia
+    já contém o que eles trazem; os seguintes serão aplicados normalmente.
+    Não faz commit. Retorna a nova identidade.
+
+    A cópia precisa ter sido feita logo depois de sincronizar a loja de
+    origem: alterações ainda não exportadas iriam para as duas lojas.
+    """
+    if alteracoes_pendentes(conn):
+        raise ErroSincronizacao(
+            "O banco tem alterações ainda não exportadas. Sincronize a loja de origem "
+            "e copie o banco de novo antes de gerar uma identidade nova.")
+    loja = os.urandom(8).hex()
+    conn.execute('''
+        INSERT OR REPLACE INTO sincronia_recebidos (loja, lote)
+        SELECT loja, lote FROM sincronia_no WHERE id = 1
+    ''')
+    # Os lotes da identidade antiga passam a ser repassados como os de outra loja
+    conn.execute('''
+        INSERT OR IGNORE INTO sincronia_repasse (loja, lote, recebido_em, dados)
+        SELECT (SELECT loja FROM sincronia_no WHERE id = 1), lote, criado_em, dados
+        FROM sincronia_saida
+    ''')
+    conn.execute('''
+        UPDATE sincronia_no SET loja = ?, lote = 0,
+            movimento = (SELECT COALESCE(MAX(id), 0) FROM movimentos),
+            venda = (SELECT COALESCE(MAX(id), 0) FROM vendas),
+            catalogo = seq
+        WHERE id = 1
+    ''', (loja,))
+    conn.execute("DELETE FROM sincronia_vendas")
+    conn.execute("DELETE FROM sincronia_saida")
+    return loja
+
+
+def caminho_lote(pasta, loja, numero):
+    """Arquivo do lote `numero` da loja dentro da pasta de sincronização."""
+    return os.path.join(pasta, loja, f"{numero:08d}.json.gz")
+
+
+def compactar_lote(lote):
+    """Lote em JSON compactado; sem data no cabeçalho, o mesmo lote dá sempre os mesmos bytes."""
+    return gzip.compress(json.dumps(lote, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                         mtime=0)
+
+
+def descompactar_lote(dados, descricao="lote"):
+    """Lê um lote compactado por `compactar_lote`."""
+    try:
+        lote = json.loads(gzip.decompress(dados).decode("utf-8"))
+    except (OSError, EOFError, ValueError) as e:
+        raise ErroSincronizacao(f"Lote ilegível: {descricao} ({e})") from None
+    return validar_lote(lote, descricao)
+
+
+def valor_valido(valor, tipo):
+    """Confere um campo de uma entrada do lote contra o tipo esperado em ENTRADAS_LOTE."""
+    if tipo is None:
+        return valor is None
+    if tipo is DATA_LOTE:
+        try:
+            datetime.fromisoformat(valor)
+        except (TypeError, ValueError):
+            return False
+        return True
+    # bool é subclasse de int, mas nunca é uma quantidade nem um preço
+    return isinstance(valor, tipo) and not isinstance(valor, bool)
+
+
+def validar_lote(lote, descricao="lote"):
+    """Confere o formato de um lote lido de arquivo ou recebido pela rede.
+
+    Além das chaves do lote, confere o número de campos e o tipo de cada
+    entrada, para que um lote malformado seja recusado antes de tocar o banco.
+    """
+    if not isinstance(lote, dict) or lote.get("formato") != FORMATO_LOTE:
+        raise ErroSincronizacao(f"Formato de lote não suportado: {descricao}")
+    if not isinstance(lote.get("loja"), str) or not valor_valido(lote.get("lote"), int) or \
+            not all(isinstance(lote.get(chave), list) for chave in ENTRADAS_LOTE):
+        raise ErroSincronizacao(f"Lote incompleto: {descricao}")
+    for chave, campos in ENTRADAS_LOTE.items():
+        for posicao, entrada in enumerate(lote[chave]):
+            if not isinstance(entrada, list) or len(entrada) != len(campos) or not all(
+                    any(valor_valido(valor, tipo) for tipo in tipos)
+                    for valor, tipos in zip(entrada, campos)):
+                raise ErroSincronizacao(
+                    f"Entrada inválida em {chave}[{posicao}] do lote {lote['lote']} da loja "
+                    f"{lote['loja']} ({descricao}): {entrada!r}")
+    return lote
+
+
+def ler_lote(caminho):
+    """Lê um arquivo de lote."""
+    try:
+        with open(caminho, "rb") as arquivo:
+            dados = arquivo.read()
+    except OSError as e:
+        raise ErroSincronizacao(f"Lote ilegível: {caminho} ({e})") from None
+    return descompactar_lote(dados, caminho)
+
+
+def gravar_lote(caminho, dados):
+    """Grava o lote num arquivo temporário e o renomeia, para nunca expor um lote pela metade."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, caminho)
+
+
+def lotes_na_pasta(pasta, loja, desde=0):
+    """Números e caminhos dos lotes da loja posteriores a `desde`, em ordem.
+
+    Pode haver lacunas, por exemplo enquanto a pasta ainda está sendo copiada.
+    """
+    try:
+        nomes = os.listdir(os.path.join(pasta, loja))
+    except FileNotFoundError:
+        return []
+    lotes = []
+    for nome in nomes:
+        encontrado = PADRAO_LOTE.match(nome)
+        if encontrado and int(encontrado.group(1)) > desde:
+            lotes.append((int(encontrado.group(1)), os.path.join(pasta, loja, nome)))
+    return sorted(lotes)
+
+
+def montar_lote(conn):
+    """Lote com as alterações locais ainda não exportadas, ou None se não houver.
+
+    Precisa rodar dentro da transação que guarda o lote e avança as
+    posições; o lote leva em "ate" as posições alcançadas. O catálogo vai
+    antes: enquanto houver mais alterações de produtos do que cabem num
+    lote, movimentos e vendas esperam, para que nunca cheguem antes do
+    produto a que se referem. Em "mais" o lote avisa que não levou tudo.
+    """
+    loja, seq, lote, movimento, venda, catalogo = conn.execute(
+        "SELECT loja, seq, lote, movimento, venda, catalogo FROM sincronia_no WHERE id = 1"
+    ).fetchone()
+
+    produtos = conn.execute('''
+        SELECT s.seq, s.chave, p.nome, p.preco_custo, s.alterado_em
+        FROM sincronia_produtos AS s JOIN produtos AS p ON p.id = s.produto_id
+        WHERE s.seq > ? AND s.loja = ?
+        ORDER BY s.seq
+        LIMIT ?
+    ''', (catalogo, loja, ITENS_POR_LOTE)).fetchall()
+    removidos = conn.execute('''
+        SELECT seq, chave, removido_em FROM sincronia_removidos
+        WHERE seq > ? AND loja = ?
+        ORDER BY seq
+        LIMIT ?
+    ''', (catalogo, loja, ITENS_POR_LOTE)).fetchall()
+    alteracoes = sorted(produtos + removidos)[:ITENS_POR_LOTE]
+    produtos = [linha[1:] for linha in alteracoes if len(linha) == 5]
+    removidos = [linha[1:] for linha in alteracoes if len(linha) == 3]
+
+    movimentos, vendas = [], []
+    ate = {"movimento": movimento, "venda": venda, "catalogo": seq}
+    mais = len(alteracoes) == ITENS_POR_LOTE
+    if mais:
+        ate["catalogo"] = alteracoes[-1][0]
+    else:
+        # A variação somada de cada produto; os movimentos de produtos já
+        # excluídos ficam de fora, a exclusão vai em "removidos"
+        ate["movimento"] = conn.execute(
+            "SELECT COALESCE(MAX(id), ?) FROM movimentos", (movimento,)).fetchone()[0]
+        movimentos = conn.execute('''
+            SELECT s.chave, SUM(m.quantidade)
+            FROM movimentos AS m JOIN sincronia_produtos AS s ON s.produto_id = m.produto_id
+            WHERE m.id > ? AND m.id <= ? AND m.tipo != 'S'
+            GROUP BY s.chave
+            HAVING SUM(m.quantidade) != 0
+        ''', (movimento, ate["movimento"])).fetchall()
+
+        vendas = conn.execute('''
+            SELECT v.id, s.chave, v.nome_produto, v.quantidade, v.preco_venda, v.preco_custo,
+                   v.data_venda
+            FROM vendas AS v LEFT JOIN sincronia_produtos AS s ON s.produto_id = v.produto_id
+            WHERE v.id > ? AND v.id NOT IN (SELECT venda_id FROM sincronia_vendas)
+            ORDER BY v.id
+            LIMIT ?
+        ''', (venda, ITENS_POR_LOTE)).fetchall()
+        mais = len(vendas) == ITENS_POR_LOTE
+        if mais:
+            ate["venda"] = vendas[-1][0]
+        else:
+            ate["venda"] = conn.execute(
+                "SELECT MAX(COALESCE(MAX(id), 0), ?) FROM vendas", (venda,)).fetchone()[0]
+
+    if not (produtos or removidos or movimentos or vendas):
+        avancar_posicoes(conn, lote, ate)
+        return None
+    return {
+        "formato": FORMATO_LOTE, "loja": loja, "lote": lote + 1, "criado_em": agora(),
+        "ate": ate, "mais": mais, "produtos": produtos, "removidos": removidos,
+        "movimentos": movimentos, "vendas": [linha[1:] for linha in vendas],
+    }
+
+
+def avancar_posicoes(conn, lote, ate):
+    """Registra o último lote exportado e as posições que ele alcançou."""
+    conn.execute(
+        "UPDATE sincronia_no SET lote = ?, movimento = ?, venda = ?, catalogo = ? WHERE id = 1",
+        (lote, ate["movimento"], ate["venda"], ate["catalogo"]))
+    conn.execute("DELETE FROM sincronia_vendas WHERE venda_id <= ?", (ate["venda"],))
+
+
+def exportar_lote(conn):
+    """Monta e guarda em sincronia_saida o próximo lote, avançando as posições.
+
+    Não faz commit. Retorna o lote, ou None se não havia alterações.
+    """
+    lote = montar_lote(conn)
+    if lote is None:
+        return None
+    conn.execute("INSERT INTO sincronia_saida (lote, criado_em, dados) VALUES (?, ?, ?)",
+                 (lote["lote"], lote["criado_em"], compactar_lote(lote)))
+    avancar_posicoes(conn, lote["lote"], lote["ate"])
+    return lote
+
+
+def exportar_lotes(conn):
+    """Guarda os lotes com as alterações locais ainda não exportadas.
+
+    Cada lote vai em sua própria transação. Retorna os números dos lotes novos.
+    """
+    numeros = []
+    while True:
+        lote = executar_transacao(conn, exportar_lote)
+        if lote is None:
+            return numeros
+        numeros.append(lote["lote"])
+        if not lote["mais"]:
+            return numeros
+
+
+def lotes_guardados(conn, desde=0):
+    """Lotes desta loja posteriores a `desde`, como `(numero, dados compactados)`."""
+    return conn.execute("SELECT lote, dados FROM sincronia_saida WHERE lote > ? ORDER BY lote",
+                        (desde,)).fetchall()
+
+
+def lotes_da_loja(conn, origem, desde=0, limite=-1):
+    """Lotes de `origem` posteriores a `desde`, próprios ou guardados para repasse.
+
+    Retorna `(numero, dados compactados)` em ordem.
+    """
+    if origem == identidade_loja(conn):
+        return conn.execute(
+            "SELECT lote, dados FROM sincronia_saida WHERE lote > ? ORDER BY lote LIMIT ?",
+            (desde, limite)).fetchall()
+    return conn.execute(
+        "SELECT lote, dados FROM sincronia_repasse WHERE loja = ? AND lote > ? ORDER BY lote LIMIT ?",
+        (origem, desde, limite)).fetchall()
+
+
+def podar_lotes(conn, dias=DIAS_RETENCAO_LOTES):
+    """Descarta os lotes guardados há mais de `dias`, mantendo sempre o último. Não faz commit."""
+    conn.execute('''
+        DELETE FROM sincronia_saida
+        WHERE criado_em < datetime('now', 'localtime', ?)
+          AND lote < (SELECT MAX(lote) FROM sincronia_saida)
+    ''', (f"-{dias} days",))
+    conn.execute('''
+        DELETE FROM sincronia_repasse
+        WHERE recebido_em < datetime('now', 'localtime', ?)
+    ''', (f"-{dias} days",))
+
+
+def publicar_lotes(conn, pasta):
+    """Copia para `<pasta>/<loja>` os lotes guardados que ainda não estão lá.
+
+    Um arquivo desta identidade que este banco não gravou indica outra
+    cópia do banco sincronizando como se fosse esta loja. Retorna os
+    números dos lotes copiados.
+    """
+    loja = identidade_loja(conn)
+    presentes = dict(lotes_na_pasta(pasta, loja))
+    guardados = lotes_guardados(conn)
+    ultimo = guardados[-1][0] if guardados else 0
+    estranhos = [numero for numero in presentes if numero > ultimo]
+    comum = max((numero for numero, _ in guardados if numero in presentes), default=None)
+    if comum is not None:
+        with open(presentes[comum], "rb") as arquivo:
+            if arquivo.read() != dict(guardados)[comum]:
+                estranhos.append(comum)
+    if estranhos:
+        raise ErroSincronizacao(
+            f"Outra loja está usando a identidade {loja}. Se este banco foi copiado de "
+            "outra loja, gere uma identidade nova para ele antes de sincronizar.")
+
+    copiados = []
+    for numero, dados in guardados:
+        if numero not in presentes:
+            gravar_lote(caminho_lote(pasta, loja, numero), dados)
+            copiados.append(numero)
+    return copiados
+
+
+def ultimo_recebido(conn, loja):
+    """Número do último lote da loja já aplicado neste banco (0 se nenhum)."""
+    linha = conn.execute("SELECT lote FROM sincronia_recebidos WHERE loja = ?", (loja,)).fetchone()
+    return linha[0] if linha else 0
+
+
+def recebidos(conn):
+    """Último lote aplicado de cada loja, `{loja: lote}`."""
+    return dict(conn.execute("SELECT loja, lote FROM sincronia_recebidos"))
+
+
+def disponiveis(conn):
+    """Último lote conhecido de cada loja, inclusive desta, `{loja: lote}`."""
+    ultimos = recebidos(conn)
+    ultimos[identidade_loja(conn)] = conn.execute(
+        "SELECT lote FROM sincronia_no WHERE id = 1").fetchone()[0]
+    return ultimos
+
+
+def novo_relatorio():
+    """Contagens de uma sincronização, somadas lote a lote."""
+    return {"lotes": 0, "produtos": 0, "removidos": 0, "movimentos": 0, "vendas": 0,
+            "ignorados": 0, "descartados": 0, "negativos": []}
+
+
+def descrever_relatorio(relatorio):
+    """Texto do relatório de uma sincronização, para mostrar ao usuário."""
+    linhas = [f"Lotes enviados: {relatorio.get('enviados', 0)}",
+              f"Lotes recebidos: {relatorio['lotes']}"]
+    if relatorio["lotes"]:
+        linhas += [f"Produtos cadastrados ou alterados: {relatorio['produtos']}",
+                   f"Produtos excluídos: {relatorio['removidos']}",
+                   f"Ajustes de estoque: {relatorio['movimentos']}",
+                   f"Vendas recebidas: {relatorio['vendas']}"]
+    if relatorio["ignorados"]:
+        linhas.append(f"Alterações vencidas por versões mais recentes: {relatorio['ignorados']}")
+    if relatorio["descartados"]:
+        linhas.append(f"Ajustes de produtos excluídos, descartados: {relatorio['descartados']}")
+    if relatorio["negativos"]:
+        linhas.append("Produtos com estoque negativo (IDs): "
+                      + ", ".join(map(str, relatorio["negativos"])))
+    return "\n".join(linhas)
+
+
+def somar_relatorio(total, parcial):
+    """Acumula em `total` o relatório de um lote."""
+    for chave, valor in parcial.items():
+        if chave == "negativos":
+            total[chave] = sorted(set(total[chave]) | set(valor))
+        else:
+            total[chave] += valor
+
+
+def aplicar_lote(conn, lote):
+    """Aplica o lote de outra loja e o guarda para repasse. Não faz commit.
+
+    Lotes já aplicados e os desta própria loja são ignorados (retorna None)
+    e um lote fora de sequência levanta `ErroSincronizacao`. Retorna as contagens: produtos
+    e exclusões aplicados, movimentos e vendas gravados, alterações que
+    perderam para uma versão local mais recente ("ignorados") e itens de
+    produtos excluídos ("descartados"), além dos produtos que ficaram com
+    estoque negativo.
+    """
+    origem, numero = lote["loja"], lote["lote"]
+    anterior = ultimo_recebido(conn, origem)
+    if numero <= anterior or origem == identidade_loja(conn):
+        return None
+    if numero != anterior + 1:
+        raise ErroSincronizacao(
+            f"Lote {numero} da loja {origem} fora de ordem: o último aplicado é o {anterior}.")
+
+    relatorio = novo_relatorio()
+    relatorio["lotes"] = 1
+    removidos = {chave for (chave,) in conn.execute("SELECT chave FROM sincronia_removidos")}
+
+    def produto_por_chave(chave):
+        linha = conn.execute("SELECT produto_id FROM sincronia_produtos WHERE chave = ?",
+                             (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    with origem_movimento(conn, "S"):
+        for chave, nome, preco_custo, alterado_em in lote["produtos"]:
+            if chave in removidos:
+                relatorio["ignorados"] += 1
+                continue
+            local = conn.execute(
+                "SELECT produto_id, alterado_em, loja FROM sincronia_produtos WHERE chave = ?",
+                (chave,)).fetchone()
+            if local is None:
+                produto_id = conn.execute(
+                    "INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, 0, ?)",
+                    (nome, preco_custo)).lastrowid
+                conn.execute(
+                    "INSERT INTO sincronia_produtos (produto_id, chave, seq, loja, alterado_em) "
+                    "VALUES (?, ?, 0, ?, ?)", (produto_id, chave, origem, alterado_em))
+            elif origem == local[2] or (alterado_em, origem) > (local[1], local[2]):
+                # Os lotes de uma mesma loja chegam em ordem: o mais recente sempre vence
+                conn.execute("UPDATE produtos SET nome = ?, preco_custo = ? WHERE id = ?",
+                             (nome, preco_custo, local[0]))
+                conn.execute("UPDATE sincronia_produtos SET loja = ?, alterado_em = ? "
+                             "WHERE produto_id = ?", (origem, alterado_em, local[0]))
+            else:
+                relatorio["ignorados"] += 1
+                continue
+            relatorio["produtos"] += 1
+
+        for chave, removido_em in lote["removidos"]:
+            conn.execute(
+                "INSERT OR IGNORE INTO sincronia_removidos (chave, seq, loja, removido_em) "
+                "VALUES (?, 0, ?, ?)", (chave, origem, removido_em))
+            produto_id = produto_por_chave(chave)
+            if produto_id is not None:
+                conn.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
+                relatorio["removidos"] += 1
+
+        alterados = []
+        for chave, quantidade in lote["movimentos"]:
+            produto_id = produto_por_chave(chave)
+            if produto_id is None:
+                relatorio["descartados"] += 1
+                continue
+            conn.execute("UPDATE produtos SET quantidade = quantidade + ? WHERE id = ?",
+                         (quantidade, produto_id))
+            alterados.append(produto_id)
+            relatorio["movimentos"] += 1
+
+    # O estoque já chega pelos movimentos: as vendas só são acrescentadas
+    ultima_venda = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+    for chave, nome_produto, quantidade, preco_venda, preco_custo, data_venda in lote["vendas"]:
+        # Venda de produto excluído ou desconhecido fica sem produto (id 0)
+        produto_id = produto_por_chave(chave) if chave else None
+        conn.execute(
+            '''INSERT INTO vendas
+            (produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+            VALUES (?, ?, ?, ?, ?, ?)''',
+            (produto_id or 0, nome_produto, quantidade, preco_venda, preco_custo, data_venda))
+        if produto_id is not None:
+            registrar_giro(conn, {produto_id: quantidade}, data_venda)
+        relatorio["vendas"] += 1
+    conn.execute("INSERT INTO sincronia_vendas (venda_id) SELECT id FROM vendas WHERE id > ?",
+                 (ultima_venda,))
+
+    if alterados:
+        relatorio["negativos"] = sorted({produto_id for (produto_id,) in conn.execute(
+            f"SELECT id FROM produtos WHERE quantidade < 0 AND id IN "
+            f"({', '.join('?' * len(alterados))})", alterados)})
+    conn.execute(
+        "INSERT INTO sincronia_recebidos (loja, lote) VALUES (?, ?) "
+        "ON CONFLICT (loja) DO UPDATE SET lote = excluded.lote", (origem, numero))
+    conn.execute("INSERT OR IGNORE INTO sincronia_repasse (loja, lote, recebido_em, dados) "
+                 "VALUES (?, ?, ?, ?)", (origem, numero, agora(), compactar_lote(lote)))
+    return relatorio
+
+
+def aplicar_lotes(conn, lotes, relatorio=None, tarefa=None):
+    """Aplica os lotes, em ordem, cada um em sua própria transação.
+
+    `lotes` pode conter lotes já aplicados, que são ignorados. Retorna o
+    relatório somado.
+    """
+    relatorio = relatorio if relatorio is not None else novo_relatorio()
+    for lote in lotes:
+        parcial = executar_transacao(conn, lambda conn: aplicar_lote(conn, lote))
+        if parcial is not None:
+            somar_relatorio(relatorio, parcial)
+        if tarefa is not None:
+            tarefa.informar_progresso(relatorio["lotes"])
+    return relatorio
+
+
+def lotes_em_sequencia(pasta, loja, desde):
+    """Lê, um a um, os lotes seguintes a `desde`, parando na primeira lacuna."""
+    for numero, caminho in lotes_na_pasta(pasta, loja, desde):
+        if numero != desde + 1:
+            return
+        yield ler_lote(caminho)
+        desde = numero
+
+
+def sincronizar_pasta(conn, pasta, tarefa=None):
+    """Troca lotes com as outras lojas através de uma pasta compartilhada.
+
+    Grava os lotes desta loja em `<pasta>/<loja>` e aplica, em ordem, os
+    lotes das demais lojas ainda não aplicados. A identidade é conferida
+    antes de exportar, para que as alterações de uma cópia do banco não
+    fiquem presas num lote que ninguém vai ler. Retorna o relatório somado,
+    com o número de lotes gravados em "enviados".
+    """
+    loja = identidade_loja(conn)
+    enviados = publicar_lotes(conn, pasta)
+    exportar_lotes(conn)
+    enviados += publicar_lotes(conn, pasta)
+
+    relatorio = novo_relatorio()
+    for origem in sorted(os.listdir(pasta)):
+        if origem == loja or not os.path.isdir(os.path.join(pasta, origem)):
+            continue
+        aplicar_lotes(conn, lotes_em_sequencia(pasta, origem, ultimo_recebido(conn, origem)),
+                      relatorio, tarefa)
+    relatorio["enviados"] = len(enviados)
+    return relatorio
+
+
+def situacao_sincronizacao(conn, loja, desde, limite=LOTES_POR_RESPOSTA, origem=None):
+    """Identidade desta loja, último lote conhecido de cada loja e os lotes de `origem`.
+
+    Resposta do serviço HTTP à loja `loja`: traz os lotes de `origem` (por
+    padrão, desta loja) seguintes a `desde`, já descompactados.
+    """
+    origem = origem or identidade_loja(conn)
+    guardados = lotes_da_loja(conn, origem, desde, limite)
+    if guardados and guardados[0][0] != desde + 1:
+        raise ErroSincronizacao(
+            f"O lote {desde + 1} da loja {origem} já foi descartado deste servidor; recrie "
+            "o banco da outra loja a partir de uma cópia deste.")
+    return {"loja": identidade_loja(conn), "recebidos": disponiveis(conn),
+            "lotes": [descompactar_lote(dados) for _, dados in guardados]}
+
+
+def requisitar(url, metodo="GET", corpo=None):
+    """Faz uma requisição JSON ao serviço de outra loja."""
+    from urllib.error import HTTPError, URLError
+    from urllib.request import Request, urlopen
+
+    dados = None if corpo is None else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+    requisicao = Request(url, data=dados, method=metodo,
+                         headers={"Content-Type": "application/json"})
+    try:
+        with urlopen(requisicao, timeout=TEMPO_LIMITE_SERVIDOR) as resposta:
+            return json.loads(resposta.read())
+    except HTTPError as e:
+        try:
+            mensagem = json.loads(e.read())["erro"]
+        except (ValueError, KeyError, TypeError):
+            mensagem = str(e)
+        raise ErroSincronizacao(f"O servidor recusou a sincronização: {mensagem}") from None
+    except (URLError, OSError) as e:
+        raise ErroSincronizacao(f"Servidor de sincronização indisponível: {e}") from None
+
+
+def sincronizar_servidor(conn, url, tarefa=None):
+    """Troca lotes com outra loja pelo serviço HTTP dela (`servico.py`).
+
+    Aplica os lotes, do servidor e das lojas que ele repassa, ainda não
+    aplicados aqui e envia, um por requisição, os lotes desta loja e os
+    repassados que o servidor ainda não tem. Lotes repassados que já
+    saíram deste banco ficam para outra loja entregar. Retorna o relatório
+    somado, com o número de lotes enviados em "enviados".
+    """
+    url = url.rstrip("/") + "/sincronizacao"
+    loja = identidade_loja(conn)
+    exportar_lotes(conn)
+
+    relatorio = novo_relatorio()
+    situacao = requisitar(f"{url}?loja={loja}&limite=0")
+    servidor = situacao["loja"]
+    if servidor == loja:
+        raise ErroSincronizacao(
+            f"O servidor usa a mesma identidade desta loja ({loja}). Se um dos bancos foi "
+            "copiado do outro, gere uma identidade nova para a cópia antes de sincronizar.")
+    do_servidor = situacao["recebidos"]
+    for origem, ultimo in sorted(do_servidor.items()):
+        while origem != loja and ultimo_recebido(conn, origem) < ultimo:
+            resposta = requisitar(
+                f"{url}?loja={loja}&origem={origem}&desde={ultimo_recebido(conn, origem)}")
+            lotes = [validar_lote(lote, f"lote da loja {origem} vindo de {servidor}")
+                     for lote in resposta["lotes"]]
+            if not lotes:
+                break
+            aplicar_lotes(conn, lotes, relatorio, tarefa)
+
+    enviados = 0
+    for origem in sorted(disponiveis(conn)):
+        if origem == servidor:
+            continue
+        desde = do_servidor.get(origem, 0)
+        guardados = lotes_da_loja(conn, origem, desde)
+        if not guardados or guardados[0][0] != desde + 1:
+            continue
+        for _, dados in guardados:
+            requisitar(url, "POST", {"lote": descompactar_lote(dados)})
+            enviados += 1
+    relatorio["enviados"] = enviados
+    return relatorio
@@ -0,0 +1,286 @@
+from contextlib import nullcontext
+from metricas import Medicao
+
+
+def buscar_pagina(conn, consulta, colunas_chave, apos=None, antes=None, limite=100,
+                  descendente=False, onde=None, parametros=()):
+    """Executa uma consulta paginada por chave (keyset) e devolve as linhas na ordem de exibição.
+
+    `apos` traz as linhas seguintes à chave informada e `antes` as anteriores;
+    sem nenhuma das duas, traz a primeira página.
+    """
+    condicoes = [onde] if onde else []
+    parametros = list(parametros)
+    tupla = f"({', '.join(colunas_chave)})"
+    marcadores = f"({', '.join('?' * len(colunas_chave))})"
+
+    # Buscar para trás equivale a inverter a ordenação e depois reverter o resultado
+    invertida = antes is not None
+    crescente = descendente == invertida
+    chave = antes if invertida else apos
+    if chave is not None:
+        condicoes.append(f"{tupla} {'>' if crescente else '<'} {marcadores}")
+        parametros.extend(chave)
+
+    direcao = "ASC" if crescente else "DESC"
+    sql = consulta
+    if condicoes:
+        sql += " WHERE " + " AND ".join(f"({c})" for c in condicoes)
+    sql += " ORDER BY " + ", ".join(f"{col} {direcao}" for col in colunas_chave)
+    sql += " LIMIT ?"
+    parametros.append(limite)
+
+    linhas = conn.execute(sql, parametros).fetchall()
+    if invertida:
+        linhas.reverse()
+    return linhas
+
+
+def buscar_por_ids(conn, consulta, ids, coluna_id="id", onde=None, parametros=(), lote=500):
+    """Busca as linhas com os ids informados, em lotes para respeitar o limite de parâmetros."""
+    ids = list(ids)
+    linhas = []
+    for inicio in range(0, len(ids), lote):
+        trecho = ids[inicio:inicio + lote]
+        sql = f"{consulta} WHERE {coluna_id} IN ({', '.join('?' * len(trecho))})"
+        if onde:
+            sql += f" AND ({onde})"
+        linhas.extend(conn.execute(sql, [*trecho, *parametros]).fetchall())
+    return linhas
+
+
+class TabelaVirtual:
+    """Mantém no Treeview apenas uma janela de linhas ao redor da área visível.
+
+    As páginas são buscadas sob demanda conforme o usuário rola a tabela e as
+    páginas que ficam longe da área visível são descartadas, de modo que a
+    memória e o custo de redesenho não dependem do tamanho da tabela.
+
+    `buscar(apos, antes, limite)` deve devolver uma lista de tuplas
+    `(iid, chave, valores)` na ordem de exibição e `buscar_linhas(ids)` as
+    tuplas das linhas com os ids informados que ainda existem. Com um
+    `executor`, as buscas rodam fora da thread da interface. Com
+    `metricas`, cada atualização do Treeview é medida sob o `nome` da tabela.
+    """
+
+    def __init__(self, tree, scrollbar, buscar, buscar_linhas=None, descendente=False,
+                 tamanho_pagina=100, max_paginas=3, executor=None, metricas=None, nome="tabela"):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.buscar = buscar
+        self.buscar_linhas = buscar_linhas
+        self.descendente = descendente
+        self.tamanho_pagina = tamanho_pagina
+        self.max_linhas = tamanho_pagina * max_paginas
+        self.margem = tamanho_pagina // 2
+        self.executor = executor
+        self.metricas = metricas
+        self.nome = nome
+        self.chaves = {}
+        self.inicio_atingido = True
+        self.fim_atingido = True
+        self._carregando = False
+        self._geracao = 0
+        self._pendentes = set()
+
+        self.tree.configure(yscrollcommand=self._ao_rolar)
+
+    def _medir(self, etapa):
+        """Mede uma atualização do Treeview, se houver métricas."""
+        if self.metricas is None:
+            return nullcontext(Medicao())
+        return self.metricas.medir("renderizacao", f"{self.nome}: {etapa}")
+
+    def _executar(self, funcao, ao_concluir, etapa):
+        """Executa a busca, no executor quando houver, descartando respostas de janelas antigas."""
+        if self.executor is None:
+            ao_concluir(funcao())
+            return
+
+        geracao = self._geracao
+
+        def concluir(resultado):
+            self._pendentes.discard(tarefa)
+            if geracao == self._geracao:
+                ao_concluir(resultado)
+
+        def falhar(erro):
+            self._pendentes.discard(tarefa)
+            self._carregando = False
+            if self.executor.ao_erro:
+                self.executor.ao_erro(erro)
+
+        tarefa = self.executor.submeter(lambda t: funcao(), ao_concluir=concluir, ao_erro=falhar,
+                                        nome=f"{self.nome}: {etapa}")
+        self._pendentes.add(tarefa)
+
+    def recarregar(self, ao_concluir=None):
+        """Descarta a janela atual e carrega a primeira página.
+
+        `ao_concluir`, se informado, é chamado depois que a página aparece.
+        """
+        # Buscas ainda pendentes se referem à janela antiga
+        self._geracao += 1
+        for tarefa in self._pendentes:
+            tarefa.cancelar()
+        self._pendentes.clear()
+        self._carregando = False
+
+        def substituir(linhas):
+            self._substituir(linhas)
+            if ao_concluir is not None:
+                ao_concluir()
+
+        self._executar(lambda: self.buscar(None, None, self.tamanho_pagina), substituir,
+                       "recarregar")
+
+    def _substituir(self, linhas):
+        """Troca todo o conteúdo da janela pela primeira página."""
+        with self._medir("recarregar") as medicao:
+            self.tree.delete(*self.tree.get_children())
+            self.chaves.clear()
+            medicao.linhas = self._inserir(linhas, "end")
+            self.inicio_atingido = True
+            self.fim_atingido = len(linhas) < self.tamanho_pagina
+            self.tree.yview_moveto(0)
+
+    def aplicar_alteracoes(self, ids):
+        """Reflete na janela apenas as linhas inseridas, alteradas ou removidas."""
+        ids = list(ids)
+        self._executar(lambda: self.buscar_linhas(ids),
+                       lambda linhas: self._aplicar_linhas(ids, linhas), "alterações")
+
+    def _aplicar_linhas(self, ids, linhas):
+        """Atualiza, move ou remove os itens conforme as linhas atuais do banco."""
+        with self._medir("alterações") as medicao:
+            medicao.linhas = len(ids)
+            self._atualizar_itens(ids, linhas)
+
+    def _atualizar_itens(self, ids, linhas):
+        """Aplica ao Treeview as linhas lidas para os ids alterados."""
+        atuais = {str(iid): (chave, valores) for iid, chave, valores in linhas}
+
+        for iid in map(str, ids):
+            if iid in self.chaves:
+                if iid in atuais and atuais[iid][0] == self.chaves[iid]:
+                    self.tree.item(iid, values=atuais[iid][1])
+                    continue
+                # A chave de ordenação mudou ou a linha deixou de existir
+                self._remover([iid])
+
+            if iid in atuais:
+                chave, valores = atuais[iid]
+                posicao = self._posicao(chave)
+                if posicao is not None:
+                    self._inserir([(iid, chave, valores)], posicao)
+
+    def _posicao(self, chave):
+        """Posição da chave na janela ou None se ela cair fora das linhas materializadas."""
+        itens = self.tree.get_children()
+        baixo, alto = 0, len(itens)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual = self.chaves[itens[meio]]
+            if (atual > chave) if self.descendente else (atual < chave):
+                baixo = meio + 1
+            else:
+                alto = meio
+
+        if baixo == 0 and not self.inicio_atingido:
+            return None
+        if baixo == len(itens) and not self.fim_atingido:
+            return None
+        return baixo
+
+    def _inserir(self, linhas, posicao):
+        """Insere as linhas no Treeview a partir da posição indicada e retorna quantas entraram."""
+        inseridas = 0
+        for iid, chave, valores in linhas:
+            iid = str(iid)
+            # A linha pode ter chegado antes por uma alteração aplicada durante a busca
+            if iid in self.chaves:
+                continue
+            indice = posicao if posicao == "end" else posicao + inseridas
+            self.tree.insert("", indice, iid=iid, values=valores)
+            self.chaves[iid] = chave
+            inseridas += 1
+        return inseridas
+
+    def _remover(self, itens):
+        """Remove os itens do Treeview e do mapa de chaves."""
+        if itens:
+            self.tree.delete(*itens)
+            for iid in itens:
+                self.chaves.pop(iid, None)
+
+    def _ao_rolar(self, primeiro, ultimo):
+        """Repassa a posição à barra de rolagem e agenda a busca de mais linhas."""
+        self.scrollbar.set(primeiro, ultimo)
+        if self._carregando:
+            return
+
+        total = len(self.chaves)
+        abaixo = (1.0 - float(ultimo)) * total
+        acima = float(primeiro) * total
+        if not self.fim_atingido and abaixo < self.margem:
+            self._carregando = True
+            self.tree.after_idle(self._carregar_abaixo)
+        elif not self.inicio_atingido and acima < self.margem:
+            self._carregando = True
+            self.tree.after_idle(self._carregar_acima)
+
+    def _linha_do_topo(self):
+        """Índice aproximado da primeira linha visível."""
+        return int(round(float(self.tree.yview()[0]) * len(self.chaves)))
+
+    def _carregar_abaixo(self):
+        """Busca a página seguinte à última linha materializada."""
+        itens = self.tree.get_children()
+        if not itens:
+            self._carregando = False
+            return
+
+        chave = self.chaves[itens[-1]]
+        self._executar(lambda: self.buscar(chave, None, self.tamanho_pagina), self._anexar_abaixo,
+                       "rolagem")
+
+    def _anexar_abaixo(self, linhas):
+        """Acrescenta a página ao final e descarta as linhas excedentes do início."""
+        self._carregando = False
+        with self._medir("rolagem") as medicao:
+            topo = self._linha_do_topo()
+            self.fim_atingido = len(linhas) < self.tamanho_pagina
+            medicao.linhas = self._inserir(linhas, "end")
+
+            excedente = len(self.chaves) - self.max_linhas
+            if excedente > 0:
+                self._remover(self.tree.get_children()[:excedente])
+                self.inicio_atingido = False
+                topo -= excedente
+            self.tree.yview_moveto(max(topo, 0) / max(len(self.chaves), 1))
+
+    def _carregar_acima(self):
+        """Busca a página anterior à primeira linha materializada."""
+        itens = self.tree.get_children()
+        if not itens:
+            self._carregando = False
+            return
+
+        chave = self.chaves[itens[0]]
+        self._executar(lambda: self.buscar(None, chave, self.tamanho_pagina), self._anexar_acima,
+                       "rolagem")
+
+    def _anexar_acima(self, linhas):
+        """Acrescenta a página ao início e descarta as linhas excedentes do final."""
+        self._carregando = False
+        with self._medir("rolagem") as medicao:
+            topo = self._linha_do_topo()
+            self.inicio_atingido = len(linhas) < self.tamanho_pagina
+            medicao.linhas = self._inserir(linhas, 0)
+            topo += medicao.linhas
+
+            excedente = len(self.chaves) - self.max_linhas
+            if excedente > 0:
+                self._remover(self.tree.get_children()[-excedente:])
+                self.fim_atingido = False
+            self.tree.yview_moveto(topo / max(len(self.chaves), 1))
@@ -0,0 +1,30 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import gerar_dados  # noqa: E402
+from motor import MotorEstoque  # noqa: E402
+
+HOJE = date(2026, 6, 15)
+
+
+@pytest.fixture
+def motor(tmp_path):
+    """Motor sobre um banco novo e vazio."""
+    motor = MotorEstoque(str(tmp_path / "estoque.db"))
+    yield motor
+    motor.fechar()
+
+
+@pytest.fixture
+def motor_com_vendas(tmp_path):
+    """Motor sobre um banco gerado com 50 produtos e três anos de vendas."""
+    caminho = str(tmp_path / "estoque.db")
+    gerar_dados(caminho, produtos=50, vendas=3000, dias=3 * 365, hoje=HOJE)
+    motor = MotorEstoque(caminho)
+    yield motor
+    motor.fechar()
@@ -0,0 +1,52 @@
+from arquivo import arquivar_vendas, arquivado_ate, fonte_vendas, anexar_arquivos, CRIAR_VENDAS_ARQUIVO
+from banco import ler_resumo
+from relatorios import agregar_vendas
+from conftest import HOJE
+
+
+def todas_as_vendas(conn):
+    return conn.execute(f"SELECT id, quantidade, preco_venda, data_venda "
+                        f"FROM {fonte_vendas(conn, '2000-01-01')} ORDER BY id").fetchall()
+
+
+def test_arquivar_mantem_vendas_e_totais(motor_com_vendas):
+    with motor_com_vendas.banco.escrita() as conn:
+        vendas, resumo = todas_as_vendas(conn), ler_resumo(conn)
+        meses = agregar_vendas(conn, "mes")
+
+        movidas = arquivar_vendas(conn, 365, hoje=HOJE)
+
+        assert movidas and sum(movidas.values()) > 0
+        corte = arquivado_ate(conn)
+        assert conn.execute("SELECT COUNT(*) FROM vendas WHERE data_venda < ?",
+                            (corte,)).fetchone()[0] == 0
+        assert todas_as_vendas(conn) == vendas
+        assert ler_resumo(conn) == resumo
+        assert agregar_vendas(conn, "mes") == meses
+
+
+def test_arquivar_de_novo_retoma_copia_interrompida(motor_com_vendas):
+    with motor_com_vendas.banco.escrita() as conn:
+        vendas = todas_as_vendas(conn)
+        ano = conn.execute("SELECT MIN(substr(data_venda, 1, 4)) FROM vendas").fetchone()[0]
+
+        # Uma execução anterior copiou parte do ano e parou antes de excluir
+        anexar_arquivos(conn, {ano: f"vendas_{ano}.db"})
+        conn.execute(CRIAR_VENDAS_ARQUIVO.format(f"arquivo_{ano}"))
+        conn.execute(f'''INSERT INTO arquivo_{ano}.vendas
+            (id, produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+            SELECT id, produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda
+            FROM main.vendas WHERE substr(data_venda, 1, 4) = ? LIMIT 10''', (ano,))
+        conn.commit()
+        anexar_arquivos(conn, {})
+        assert todas_as_vendas(conn) == vendas
+
+        arquivar_vendas(conn, 365, hoje=HOJE)
+
+        assert todas_as_vendas(conn) == vendas
+        assert conn.execute("SELECT arquivando FROM vendas_fechamento").fetchone()[0] == 0
+
+
+def test_nada_a_arquivar(motor):
+    with motor.banco.escrita() as conn:
+        assert arquivar_vendas(conn, 365, hoje=HOJE) == {}
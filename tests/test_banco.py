@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+
+import pytest
+
+from banco import (GerenciadorConexoes, banco_ocupado, executar_transacao, ler_alteracoes,
+                   podar_alteracoes, versao_atual)
+
+
+@pytest.fixture
+def gerenciador(tmp_path):
+    gerenciador = GerenciadorConexoes(str(tmp_path / "banco.db"), tamanho_pool=2)
+    with gerenciador.escrita() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, valor INTEGER)")
+        conn.commit()
+    yield gerenciador
+    gerenciador.fechar()
+
+
+def test_pool_reaproveita_as_conexoes_de_leitura(gerenciador):
+    with gerenciador.leitura() as primeira:
+        with gerenciador.leitura() as segunda:
+            assert primeira is not segunda
+    with gerenciador.leitura() as de_novo:
+        assert de_novo in (primeira, segunda)
+        assert de_novo.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with gerenciador.escrita() as escritor:
+        assert escritor not in (primeira, segunda)
+    # Dois leitores mais o escritor
+    assert len(gerenciador._abertas) == 3
+
+
+def test_pool_cheio_espera_uma_conexao_devolvida(gerenciador):
+    emprestadas = [gerenciador._obter_leitor() for _ in range(2)]
+    obtida = []
+    thread = threading.Thread(target=lambda: obtida.append(gerenciador._obter_leitor()))
+    thread.start()
+    thread.join(0.1)
+    assert not obtida
+
+    gerenciador._leitores.put(emprestadas[0])
+    thread.join()
+    assert obtida == [emprestadas[0]]
+
+
+def test_leitura_devolve_a_conexao_sem_transacao_aberta(gerenciador):
+    with gerenciador.leitura() as conn:
+        conn.execute("BEGIN")
+        conn.execute("SELECT * FROM t").fetchall()
+    assert not conn.in_transaction
+
+
+def test_transacao_repete_enquanto_o_banco_esta_ocupado(gerenciador):
+    bloqueio = sqlite3.connect(gerenciador.caminho, isolation_level=None, check_same_thread=False)
+    bloqueio.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.2, bloqueio.rollback).start()
+
+    with gerenciador.escrita() as conn:
+        conn.execute("PRAGMA busy_timeout = 0")
+        executar_transacao(conn, lambda conn: conn.execute("INSERT INTO t (valor) VALUES (1)"),
+                           tentativas=8)
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    bloqueio.close()
+
+
+def test_transacao_desiste_depois_das_tentativas(gerenciador):
+    bloqueio = sqlite3.connect(gerenciador.caminho, isolation_level=None)
+    bloqueio.execute("BEGIN IMMEDIATE")
+    try:
+        with gerenciador.escrita() as conn:
+            conn.execute("PRAGMA busy_timeout = 0")
+            with pytest.raises(sqlite3.OperationalError) as erro:
+                executar_transacao(conn, lambda conn: None, tentativas=2, espera=0.001)
+            assert banco_ocupado(erro.value)
+    finally:
+        bloqueio.rollback()
+        bloqueio.close()
+
+
+def test_erro_na_funcao_desfaz_sem_repetir(gerenciador):
+    chamadas = []
+
+    def falhar(conn):
+        chamadas.append(1)
+        conn.execute("INSERT INTO t (valor) VALUES (1)")
+        conn.execute("INSERT INTO tabela_inexistente VALUES (1)")
+
+    with gerenciador.escrita() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            executar_transacao(conn, falhar)
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    assert chamadas == [1]
+
+
+def test_diario_lista_as_linhas_alteradas(motor):
+    versao = motor.ler(versao_atual)
+    assert motor.ler(ler_alteracoes, None)[1] is None
+    assert motor.ler(ler_alteracoes, versao) == (versao, {})
+
+    caneta = motor.adicionar_produto("Caneta", 10, "2.00")
+    lapis = motor.adicionar_produto("Lápis", 10, "1.00")
+    motor.atualizar_produto(caneta, "Caneta azul", 10, "2.00")
+    motor.registrar_venda([(lapis, 1, 150)])
+
+    seq, alteradas = motor.ler(ler_alteracoes, versao)
+    assert seq > versao
+    assert alteradas["produtos"] == {caneta, lapis}
+    assert len(alteradas["vendas"]) == 1
+
+    motor.excluir_produto(caneta)
+    assert motor.ler(ler_alteracoes, seq)[1] == {"produtos": {caneta}}
+
+
+def test_diario_pede_recarga_quando_passa_do_limite_ou_foi_podado(motor):
+    versao = motor.ler(versao_atual)
+    for numero in range(5):
+        motor.adicionar_produto(f"P{numero}", 1, "1.00")
+
+    assert motor.ler(ler_alteracoes, versao, 4)[1] is None
+    assert len(motor.ler(ler_alteracoes, versao, 5)[1]["produtos"]) == 5
+
+    motor.escrever(podar_alteracoes, 2)
+    assert motor.ler(ler_alteracoes, versao)[1] is None
+    assert motor.ler(ler_alteracoes, motor.ler(versao_atual) - 2)[1] is not None
+
+
+def test_resumo_acompanha_as_gravacoes(motor):
+    caneta = motor.adicionar_produto("Caneta", 10, "2.00")
+    lapis = motor.adicionar_produto("Lápis", 4, "0.50")
+    motor.registrar_venda([(caneta, 3, 350), (lapis, 1, 100)])
+    motor.registrar_entrada(lapis, 6)
+    motor.atualizar_produto(caneta, "Caneta", 7, "2.40")
+
+    assert motor.totais() == {"valor_estoque": 7 * 240 + 9 * 50,
+                              "total_vendas": 3 * 350 + 100,
+                              "total_custo": 3 * 200 + 50,
+                              "lucro_total": 3 * 150 + 50}
+    assert motor.reconciliar() == {}
+
+    motor.excluir_produto(lapis)
+    assert motor.totais()["valor_estoque"] == 7 * 240
+    assert motor.reconciliar() == {}
+
+
+def test_reconciliar_corrige_o_resumo(motor_com_vendas):
+    correto = motor_com_vendas.totais()
+    motor_com_vendas.escrever(lambda conn: conn.execute(
+        "UPDATE resumo SET total_vendas = total_vendas + 1, valor_estoque = 0"))
+
+    assert motor_com_vendas.reconciliar() == {
+        "valor_estoque": (0, correto["valor_estoque"]),
+        "total_vendas": (correto["total_vendas"] + 1, correto["total_vendas"])}
+    assert motor_com_vendas.totais() == correto
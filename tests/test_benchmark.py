@@ -0,0 +1,86 @@
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from benchmark import (Bancada, gerar_dados, percentil, estatisticas, comparar,
+                       salvar_linha_base, ler_linha_base, FOLGA_MS)
+from conftest import HOJE
+
+
+def conteudo(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return (conn.execute("SELECT id, nome, quantidade, preco_custo FROM produtos").fetchall(),
+                conn.execute("SELECT produto_id, quantidade, preco_venda, data_venda "
+                             "FROM vendas ORDER BY id").fetchall())
+    finally:
+        conn.close()
+
+
+def test_mesma_semente_gera_os_mesmos_dados(tmp_path):
+    caminhos = [str(tmp_path / f"{nome}.db") for nome in ("a", "b", "c")]
+    for caminho, semente in zip(caminhos, (7, 7, 8)):
+        assert gerar_dados(caminho, produtos=30, vendas=500, dias=60, semente=semente,
+                           hoje=HOJE) == {"produtos": 30, "vendas": 500}
+
+    produtos, vendas = conteudo(caminhos[0])
+    assert len(produtos) == 30 and len(vendas) == 500
+    inicio = (HOJE - timedelta(days=60)).isoformat()
+    assert inicio <= vendas[0][3] <= vendas[-1][3] < HOJE.isoformat()
+    assert conteudo(caminhos[1]) == (produtos, vendas)
+    assert conteudo(caminhos[2]) != (produtos, vendas)
+
+
+def test_gerar_dados_nao_sobrescreve_banco(tmp_path):
+    caminho = tmp_path / "estoque.db"
+    caminho.write_bytes(b"")
+    with pytest.raises(FileExistsError):
+        gerar_dados(str(caminho), produtos=1, vendas=1)
+
+
+def test_percentil_pelo_posto_mais_proximo():
+    tempos = [i / 1000 for i in range(1, 101)]
+    assert percentil(tempos, 50) == 0.050
+    assert percentil(tempos, 99) == 0.099
+    assert percentil([0.002], 95) == 0.002
+    resultado = estatisticas(tempos)
+    assert resultado["n"] == 100 and resultado["max_ms"] == 100
+
+
+def test_comparar_aponta_so_regressoes_alem_da_folga(tmp_path):
+    base = {"cenarios": {
+        "rapido": {"p50_ms": 0.1, "p95_ms": 0.2},
+        "lento": {"p50_ms": 10.0, "p95_ms": 20.0},
+    }}
+    resultados = {
+        # Triplicou, mas a diferença é menor que a folga
+        "rapido": {"p50_ms": 0.3, "p95_ms": 0.2 + FOLGA_MS / 2},
+        "lento": {"p50_ms": 11.0, "p95_ms": 30.0},
+        "novo": {"p50_ms": 1.0, "p95_ms": 1.0},
+    }
+    assert comparar(resultados, base) == [("lento", "p95_ms", 20.0, 30.0)]
+
+    caminho = str(tmp_path / "base.json")
+    salvar_linha_base(caminho, resultados, 10, 100)
+    assert comparar(resultados, ler_linha_base(caminho)) == []
+
+
+def test_bancada_mede_sem_alterar_o_banco(tmp_path, monkeypatch):
+    # Sem tela, só os cenários de consulta
+    monkeypatch.delenv("DISPLAY", raising=False)
+    caminho = str(tmp_path / "estoque.db")
+    gerar_dados(caminho, produtos=40, vendas=800, dias=90, hoje=HOJE)
+    antes = conteudo(caminho)
+
+    bancada = Bancada(caminho)
+    try:
+        medidos = []
+        resultados = bancada.executar(repeticoes=3, filtro="venda",
+                                      ao_medir=lambda nome, _: medidos.append(nome))
+    finally:
+        bancada.fechar()
+
+    assert medidos == list(resultados) and "venda: registrar 3 itens" in resultados
+    assert all(resultado["n"] == 3 for resultado in resultados.values())
+    assert conteudo(caminho) == antes
@@ -0,0 +1,46 @@
+import pytest
+
+from busca import expressao_busca
+
+
+def nomes(motor, termo):
+    return [linha[1] for linha in motor.listar_produtos(termo, limite=1000)]
+
+
+@pytest.fixture
+def catalogo(motor):
+    for nome in ("Café Torrado", "Açúcar Cristal", "Café Solúvel", "Cafeteira Elétrica",
+                 "Chá Mate"):
+        motor.adicionar_produto(nome, 1, "1.00")
+    return motor
+
+
+def test_expressao_busca_prefixa_cada_palavra():
+    assert expressao_busca("  café  sol ") == '"café"* "sol"*'
+    assert expressao_busca('a"b OR c') == '"a"* "b"* "OR"* "c"*'
+    assert expressao_busca(" -*() ") is None
+    assert expressao_busca(None) is None
+
+
+def test_busca_por_prefixo_sem_acento_nem_caixa(catalogo):
+    assert nomes(catalogo, "cafe") == sorted(["Café Solúvel", "Café Torrado", "Cafeteira Elétrica"])
+    assert nomes(catalogo, "CAFE SOL") == ["Café Solúvel"]
+    assert nomes(catalogo, "acu") == ["Açúcar Cristal"]
+    assert nomes(catalogo, "xyz") == []
+    assert len(nomes(catalogo, "")) == 5
+
+
+def test_indice_acompanha_alteracoes(catalogo):
+    (produto_id, *_), = catalogo.listar_produtos("mate")
+    catalogo.atualizar_produto(produto_id, "Erva Mate", 1, "1.00")
+    assert nomes(catalogo, "erva") == ["Erva Mate"]
+    assert nomes(catalogo, "cha") == []
+
+    catalogo.excluir_produto(produto_id)
+    assert nomes(catalogo, "mate") == []
+
+
+def test_busca_paginada(catalogo):
+    primeira = catalogo.listar_produtos("ca", limite=2)
+    segunda = catalogo.listar_produtos("ca", apos=primeira[-1][1::-1], limite=2)
+    assert [linha[1] for linha in primeira + segunda] == nomes(catalogo, "ca")
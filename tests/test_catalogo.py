@@ -0,0 +1,28 @@
+from catalogo import CatalogoProdutos, normalizar_nome
+
+
+def test_normalizar_nome():
+    assert normalizar_nome("  Café   com  AÇÚCAR ") == "cafe com acucar"
+
+
+def test_carregar_e_atualizar_pelo_diario(motor):
+    a = motor.adicionar_produto("Café", 5, "3")
+    b = motor.adicionar_produto("Açúcar", 7, "2.50")
+    catalogo = CatalogoProdutos()
+    with motor.banco.leitura() as conn:
+        catalogo.atualizar(conn)
+        catalogo.carregar(conn, [a, b])
+    assert catalogo.obter(b).preco_custo == 250
+    assert [p.id for p in catalogo.com_nome("ACUCAR")] == [b]
+
+    # Gravações feitas por fora chegam pelo diário
+    motor.atualizar_produto(b, "Mascavo", 9, "4")
+    motor.excluir_produto(a)
+    c = motor.adicionar_produto("Sal", 1, "1")
+    with motor.banco.leitura() as conn:
+        catalogo.atualizar(conn)
+
+    assert catalogo.obter(a) is None
+    assert (catalogo.obter(b).nome, catalogo.obter(b).quantidade) == ("Mascavo", 9)
+    assert catalogo.com_nome("açúcar") == [] and catalogo.com_nome("mascavo")[0].id == b
+    assert catalogo.obter(c) is None  # Só guarda o que já foi lido
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+import pytest
+
+from cli import main
+
+
+@pytest.fixture
+def banco(tmp_path):
+    caminho = str(tmp_path / "estoque.db")
+    assert main(["--banco", caminho, "gerar", "--produtos", "20", "--vendas", "400",
+                 "--dias", "120"]) == 0
+    return caminho
+
+
+def executar(capsys, *argumentos):
+    codigo = main(list(argumentos))
+    saida, erro = capsys.readouterr()
+    return codigo, saida, erro
+
+
+def test_relatorio_por_mes_em_csv(banco, capsys):
+    capsys.readouterr()
+    codigo, saida, erro = executar(capsys, "--banco", banco, "report", "--agrupar", "mes")
+
+    linhas = list(csv.reader(io.StringIO(saida)))
+    assert codigo == 0
+    assert linhas[0] == ["Período", "ID", "Produto", "Quantidade", "Vendas",
+                         "Total Venda", "Total Custo", "Lucro"]
+    assert sum(int(linha[4]) for linha in linhas[1:]) == 400
+    assert erro.startswith("Total em Vendas: R$ ")
+
+
+def test_importar_e_consultar_o_estoque(tmp_path, capsys):
+    caminho = str(tmp_path / "novo.db")
+    planilha = tmp_path / "produtos.csv"
+    planilha.write_text("ID,Nome,Quantidade,Preço de Custo\n,Caneta,10,2.50\n,Lápis,x,1\n",
+                        encoding="utf-8")
+
+    codigo, saida, _ = executar(capsys, "--banco", caminho, "importar", str(planilha))
+    assert codigo == 1  # uma linha rejeitada
+    assert saida.strip() == "inseridos=1 atualizados=0 rejeitados=1"
+
+    codigo, saida, erro = executar(capsys, "--banco", caminho, "estoque")
+    assert codigo == 0
+    assert list(csv.reader(io.StringIO(saida)))[1] == ["1", "Caneta", "10", "2.5", "25.0"]
+    assert "10 unidades" in erro
+
+
+def test_reconciliar_e_metricas(banco, tmp_path, capsys):
+    metricas = tmp_path / "metricas.json"
+    codigo, _, erro = executar(capsys, "--banco", banco, "--metricas", str(metricas),
+                               "reconciliar")
+    assert codigo == 0 and "nenhuma divergência" in erro
+    assert json.loads(metricas.read_text(encoding="utf-8"))["series"]
+
+
+def test_erros_viram_codigo_de_saida(banco, tmp_path, capsys):
+    codigo, _, erro = executar(capsys, "--banco", banco, "exportar", str(tmp_path / "r.txt"))
+    assert codigo == 1 and erro.startswith("Erro: ")
+
+    with pytest.raises(SystemExit) as saida:
+        main(["--banco", banco, "relatorio", "--de", "31/02/2026"])
+    assert saida.value.code == 2
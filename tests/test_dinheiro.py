@@ -0,0 +1,47 @@
+import pytest
+
+from dinheiro import FormatadorMoeda, formatar_moeda, formatar_moedas, para_centavos, para_reais
+from produtos import ProdutoInvalido, validar_produto
+
+
+@pytest.mark.parametrize("valor, centavos", [
+    ("19.99", 1999), (19.99, 1999), (0.1 + 0.2, 30), ("1.005", 101), ("2.675", 268),
+    (3, 300), ("0.004", 0), ("-1.50", -150),
+])
+def test_para_centavos_arredonda_meio_para_cima(valor, centavos):
+    assert para_centavos(valor) == centavos
+
+
+def test_ida_e_volta_em_reais():
+    assert para_reais(para_centavos("1234.56")) == 1234.56
+
+
+def test_cadastro_recusa_preco_que_arredonda_para_zero():
+    assert validar_produto(" Caneta ", "3", "2.5") == ("Caneta", 3, 250)
+    with pytest.raises(ProdutoInvalido):
+        validar_produto("Caneta", "3", "0.004")
+
+
+def test_totais_da_venda_calculados_em_centavos(motor):
+    produto_id = motor.adicionar_produto("Borracha", 10, str(0.1 + 0.2))
+    motor.registrar_venda([(produto_id, 3, para_centavos("0.70"))])
+
+    assert motor.ler(lambda conn: conn.execute(
+        "SELECT preco_custo, preco_venda, total_custo, total_venda, lucro FROM vendas"
+    ).fetchone()) == (30, 70, 90, 210, 120)
+    assert motor.totais()["lucro_total"] == 120
+
+
+@pytest.mark.parametrize("centavos, texto", [
+    (0, "R$ 0,00"), (5, "R$ 0,05"), (123456, "R$ 1.234,56"), (-100000001, "-R$ 1.000.000,01"),
+])
+def test_formatar_moeda_no_formato_brasileiro(centavos, texto):
+    assert formatar_moeda(centavos) == texto
+
+
+def test_formatador_com_outras_convencoes_e_cache():
+    dolar = FormatadorMoeda("US$", ",", ".", tamanho_cache=2)
+    assert dolar.formatar_coluna([123456, 5, 123456]) == ["US$ 1,234.56", "US$ 0.05", "US$ 1,234.56"]
+    assert dolar.formatar.cache_info().hits == 1
+    # O formato padrão não é afetado por outro formatador
+    assert formatar_moedas([123456]) == ["R$ 1.234,56"]
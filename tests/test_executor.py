@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from executor import ExecutorBanco, tarefa_atual
+from metricas import Metricas
+
+
+class RaizFalsa:
+    """Só o `after` do Tk: os callbacks rodam quando o teste chama `processar`."""
+
+    def __init__(self):
+        self.agendados = {}
+        self.proximo = 0
+
+    def after(self, ms, funcao):
+        self.proximo += 1
+        self.agendados[self.proximo] = funcao
+        return self.proximo
+
+    def after_cancel(self, identificador):
+        self.agendados.pop(identificador, None)
+
+    def processar(self):
+        agendados, self.agendados = self.agendados, {}
+        for funcao in agendados.values():
+            funcao()
+
+
+@pytest.fixture
+def raiz():
+    return RaizFalsa()
+
+
+@pytest.fixture
+def executor(raiz):
+    erros = []
+    executor = ExecutorBanco(raiz, ao_erro=erros.append, metricas=Metricas(arquivo_lentas=None))
+    executor.erros = erros
+    yield executor
+    executor.encerrar()
+
+
+def esperar(raiz, condicao, limite=5.0):
+    """Entrega as respostas à "interface" até a condição valer."""
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        raiz.processar()
+        time.sleep(0.005)
+
+
+def test_tarefas_em_ordem_e_callbacks_na_thread_principal(executor, raiz):
+    principal = threading.current_thread()
+    ordem, callbacks = [], []
+
+    def trabalho(tarefa, numero):
+        assert threading.current_thread() is not principal and tarefa_atual() is tarefa
+        ordem.append(numero)
+        return numero * 10
+
+    for numero in range(5):
+        executor.submeter(trabalho, numero, nome="trabalho", ao_concluir=lambda resultado: (
+            callbacks.append((resultado, threading.current_thread() is principal))))
+    esperar(raiz, lambda: len(callbacks) == 5)
+
+    assert ordem == [0, 1, 2, 3, 4]
+    assert callbacks == [(numero * 10, True) for numero in range(5)]
+    series = executor.metricas.series()
+    assert series[("tarefa", "trabalho")].chamadas == 5
+    assert series[("interface", "trabalho")].chamadas == 5
+
+
+def test_erro_vai_para_o_callback_de_erro(executor, raiz):
+    proprios = []
+    executor.submeter(lambda tarefa: 1 / 0, ao_erro=proprios.append)
+    executor.submeter(lambda tarefa: {}["x"])
+    esperar(raiz, lambda: proprios and executor.erros)
+
+    assert isinstance(proprios[0], ZeroDivisionError)
+    assert isinstance(executor.erros[0], KeyError)
+
+
+def test_cancelar_para_no_proximo_progresso(executor, raiz):
+    liberar, progresso, concluidas = threading.Event(), [], []
+
+    def longa(tarefa):
+        for passo in range(1000):
+            tarefa.informar_progresso(passo, 1000)
+            liberar.wait()
+        return "fim"
+
+    tarefa = executor.submeter(longa, ao_concluir=concluidas.append,
+                               ao_progresso=lambda feito, total: progresso.append(feito))
+    esperar(raiz, lambda: progresso)
+    tarefa.cancelar()
+    liberar.set()
+    executor.submeter(lambda tarefa: "depois", ao_concluir=concluidas.append)
+    esperar(raiz, lambda: concluidas)
+
+    assert concluidas == ["depois"] and not executor.erros
+
+
+def test_cancelar_interrompe_a_consulta(executor, raiz):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    iniciada, concluidas = threading.Event(), []
+
+    def consulta_sem_fim(tarefa):
+        with tarefa.interrompivel(conn):
+            iniciada.set()
+            return conn.execute('''WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)
+                                   SELECT COUNT(*) FROM n''').fetchone()
+
+    tarefa = executor.submeter(consulta_sem_fim, ao_concluir=concluidas.append)
+    assert iniciada.wait(5)
+    time.sleep(0.05)
+    tarefa.cancelar()
+    executor.submeter(lambda tarefa: "depois", ao_concluir=concluidas.append)
+    esperar(raiz, lambda: concluidas)
+
+    assert concluidas == ["depois"] and not executor.erros
+    conn.close()
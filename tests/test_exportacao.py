@@ -0,0 +1,121 @@
+import csv
+import os
+import sqlite3
+
+import pytest
+
+from exportacao import Escritor, EscritorCsv, EscritorXlsx, exportar, exportar_tabelas
+
+
+class Progresso:
+    def __init__(self):
+        self.passos = []
+
+    def informar_progresso(self, feito, total=None):
+        self.passos.append((feito, total))
+
+
+def contar(motor, sql):
+    return motor.ler(lambda conn: conn.execute(sql).fetchone()[0])
+
+
+def ler_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        return list(csv.reader(arquivo))
+
+
+def test_csv_grava_um_arquivo_por_tabela(motor_com_vendas, tmp_path):
+    destino = str(tmp_path / "relatorio.csv")
+    progresso = Progresso()
+
+    arquivos = motor_com_vendas.ler(exportar, destino, progresso)
+
+    assert [os.path.basename(arquivo) for arquivo in arquivos] == [
+        "relatorio_produtos.csv", "relatorio_vendas.csv"]
+    produtos, vendas = (ler_csv(arquivo) for arquivo in arquivos)
+    assert produtos[0] == ["ID", "Nome", "Quantidade", "Preço Custo", "Valor Total"]
+    assert len(produtos) - 1 == contar(motor_com_vendas, "SELECT COUNT(*) FROM produtos")
+    assert len(vendas) - 1 == contar(motor_com_vendas, "SELECT COUNT(*) FROM vendas")
+    assert progresso.passos[-1] == (len(produtos) + len(vendas) - 2,) * 2
+    assert not [nome for nome in os.listdir(tmp_path) if nome.endswith(".tmp")]
+
+
+def test_csv_filtra_as_vendas_pelo_periodo(motor_com_vendas, tmp_path):
+    arquivos = motor_com_vendas.ler(exportar, str(tmp_path / "r.csv"), None,
+                                    "2026-01-01", "2026-01-31")
+
+    vendas = ler_csv(arquivos[1])[1:]
+    assert len(vendas) == contar(motor_com_vendas, '''SELECT COUNT(*) FROM vendas
+        WHERE data_venda >= '2026-01-01' AND data_venda < '2026-02-01' ''')
+    assert vendas and all(linha[-1].startswith("2026-01") for linha in vendas)
+
+
+def test_parquet_tem_as_mesmas_linhas(motor_com_vendas, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    arquivos = motor_com_vendas.ler(exportar, str(tmp_path / "r.parquet"))
+
+    vendas = parquet.read_table(arquivos[1])
+    assert vendas.num_rows == contar(motor_com_vendas, "SELECT COUNT(*) FROM vendas")
+    assert sum(vendas.column("Lucro").to_pylist()) == pytest.approx(
+        contar(motor_com_vendas, "SELECT SUM(lucro) / 100.0 FROM vendas"))
+
+
+def test_copia_sqlite_do_banco(motor_com_vendas, tmp_path):
+    destino = str(tmp_path / "copia.db")
+    assert motor_com_vendas.ler(exportar, destino) == [destino]
+
+    copia = sqlite3.connect(destino)
+    try:
+        assert copia.execute("SELECT COUNT(*) FROM vendas").fetchone()[0] == \
+            contar(motor_com_vendas, "SELECT COUNT(*) FROM vendas")
+    finally:
+        copia.close()
+
+    origem = motor_com_vendas.ler(lambda conn: conn.execute("PRAGMA database_list").fetchone()[2])
+    with pytest.raises(ValueError):
+        motor_com_vendas.ler(exportar, origem)
+
+
+def test_formato_desconhecido(motor, tmp_path):
+    with pytest.raises(ValueError, match=".txt"):
+        motor.ler(exportar, str(tmp_path / "r.txt"))
+
+
+def test_falha_no_meio_descarta_os_temporarios(motor_com_vendas, tmp_path):
+    class Quebrado(EscritorCsv):
+        def escrever(self, linhas):
+            super().escrever(linhas)
+            raise OSError("disco cheio")
+
+    with pytest.raises(OSError):
+        motor_com_vendas.ler(exportar_tabelas, Quebrado(str(tmp_path / "r.csv")))
+    assert all(nome.startswith("estoque.db") for nome in os.listdir(tmp_path))
+
+
+def test_escritor_exige_os_metodos_do_formato(tmp_path):
+    class SemEscrever(Escritor):
+        def iniciar_tabela(self, titulo, colunas):
+            pass
+
+    with pytest.raises(TypeError):
+        SemEscrever(str(tmp_path / "r.x"))
+
+
+def test_xlsx_em_lotes_com_progresso(motor_com_vendas, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    destino = str(tmp_path / "relatorio.xlsx")
+    progresso = Progresso()
+
+    assert motor_com_vendas.ler(exportar_tabelas, EscritorXlsx(destino), progresso, 500) == [destino]
+
+    pasta = openpyxl.load_workbook(destino, read_only=True)
+    produtos, vendas = (list(pasta[titulo].values) for titulo in ("Produtos", "Vendas"))
+    pasta.close()
+    total_vendas = contar(motor_com_vendas, "SELECT COUNT(*) FROM vendas")
+    assert len(produtos) - 1 == contar(motor_com_vendas, "SELECT COUNT(*) FROM produtos")
+    assert len(vendas) - 1 == total_vendas
+    assert vendas[1][-1] == contar(motor_com_vendas, "SELECT MAX(data_venda) FROM vendas")
+    # Um aviso de progresso por lote lido, nunca mais que o lote de uma vez
+    feitos = [feito for feito, _ in progresso.passos]
+    assert feitos == sorted(feitos) and feitos[-1] == len(produtos) - 1 + total_vendas
+    assert all(depois - antes <= 500 for antes, depois in zip([0] + feitos, feitos))
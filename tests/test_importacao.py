@@ -0,0 +1,20 @@
+from importacao import importar_produtos
+
+
+def test_id_repetido_conta_uma_insercao_e_uma_atualizacao(motor, tmp_path):
+    existente = motor.adicionar_produto("Antigo", 1, "1")
+    arquivo = tmp_path / "produtos.csv"
+    arquivo.write_text(
+        "ID,Nome,Quantidade,Preço de Custo\n"
+        "500,Novo,2,1.50\n"
+        "500,Novo renomeado,3,1.50\n"
+        f"{existente},Antigo alterado,4,2\n"
+        ",Sem id,5,3\n", encoding="utf-8")
+
+    with motor.banco.escrita() as conn:
+        resultado = importar_produtos(conn, str(arquivo))
+        conn.commit()
+
+    assert (resultado["inseridos"], resultado["atualizados"], resultado["rejeitados"]) == (2, 2, 0)
+    assert motor.produto(500) == (500, "Novo renomeado", 3, 150)
+    assert motor.produto(existente)[1] == "Antigo alterado"
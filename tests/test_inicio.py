@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def modulos_carregados(codigo):
+    """Roda `codigo` num interpretador novo e retorna os módulos pesados que ele carregou."""
+    verificacao = ("import sys\n"
+                   "print('carregados:', *(m for m in ('tkinter', 'PIL', 'openpyxl')\n"
+                   "                       if m in sys.modules))")
+    resultado = subprocess.run([sys.executable, "-c", f"{codigo}\n{verificacao}"], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=60)
+    assert resultado.returncode == 0, resultado.stderr
+    return resultado.stdout.splitlines()[-1].split()[1:]
+
+
+def test_linha_de_comando_nao_carrega_tk_nem_pil(tmp_path):
+    banco = str(tmp_path / "estoque.db")
+    assert modulos_carregados(
+        "import runpy, sys\n"
+        f"sys.argv = ['app.py', '--banco', {banco!r}, 'estoque']\n"
+        "try:\n"
+        "    runpy.run_path('app.py', run_name='__main__')\n"
+        "except SystemExit as e:\n"
+        "    assert e.code == 0, e.code\n") == []
+
+
+def test_interface_adia_pil_e_openpyxl():
+    pytest.importorskip("tkinter")
+    assert modulos_carregados("import app") == ["tkinter"]
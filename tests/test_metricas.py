@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from metricas import FAIXAS_MS, Metricas, Serie, normalizar_sql
+from motor import MotorEstoque
+
+
+@pytest.fixture
+def medido(tmp_path):
+    """Motor com métricas e limiar zero, para que toda instrução seja lenta."""
+    metricas = Metricas(limiar_lenta_ms=0, arquivo_lentas=str(tmp_path / "lentas.log"))
+    motor = MotorEstoque(str(tmp_path / "estoque.db"), metricas=metricas)
+    yield motor, metricas
+    motor.fechar()
+
+
+def test_normalizar_sql_junta_listas_de_marcadores():
+    assert normalizar_sql("SELECT *\n  FROM t WHERE id IN (?, ?,?)") == \
+        "SELECT * FROM t WHERE id IN (?, …)"
+
+
+def test_percentis_pelo_histograma():
+    serie = Serie()
+    for ms in [0.5] * 90 + [30] * 9 + [9000]:
+        serie.registrar(ms, 1)
+
+    assert serie.chamadas == 100 and serie.linhas == 100
+    assert serie.percentil(50) == 1
+    assert serie.percentil(95) == 50
+    assert serie.percentil(100) == 9000
+    assert sum(serie.faixas) == 100 and len(serie.faixas) == len(FAIXAS_MS) + 1
+
+
+def test_instrucoes_medidas_com_linhas_e_plano(medido, tmp_path):
+    motor, metricas = medido
+    for nome in ("A", "B", "C"):
+        motor.adicionar_produto(nome, 1, "1.00")
+    assert len(motor.listar_produtos()) == 3
+
+    series = metricas.series()
+    selects = [serie for (tipo, nome), serie in series.items()
+               if tipo == "sql" and nome.startswith("SELECT")]
+    assert selects and sum(serie.linhas for serie in selects) >= 3
+    assert ("sql", "COMMIT") in series
+    assert any(nome.startswith("SELECT") for nome in metricas.planos())
+    assert (tmp_path / "lentas.log").exists()
+
+    metricas.zerar()
+    assert metricas.series() == {} and metricas.planos() == {}
+
+
+def test_erro_conta_na_serie(medido):
+    motor, metricas = medido
+    with pytest.raises(Exception):
+        motor.ler(lambda conn: conn.execute("SELECT * FROM tabela_que_nao_existe"))
+    assert metricas.series()[("sql", "SELECT * FROM tabela_que_nao_existe")].erros == 1
+
+
+def test_plano_capturado_uma_vez_entre_threads(medido):
+    motor, metricas = medido
+    motor.adicionar_produto("A", 1, "1.00")
+    planos = []
+
+    def capturar():
+        with motor.banco.leitura() as conn:
+            for _ in range(50):
+                planos.append(metricas.plano(conn, "SELECT id FROM produtos WHERE id = ?",
+                                             "SELECT id FROM produtos WHERE id = ?", (1,)))
+
+    threads = [threading.Thread(target=capturar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(planos) == 200 and all(plano is planos[0] for plano in planos)
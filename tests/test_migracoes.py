@@ -0,0 +1,73 @@
+import sqlite3
+
+from migracoes import MIGRACOES, versao_schema
+from motor import MotorEstoque
+
+# Esquema original do programa, antes das migrações versionadas
+ESQUEMA_ORIGINAL = '''
+    CREATE TABLE produtos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_custo REAL NOT NULL
+    );
+    CREATE TABLE vendas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto_id INTEGER NOT NULL,
+        nome_produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_venda REAL NOT NULL,
+        preco_custo REAL NOT NULL,
+        data_venda TEXT NOT NULL,
+        FOREIGN KEY (produto_id) REFERENCES produtos (id)
+    );
+'''
+
+
+def criar_banco_original(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(ESQUEMA_ORIGINAL)
+    conn.executemany("INSERT INTO produtos (nome, quantidade, preco_custo) VALUES (?, ?, ?)",
+                     [("Caneta Azul", 10, 2.5), ("Caderno", 3, 19.99), ("Borracha", 0, 0.1 + 0.2)])
+    conn.executemany(
+        '''INSERT INTO vendas (produto_id, nome_produto, quantidade, preco_venda, preco_custo,
+        data_venda) VALUES (?, ?, ?, ?, ?, ?)''',
+        [(1, "Caneta Azul", 2, 4.0, 2.5, "2024-05-10 10:00:00"),
+         (2, "Caderno", 1, 29.9, 19.99, "2025-01-02 15:30:00")])
+    conn.commit()
+    conn.close()
+
+
+def test_migra_banco_original_ate_a_versao_atual(tmp_path):
+    caminho = str(tmp_path / "estoque.db")
+    criar_banco_original(caminho)
+
+    motor = MotorEstoque(caminho)
+    try:
+        assert motor.ler(versao_schema) == MIGRACOES[-1][0]
+        # Valores em REAL viram centavos inteiros
+        assert motor.produto(2) == (2, "Caderno", 3, 1999)
+        assert motor.produto(3)[3] == 30
+        totais = motor.totais()
+        assert totais["total_vendas"] == 2 * 400 + 2990
+        assert totais["lucro_total"] == 2 * 150 + (2990 - 1999)
+        assert totais["valor_estoque"] == 10 * 250 + 3 * 1999
+        # Busca, totais materializados e livro de movimentos conferem com as tabelas
+        assert [linha[0] for linha in motor.listar_produtos("caneta")] == [1]
+        assert motor.reconciliar() == {}
+        assert motor.conferir_estoque() == {}
+    finally:
+        motor.fechar()
+
+
+def test_reabrir_nao_reaplica_migracoes(tmp_path):
+    caminho = str(tmp_path / "estoque.db")
+    criar_banco_original(caminho)
+    MotorEstoque(caminho).fechar()
+
+    motor = MotorEstoque(caminho)
+    try:
+        assert motor.produto(1) == (1, "Caneta Azul", 10, 250)
+        assert motor.reconciliar() == {}
+    finally:
+        motor.fechar()
@@ -0,0 +1,89 @@
+import time
+from datetime import date, timedelta
+
+from arquivo import arquivar_vendas
+from movimentos import agora, tirar_saldo, divergencias_estoque
+from conftest import HOJE
+
+
+def estoque_atual(conn):
+    return {produto_id: quantidade for produto_id, quantidade in conn.execute(
+        "SELECT id, quantidade FROM produtos WHERE quantidade != 0")}
+
+
+def estoque_no_livro(motor, data):
+    linhas, totais = motor.estoque_em(data)
+    return {linha[0]: linha[2] for linha in linhas}, totais
+
+
+def test_cada_alteracao_vira_um_movimento_do_seu_tipo(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+
+    motor.registrar_entrada(lapis, 4, "1.75")
+    motor.registrar_venda([(lapis, 3, 300)])
+    motor.atualizar_produto(caneta, "Caneta", 2, "2.00")
+    motor.excluir_produto(caneta)
+
+    assert motor.ler(lambda conn: conn.execute(
+        "SELECT produto_id, tipo, quantidade, preco_custo FROM movimentos ORDER BY id"
+    ).fetchall()) == [(lapis, "E", 10, 150), (caneta, "E", 5, 200), (lapis, "E", 4, 175),
+                      (lapis, "V", -3, 175), (caneta, "A", -3, 200), (caneta, "A", -2, 200)]
+    assert motor.conferir_estoque() == {}
+
+
+def test_posicao_de_hoje_bate_com_o_estoque_atual(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+    motor.registrar_venda([(lapis, 3, 300), (caneta, 1, 400)])
+    motor.registrar_entrada(caneta, 6)
+
+    hoje = date.today().isoformat()
+    ontem = (date.today() - timedelta(days=1)).isoformat()
+
+    quantidades, totais = estoque_no_livro(motor, hoje)
+    assert quantidades == {lapis: 7, caneta: 10}
+    assert totais == {"quantidade": 17, "valor_estoque": 7 * 150 + 10 * 200}
+    # Tudo foi lançado hoje: ontem o estoque estava vazio
+    assert estoque_no_livro(motor, ontem) == ({}, {"quantidade": 0, "valor_estoque": 0})
+
+
+def test_saldo_intermediario_e_so_os_movimentos_seguintes(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    # O saldo de abertura foi gravado neste mesmo segundo
+    time.sleep(1)
+    with motor.banco.escrita() as conn:
+        tirar_saldo(conn, agora())
+        conn.commit()
+    motor.registrar_venda([(lapis, 4, 300)])
+    motor.registrar_entrada(lapis, 1)
+
+    assert motor.ler(lambda conn: conn.execute(
+        "SELECT COUNT(*) FROM saldos_datas").fetchone()[0]) == 2
+    assert estoque_no_livro(motor, date.today().isoformat())[0] == {lapis: 7}
+    assert motor.conferir_estoque() == {}
+
+
+def test_livro_bate_com_o_estoque_depois_de_arquivar(motor_com_vendas):
+    with motor_com_vendas.banco.escrita() as conn:
+        assert arquivar_vendas(conn, 365, hoje=HOJE)
+        esperado = estoque_atual(conn)
+        assert divergencias_estoque(conn) == {}
+
+    produto_id = next(iter(esperado))
+    motor_com_vendas.registrar_venda([(produto_id, 1, 1000)])
+    esperado[produto_id] -= 1
+
+    quantidades, _ = estoque_no_livro(motor_com_vendas, date.today().isoformat())
+    assert quantidades == esperado
+    assert motor_com_vendas.conferir_estoque() == {}
+
+
+def test_alteracao_fora_dos_gatilhos_aparece_como_divergencia(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    with motor.banco.escrita() as conn:
+        conn.execute("DROP TRIGGER produtos_movimento_u")
+        conn.execute("UPDATE produtos SET quantidade = 8 WHERE id = ?", (lapis,))
+        conn.commit()
+
+    assert motor.conferir_estoque() == {lapis: (8, 10)}
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+from relatorios import (agregar_vendas, fechamento_atual, interpretar_data, resumir_produtos,
+                        totalizar_vendas)
+from vendas import registrar_itens
+
+
+def inicio_periodo(dia, periodo):
+    if periodo == "dia":
+        return dia
+    if periodo == "mes":
+        return dia[:7]
+    data = date.fromisoformat(dia)
+    return (data - timedelta(days=data.weekday())).isoformat()
+
+
+def esperado(conn, periodo, inicio, fim):
+    """Agregação feita em Python direto das vendas brutas."""
+    somas = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for produto_id, quantidade, total_venda, total_custo, lucro, data_venda in conn.execute(
+            "SELECT produto_id, quantidade, total_venda, total_custo, lucro, data_venda FROM vendas"):
+        dia = data_venda[:10]
+        if inicio <= dia <= fim:
+            soma = somas[(inicio_periodo(dia, periodo), produto_id)]
+            for indice, valor in enumerate((quantidade, 1, total_venda, total_custo, lucro)):
+                soma[indice] += valor
+    return {chave: tuple(soma) for chave, soma in somas.items()}
+
+
+@pytest.mark.parametrize("periodo", ["dia", "semana", "mes"])
+def test_consolidado_mais_periodo_aberto_bate_com_as_vendas(motor_com_vendas, periodo):
+    with motor_com_vendas.banco.escrita() as conn:
+        corte = fechamento_atual(conn)
+        # Vendas no período aberto, que ainda vêm da tabela bruta
+        for dias in (0, 3, 9):
+            dia = date.fromisoformat(corte) + timedelta(days=dias)
+            registrar_itens(conn, [(1, 1, 9999), (2, 2, 500)], f"{dia} 10:00:00")
+        conn.commit()
+        # Intervalo que começa no meio de uma semana e atravessa o fechamento
+        inicio = (date.fromisoformat(corte) - timedelta(days=200)).isoformat()
+        fim = (date.fromisoformat(corte) + timedelta(days=5)).isoformat()
+
+        linhas = agregar_vendas(conn, periodo, inicio, fim)
+        assert {(chave, produto_id): tuple(valores)
+                for chave, produto_id, _, *valores in linhas} == esperado(conn, periodo, inicio, fim)
+        assert [linha[0] for linha in linhas] == sorted((linha[0] for linha in linhas), reverse=True)
+        recente = (date.fromisoformat(corte) + timedelta(days=3)).isoformat()
+        assert linhas[0][0] == inicio_periodo(recente, periodo)
+
+
+def test_venda_lancada_em_periodo_fechado_entra_no_consolidado(motor_com_vendas):
+    produto_id = motor_com_vendas.adicionar_produto("Atrasado", 10, "1.00")
+    with motor_com_vendas.banco.escrita() as conn:
+        antes = totalizar_vendas(conn, "2026-03-01", "2026-03-31")
+        conn.execute('''INSERT INTO vendas
+            (produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+            VALUES (?, 'Atrasado', 2, 500, 100, '2026-03-10 09:00:00')''', (produto_id,))
+        conn.commit()
+
+        depois = totalizar_vendas(conn, "2026-03-01", "2026-03-31")
+        assert depois["total_vendas"] == antes["total_vendas"] + 1000
+        assert depois["lucro_total"] == antes["lucro_total"] + 800
+        (linha,) = [linha for linha in resumir_produtos(conn, "2026-03-10", "2026-03-10")
+                    if linha[0] == produto_id]
+        assert linha[2:4] == (2, 1)
+
+
+def test_interpretar_data():
+    assert interpretar_data(" 05/03/2026 ") == "2026-03-05"
+    assert interpretar_data("2026-03-05") == "2026-03-05"
+    assert interpretar_data("") is None
+    with pytest.raises(ValueError):
+        interpretar_data("31/02/2026")
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from motor import remover_produto
+from reposicao import FilaReposicao, produtos_em_risco
+from vendas import registrar_itens
+
+
+def conferir(fila, conn, agora):
+    esperado = produtos_em_risco(conn, 10000, agora)
+    assert fila.em_risco(10000, agora) == esperado
+    assert fila.total_em_risco(agora) == len(esperado)
+    assert fila.chaves == sorted(chave for chave, *_ in fila.atuais.values())
+
+
+def test_fila_acompanha_alteracoes(motor_com_vendas):
+    agora = datetime(2026, 10, 1)
+    fila = FilaReposicao()
+    with motor_com_vendas.banco.leitura() as conn:
+        fila.atualizar(conn)
+        conferir(fila, conn, agora)
+
+    with motor_com_vendas.banco.escrita() as conn:
+        ids = [produto_id for (produto_id,) in conn.execute(
+            "SELECT produto_id FROM reposicao ORDER BY giro DESC LIMIT 6")]
+        # Estoque zerado, reposto, produto excluído e um produto novo sem giro
+        conn.execute(f"UPDATE produtos SET quantidade = 0 WHERE id IN ({ids[0]}, {ids[1]})")
+        conn.execute("UPDATE produtos SET quantidade = 100000 WHERE id = ?", (ids[2],))
+        remover_produto(conn, ids[3])
+        conn.execute("INSERT INTO produtos (nome, quantidade, preco_custo) VALUES ('Novo', 1, 1)")
+        conn.commit()
+
+    with motor_com_vendas.banco.leitura() as conn:
+        fila.atualizar(conn)
+        conferir(fila, conn, agora)
+        assert ids[3] not in fila.atuais
+        assert {ids[0], ids[1]} <= {linha[0] for linha in fila.em_risco(10000, agora)}
+
+
+def test_aplicar_ids_sem_alteracao_nao_duplica(motor_com_vendas):
+    agora = datetime(2026, 10, 1)
+    fila = FilaReposicao()
+    with motor_com_vendas.banco.leitura() as conn:
+        fila.carregar(conn)
+        fila.aplicar(conn, list(fila.atuais)[:10])
+        fila.aplicar(conn, list(fila.atuais)[:10])
+        conferir(fila, conn, agora)
+
+
+def test_giro_nao_estoura_em_datas_distantes(motor):
+    produto_id = motor.adicionar_produto("Café", 320, "10.00")
+    for dia in range(1, 29):
+        motor.escrever(registrar_itens, [(produto_id, 10, 1500)], f"2080-01-{dia:02d} 12:00:00")
+
+    agora = datetime(2080, 1, 29)
+    with motor.banco.leitura() as conn:
+        fila = FilaReposicao()
+        fila.atualizar(conn)
+        conferir(fila, conn, agora)
+        (linha,) = produtos_em_risco(conn, 10, agora)
+    # 10 unidades por dia, com os pesos das vendas mais antigas já decaídos
+    assert linha[0] == produto_id and linha[2] == 40
+    assert 5 < linha[3] < 10
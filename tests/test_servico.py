@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from motor import inserir_produto, remover_produto
+from produtos import ProdutoNaoEncontrado
+from servico import ServicoEstoque
+
+
+def test_escrever_lote_desfaz_so_a_operacao_que_falhou(motor):
+    resultados = motor.escrever_lote([
+        (inserir_produto, ("A", 1, 100)),
+        (remover_produto, (999,)),
+        (inserir_produto, ("B", 2, 200)),
+    ])
+
+    assert [sucesso for sucesso, _ in resultados] == [True, False, True]
+    assert isinstance(resultados[1][1], ProdutoNaoEncontrado)
+    nomes = motor.ler(lambda conn: [nome for (nome,) in conn.execute(
+        "SELECT nome FROM produtos ORDER BY id")])
+    assert nomes == ["A", "B"]
+
+
+async def requisitar(porta, bruto):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    writer.write(bruto)
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    cabecalho, _, corpo = resposta.partition(b"\r\n\r\n")
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+
+@pytest.mark.parametrize("tamanho", ["abc", "-5"])
+def test_content_length_invalido_responde_400(motor, tamanho):
+    async def executar():
+        servico = ServicoEstoque(motor)
+        servidor = await servico.iniciar("127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        try:
+            return await requisitar(porta, (
+                f"POST /produtos HTTP/1.1\r\nContent-Length: {tamanho}\r\n\r\n").encode())
+        finally:
+            servidor.close()
+            servico.encerrar()
+
+    status, corpo = asyncio.run(executar())
+    assert status == 400 and "Content-Length" in corpo["erro"]
+
+
+def test_venda_de_carrinho_pelo_servico(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+
+    async def vender(itens):
+        servico = ServicoEstoque(motor)
+        servidor = await servico.iniciar("127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        corpo = json.dumps({"itens": itens}).encode()
+        try:
+            return await requisitar(porta, (
+                f"POST /vendas HTTP/1.1\r\nConnection: close\r\n"
+                f"Content-Length: {len(corpo)}\r\n\r\n").encode() + corpo)
+        finally:
+            servidor.close()
+            servico.encerrar()
+
+    status, corpo = asyncio.run(vender([
+        {"produto_id": lapis, "quantidade": 2, "preco_venda": "3.00"},
+        {"produto_id": caneta, "quantidade": "1", "preco_venda": 4}]))
+    assert status == 201 and corpo["itens"] == 2 and corpo["total"] == 10.0
+
+    status, corpo = asyncio.run(vender([
+        {"produto_id": caneta, "quantidade": 4, "preco_venda": 4},
+        {"produto_id": caneta, "quantidade": 1, "preco_venda": 4}]))
+    assert status == 409 and corpo["faltas"] == [{"produto": "Caneta", "pedido": 5, "disponivel": 4}]
+
+    status, _ = asyncio.run(vender([{"produto_id": lapis, "quantidade": 0, "preco_venda": 1}]))
+    assert status == 400
+    assert motor.ler(lambda conn: dict(conn.execute("SELECT id, quantidade FROM produtos"))) == {
+        lapis: 8, caneta: 4}
@@ -0,0 +1,169 @@
+import asyncio
+import shutil
+import threading
+
+import pytest
+
+from motor import MotorEstoque
+from servico import ServicoEstoque
+from sincronizacao import (sincronizar_pasta, sincronizar_servidor, aplicar_lote, exportar_lotes,
+                           lotes_guardados, descompactar_lote, validar_lote, ErroSincronizacao)
+
+
+def criar_loja(tmp_path):
+    """Loja com dois produtos, já sincronizada com a pasta."""
+    a = MotorEstoque(str(tmp_path / "a.db"))
+    a.adicionar_produto("Caneta", 100, "2.50")
+    a.adicionar_produto("Lápis", 50, "1")
+    sincronizar(a, str(tmp_path / "pasta"))
+    a.fechar()
+
+
+@pytest.fixture
+def lojas(tmp_path):
+    """Duas lojas partindo da mesma cópia do banco, já com identidades próprias."""
+    criar_loja(tmp_path)
+    shutil.copy(tmp_path / "a.db", tmp_path / "b.db")
+    a, b = MotorEstoque(str(tmp_path / "a.db")), MotorEstoque(str(tmp_path / "b.db"))
+    b.nova_identidade()
+    yield a, b, str(tmp_path / "pasta")
+    a.fechar()
+    b.fechar()
+
+
+def sincronizar(motor, pasta):
+    with motor.banco.escrita() as conn:
+        return sincronizar_pasta(conn, pasta)
+
+
+def estado(motor):
+    return motor.ler(lambda conn: (
+        sorted(conn.execute("SELECT nome, quantidade, preco_custo FROM produtos")),
+        sorted(conn.execute("SELECT nome_produto, quantidade, preco_venda, data_venda FROM vendas")),
+        conn.execute("SELECT * FROM resumo").fetchall()))
+
+
+def test_lojas_convergem_e_repetir_nao_muda_nada(lojas):
+    a, b, pasta = lojas
+    a.registrar_venda([(1, 10, 500)])
+    b.registrar_venda([(1, 20, 500)])
+    a.registrar_entrada(2, 30, "1.20")
+    b.atualizar_produto(2, "Lápis HB", 50, "1.10")
+    b.adicionar_produto("Borracha", 7, "0.80")
+
+    for motor in (a, b, a):
+        sincronizar(motor, pasta)
+
+    assert estado(a) == estado(b)
+    produtos = {nome: (quantidade, custo) for nome, quantidade, custo in estado(a)[0]}
+    assert produtos["Caneta"] == (70, 250) and produtos["Borracha"] == (7, 80)
+    # O estoque soma as duas lojas; nome e custo vêm inteiros da versão vencedora
+    lapis = {nome: valor for nome, valor in produtos.items() if nome.startswith("Lápis")}
+    assert lapis in ({"Lápis HB": (80, 110)}, {"Lápis": (80, 120)})
+    assert a.conferir_estoque() == {} and b.conferir_estoque() == {}
+
+    antes = estado(a), estado(b)
+    for motor in (a, b):
+        relatorio = sincronizar(motor, pasta)
+        assert relatorio["lotes"] == 0 and relatorio["enviados"] == 0
+    assert (estado(a), estado(b)) == antes
+
+
+def test_lote_aplicado_de_novo_e_ignorado(lojas):
+    a, b, _ = lojas
+    a.registrar_venda([(1, 5, 500)])
+    with a.banco.escrita() as conn:
+        exportar_lotes(conn)
+        lote = descompactar_lote(lotes_guardados(conn)[-1][1])
+
+    assert b.escrever(aplicar_lote, lote)["vendas"] == 1
+    depois = estado(b)
+    assert b.escrever(aplicar_lote, lote) is None
+    assert estado(b) == depois
+
+    pulado = dict(lote, lote=lote["lote"] + 2)
+    with pytest.raises(ErroSincronizacao):
+        b.escrever(aplicar_lote, pulado)
+
+
+def test_copia_sem_nova_identidade_e_recusada(tmp_path):
+    criar_loja(tmp_path)
+    shutil.copy(tmp_path / "a.db", tmp_path / "c.db")
+    a, c = MotorEstoque(str(tmp_path / "a.db")), MotorEstoque(str(tmp_path / "c.db"))
+    pasta = str(tmp_path / "pasta")
+    try:
+        a.registrar_venda([(1, 1, 500)])
+        sincronizar(a, pasta)
+        c.registrar_venda([(1, 2, 500)])
+        with pytest.raises(ErroSincronizacao):
+            sincronizar(c, pasta)
+    finally:
+        a.fechar()
+        c.fechar()
+
+
+@pytest.mark.parametrize("chave, entrada", [
+    ("vendas", ["k", "Caneta", 1, 500, 250]),
+    ("vendas", ["k", "Caneta", "1", 500, 250, "2026-06-15 10:00:00"]),
+    ("vendas", ["k", "Caneta", True, 500, 250, "2026-06-15 10:00:00"]),
+    ("movimentos", ["k", 1.5]),
+    ("removidos", ["k", "ontem"]),
+    ("produtos", "k"),
+])
+def test_lote_com_entrada_malformada_e_recusado(lojas, chave, entrada):
+    a, b, _ = lojas
+    a.registrar_venda([(1, 5, 500)])
+    with a.banco.escrita() as conn:
+        exportar_lotes(conn)
+        lote = descompactar_lote(lotes_guardados(conn)[-1][1])
+    validar_lote(lote)
+
+    lote[chave] = lote[chave] + [entrada]
+    with pytest.raises(ErroSincronizacao,
+                       match=f"{chave}\\[\\d+\\] do lote {lote['lote']} da loja {lote['loja']}"):
+        validar_lote(lote)
+
+
+@pytest.fixture
+def servidor(lojas):
+    """Serviço HTTP da loja A numa thread própria; devolve a URL."""
+    a, _, _ = lojas
+    laco = asyncio.new_event_loop()
+    servico = ServicoEstoque(a)
+    servidor = laco.run_until_complete(servico.iniciar("127.0.0.1", 0))
+    thread = threading.Thread(target=laco.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.sockets[0].getsockname()[1]}"
+    laco.call_soon_threadsafe(laco.stop)
+    thread.join()
+    servidor.close()
+    servico.encerrar()
+    laco.run_until_complete(servidor.wait_closed())
+    laco.close()
+
+
+def test_servidor_repassa_os_lotes_das_outras_lojas(tmp_path, lojas, servidor):
+    a, b, _ = lojas
+    shutil.copy(tmp_path / "b.db", tmp_path / "c.db")
+    c = MotorEstoque(str(tmp_path / "c.db"))
+    try:
+        c.nova_identidade()
+        b.registrar_venda([(1, 10, 500)])
+        c.registrar_venda([(1, 20, 500)])
+        c.adicionar_produto("Borracha", 7, "0.80")
+        a.registrar_entrada(2, 30, "1.20")
+
+        # B e C só falam com A; as alterações de uma chegam à outra por A
+        for motor in (b, c, b):
+            with motor.banco.escrita() as conn:
+                sincronizar_servidor(conn, servidor)
+
+        assert estado(a) == estado(b) == estado(c)
+        produtos = {nome: quantidade for nome, quantidade, _ in estado(a)[0]}
+        assert produtos == {"Caneta": 70, "Lápis": 80, "Borracha": 7}
+        for motor in (b, c):
+            with motor.banco.escrita() as conn:
+                relatorio = sincronizar_servidor(conn, servidor)
+            assert relatorio["lotes"] == 0 and relatorio["enviados"] == 0
+    finally:
+        c.fechar()
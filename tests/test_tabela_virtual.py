@@ -0,0 +1,42 @@
+from tabela_virtual import buscar_pagina, buscar_por_ids
+
+CONSULTA = "SELECT data_venda, id, quantidade FROM vendas"
+CHAVE = ("data_venda", "id")
+
+
+def paginar(conn, **opcoes):
+    """Percorre a tabela de página em página, para a frente e depois para trás."""
+    frente = []
+    pagina = buscar_pagina(conn, CONSULTA, CHAVE, limite=97, **opcoes)
+    while pagina:
+        frente += pagina
+        pagina = buscar_pagina(conn, CONSULTA, CHAVE, apos=pagina[-1][:2], limite=97, **opcoes)
+
+    tras = []
+    pagina = frente[-1:]
+    while pagina:
+        tras = pagina + tras
+        pagina = buscar_pagina(conn, CONSULTA, CHAVE, antes=pagina[0][:2], limite=97, **opcoes)
+    return frente, tras
+
+
+def test_paginas_cobrem_a_tabela_nas_duas_direcoes(motor_com_vendas):
+    with motor_com_vendas.banco.leitura() as conn:
+        todas = conn.execute(f"{CONSULTA} ORDER BY data_venda DESC, id DESC").fetchall()
+        frente, tras = paginar(conn, descendente=True)
+    assert frente == tras == todas
+
+
+def test_paginas_com_filtro(motor_com_vendas):
+    with motor_com_vendas.banco.leitura() as conn:
+        todas = conn.execute(f"{CONSULTA} WHERE quantidade > ? ORDER BY data_venda, id",
+                             (3,)).fetchall()
+        frente, tras = paginar(conn, onde="quantidade > ?", parametros=(3,))
+    assert todas and frente == tras == todas
+
+
+def test_buscar_por_ids_em_lotes(motor_com_vendas):
+    with motor_com_vendas.banco.leitura() as conn:
+        ids = list(range(1, 1200, 3)) + [999999]
+        linhas = buscar_por_ids(conn, "SELECT id FROM vendas", ids, lote=50)
+    assert sorted(linha[0] for linha in linhas) == ids[:-1]
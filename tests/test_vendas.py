@@ -0,0 +1,57 @@
+import pytest
+
+from vendas import EstoqueInsuficiente, ItemInvalido, validar_item
+
+
+def estoque(motor):
+    return motor.ler(lambda conn: dict(conn.execute("SELECT id, quantidade FROM produtos")))
+
+
+def test_venda_baixa_o_estoque_de_todos_os_itens(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+
+    motor.registrar_venda([(lapis, 3, 300), (caneta, 5, 400), (lapis, 2, 300)])
+
+    assert estoque(motor) == {lapis: 5, caneta: 0}
+    assert motor.ler(lambda conn: conn.execute("SELECT COUNT(*) FROM vendas").fetchone()[0]) == 3
+
+
+def test_duas_linhas_do_carrinho_que_juntas_passam_do_estoque(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        motor.registrar_venda([(caneta, 1, 400), (lapis, 6, 300), (lapis, 5, 300)])
+
+    assert erro.value.faltas == [("Lápis", 11, 10)]
+    assert estoque(motor) == {lapis: 10, caneta: 5}
+    assert motor.ler(lambda conn: conn.execute("SELECT COUNT(*) FROM vendas").fetchone()[0]) == 0
+
+
+@pytest.mark.parametrize("quantidade, preco", [
+    ("0", "1.00"), ("-1", "1.00"), ("abc", "1.00"), ("2", "0"), ("2", "nan"), ("2", "x"),
+])
+def test_validar_item_recusa_quantidade_ou_preco_invalido(quantidade, preco):
+    with pytest.raises(ItemInvalido):
+        validar_item(1, quantidade, preco)
+
+
+def test_validar_item_converte_o_preco_para_centavos():
+    assert validar_item(7, " 3 ", "12.34") == (7, 3, 1234)
+
+
+def test_carrinho_grava_as_linhas_juntas_com_o_livro_e_o_giro(motor):
+    lapis = motor.adicionar_produto("Lápis", 10, "1.50")
+    caneta = motor.adicionar_produto("Caneta", 5, "2.00")
+
+    linhas = motor.registrar_venda([(lapis, 2, 300), (caneta, 1, 400), (lapis, 1, 250)])
+
+    assert len(linhas) == 3 and len({linha[5] for linha in linhas}) == 1
+    assert motor.ler(lambda conn: conn.execute(
+        "SELECT produto_id, quantidade FROM movimentos WHERE tipo = 'V' ORDER BY produto_id"
+    ).fetchall()) == [(lapis, -3), (caneta, -1)]
+    assert motor.ler(lambda conn: dict(conn.execute(
+        "SELECT produto_id, ultima_venda FROM reposicao"))) == {
+            lapis: linhas[0][5], caneta: linhas[0][5]}
+    assert motor.totais()["total_vendas"] == 2 * 300 + 400 + 250
@@ -0,0 +1,109 @@
+import math
+from datetime import datetime
+from dinheiro import para_centavos
+from movimentos import origem_movimento
+from reposicao import registrar_giro
+from tabela_virtual import buscar_por_ids
+
+
+class ItemInvalido(ValueError):
+    """Item de venda com quantidade ou preço inválido."""
+
+
+class EstoqueInsuficiente(Exception):
+    """Um ou mais itens pedem mais unidades do que há em estoque."""
+
+    def __init__(self, faltas):
+        self.faltas = faltas
+        super().__init__("; ".join(
+            f"{nome}: pedido {pedido}, disponível {disponivel}"
+            for nome, pedido, disponivel in faltas))
+
+
+def validar_item(produto_id, quantidade, preco_venda):
+    """Valida um item de venda vindo de fora da interface e o converte.
+
+    Retorna `(produto_id, quantidade, preco_venda)` com o preço em centavos.
+    """
+    if isinstance(produto_id, bool) or not isinstance(produto_id, int):
+        raise ItemInvalido("Produto inválido!")
+
+    quantidade = str(quantidade if quantidade is not None else "").strip()
+    if not quantidade.isdigit() or int(quantidade) <= 0:
+        raise ItemInvalido("Quantidade inválida para venda!")
+
+    try:
+        preco = float(str(preco_venda).strip())
+        if not math.isfinite(preco) or preco <= 0 or para_centavos(preco_venda) <= 0:
+            raise ValueError
+    except ValueError:
+        raise ItemInvalido("Preço de venda inválido!") from None
+
+    return produto_id, int(quantidade), para_centavos(preco_venda)
+
+
+def agrupar_itens(itens):
+    """Soma as quantidades pedidas de cada produto."""
+    pedidos = {}
+    for produto_id, quantidade, _ in itens:
+        pedidos[produto_id] = pedidos.get(produto_id, 0) + quantidade
+    return pedidos
+
+
+def ler_estoque(conn, ids):
+    """Lê nome, quantidade e custo atuais dos produtos informados."""
+    return {produto_id: (nome, quantidade, preco_custo)
+            for produto_id, nome, quantidade, preco_custo in buscar_por_ids(
+                conn, "SELECT id, nome, quantidade, preco_custo FROM produtos", ids)}
+
+
+def verificar_faltas(pedidos, estoque):
+    """Lista os itens cujo pedido passa do estoque disponível."""
+    faltas = []
+    for produto_id, pedido in pedidos.items():
+        nome, disponivel, _ = estoque.get(produto_id, (f"Produto {produto_id}", 0, 0))
+        if pedido > disponivel:
+            faltas.append((nome, pedido, disponivel))
+    return faltas
+
+
+def registrar_itens(conn, itens, data_venda=None):
+    """Grava uma venda de vários itens com um UPDATE e um INSERT em lote.
+
+    `itens` é uma lista de tuplas `(produto_id, quantidade, preco_venda)`,
+    com o preço em centavos. O estoque vem sempre do banco: todos os
+    produtos são validados de uma vez e a baixa é condicional
+    (`quantidade >= pedido`), de modo que duas vendas simultâneas nunca
+    deixam o estoque negativo nem perdem uma baixa.
+    Se algum item faltar, `EstoqueInsuficiente` é levantada e cabe ao
+    chamador desfazer a transação. Não faz commit, para que a venda inteira,
+    com o giro de reposição dos produtos, caiba numa transação. Retorna as
+    linhas gravadas em vendas.
+    """
+    pedidos = agrupar_itens(itens)
+    estoque = ler_estoque(conn, pedidos)
+
+    faltas = verificar_faltas(pedidos, estoque)
+    if faltas:
+        raise EstoqueInsuficiente(faltas)
+
+    data_venda = data_venda or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    linhas = [(produto_id, estoque[produto_id][0], quantidade, preco_venda,
+               estoque[produto_id][2], data_venda)
+              for produto_id, quantidade, preco_venda in itens]
+
+    with origem_movimento(conn, "V"):
+        cursor = conn.executemany(
+            "UPDATE produtos SET quantidade = quantidade - ? WHERE id = ? AND quantidade >= ?",
+            [(pedido, produto_id, pedido) for produto_id, pedido in pedidos.items()])
+    if cursor.rowcount != len(pedidos):
+        # Outra conexão baixou o estoque entre a leitura e a gravação
+        raise EstoqueInsuficiente(verificar_faltas(pedidos, ler_estoque(conn, pedidos)))
+
+    conn.executemany(
+        '''INSERT INTO vendas
+        (produto_id, nome_produto, quantidade, preco_venda, preco_custo, data_venda)
+        VALUES (?, ?, ?, ?, ?, ?)''',
+        linhas)
+    registrar_giro(conn, pedidos, data_venda)
+    return linhas